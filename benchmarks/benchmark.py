@@ -0,0 +1,302 @@
+"""
+Copyright (C) 2019 Matthias Neuner <matthias.neuner@uibk.ac.at>
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+Benchmark suite for the .fil reader, the ExportEngine and the Ensight writer, based on synthetic .fil files.
+Run from the root directory of the repository:
+
+    python -m benchmarks.benchmark --elements 1000 100000 --increments 10
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from prettytable import PrettyTable
+from benchmarks.syntheticfil import SyntheticModel
+from src.exportengine import ExportEngine
+from src.filfileformat import iterateFilRecords
+from src.inputfileparser import parseInputFile
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def benchmarkParse(filFile: str):
+    """Time the decoding of all records, without any processing.
+
+    Parameters
+    ----------
+    filFile
+        The .fil file.
+
+    Returns
+    -------
+    dict
+        The wall time and the number of records.
+    """
+
+    start = time.perf_counter()
+    nRecords = 0
+    for recordLength, recordType, recordContent in iterateFilRecords(filFile):
+        nRecords += 1
+    return {"seconds": time.perf_counter() - start, "records": nRecords}
+
+
+def benchmarkExportEngine(filFile: str, inpFile: str):
+    """Time the ExportEngine on all records, split into model setup and increments.
+    The model setup ends with the first end increment record.
+
+    Parameters
+    ----------
+    filFile
+        The .fil file.
+    inpFile
+        The export definition.
+
+    Returns
+    -------
+    dict
+        The wall times of the model setup and of each increment, and the number of records.
+    """
+
+    exportJobs = parseInputFile(inpFile)
+
+    # the console output of the ExportEngine is not part of the benchmark
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        exportEngine = ExportEngine(exportJobs, "benchmark", quiet=True)
+
+        modelSetupSeconds = None
+        incrementSeconds = []
+        nRecords = 0
+        lastTime = start
+        for recordLength, recordType, recordContent in iterateFilRecords(filFile):
+            exportEngine.computeRecord(recordLength, recordType, recordContent)
+            nRecords += 1
+            if recordType == 2001:
+                now = time.perf_counter()
+                if modelSetupSeconds is None:
+                    modelSetupSeconds = now - lastTime
+                else:
+                    incrementSeconds.append(now - lastTime)
+                lastTime = now
+
+        exportEngine.finalize()
+
+    return {
+        "seconds": time.perf_counter() - start,
+        "records": nRecords,
+        "modelSetupSeconds": modelSetupSeconds,
+        "incrementSeconds": incrementSeconds,
+    }
+
+
+def benchmarkConversion(filFile: str, inpFile: str):
+    """Time the end to end conversion using filconverter.py, including the start of the interpreter.
+
+    Parameters
+    ----------
+    filFile
+        The .fil file.
+    inpFile
+        The export definition.
+
+    Returns
+    -------
+    dict
+        The wall time.
+    """
+
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, os.path.join(_root, "filconverter.py"), filFile, inpFile, "--quiet"],
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    return {"seconds": time.perf_counter() - start}
+
+
+def runBenchmark(model: SyntheticModel, directory: str, repeat: int = 1, asciiFormat: bool = False):
+    """Generate a synthetic .fil file and run all benchmarks on it.
+    For repeated runs, the fastest run of each benchmark is reported.
+
+    Parameters
+    ----------
+    model
+        The synthetic model.
+    directory
+        The working directory, to which the .fil file and all outputs are written.
+    repeat
+        The number of repetitions.
+    asciiFormat
+        Additionally write the .fil file in ASCII format, and compare its decoding to the binary .fil file.
+
+    Returns
+    -------
+    dict
+        The results of the benchmarks.
+    """
+
+    name = "synthetic_{:}_{:}".format(model.elementType, model.nElements)
+    filFile = os.path.join(directory, name + ".fil")
+    inpFile = os.path.join(directory, name + ".inp")
+
+    model.write(filFile)
+    with open(inpFile, "w") as f:
+        f.write(model.exportDefinition())
+    fileSize = os.path.getsize(filFile)
+
+    asciiFilFile = os.path.join(directory, name + "_ascii.fil")
+    if asciiFormat:
+        model.write(asciiFilFile, asciiFormat=True)
+
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        parse = min((benchmarkParse(filFile) for _ in range(repeat)), key=lambda x: x["seconds"])
+        engine = min((benchmarkExportEngine(filFile, inpFile) for _ in range(repeat)), key=lambda x: x["seconds"])
+        conversion = min((benchmarkConversion(filFile, inpFile) for _ in range(repeat)), key=lambda x: x["seconds"])
+        if asciiFormat:
+            asciiParse = min((benchmarkParse(asciiFilFile) for _ in range(repeat)), key=lambda x: x["seconds"])
+    finally:
+        os.chdir(cwd)
+
+    incrementSeconds = np.asarray(engine["incrementSeconds"])
+    nRecords = parse["records"]
+
+    results = {
+        "model": {
+            "elementType": model.elementType,
+            "elements": model.nElements,
+            "nodes": model.nNodes,
+            "qps": model.nQps,
+            "sdv": model.nSdv,
+            "increments": model.nIncrements,
+            "bytes": fileSize,
+            "records": nRecords,
+        },
+        "parse": parse["seconds"],
+        "modelSetup": engine["modelSetupSeconds"],
+        "incrementMean": float(incrementSeconds.mean()) if incrementSeconds.shape[0] else None,
+        "incrementMax": float(incrementSeconds.max()) if incrementSeconds.shape[0] else None,
+        "exportEngine": engine["seconds"],
+        "conversion": conversion["seconds"],
+        "parseRecordsPerSecond": nRecords / parse["seconds"],
+        "parseMBPerSecond": fileSize / 1e6 / parse["seconds"],
+        "conversionRecordsPerSecond": nRecords / conversion["seconds"],
+        "conversionMBPerSecond": fileSize / 1e6 / conversion["seconds"],
+    }
+
+    if asciiFormat:
+        asciiFileSize = os.path.getsize(asciiFilFile)
+        results["model"]["asciiBytes"] = asciiFileSize
+        results["asciiParse"] = asciiParse["seconds"]
+        results["asciiParseRecordsPerSecond"] = asciiParse["records"] / asciiParse["seconds"]
+        results["asciiParseMBPerSecond"] = asciiFileSize / 1e6 / asciiParse["seconds"]
+
+    return results
+
+
+def printResults(results: list[dict]):
+    """Print the results of the benchmarks as a table."""
+
+    def fmt(x):
+        return "-" if x is None else "{:.4f}".format(x)
+
+    table = PrettyTable(
+        [
+            "elements",
+            "MB",
+            "records",
+            "parse [s]",
+            "setup [s]",
+            "increment [s]",
+            "conversion [s]",
+            "parse rec/s",
+            "parse MB/s",
+            "conv. rec/s",
+            "conv. MB/s",
+        ]
+    )
+    table.align = "r"
+    for r in results:
+        table.add_row(
+            [
+                r["model"]["elements"],
+                "{:.1f}".format(r["model"]["bytes"] / 1e6),
+                r["model"]["records"],
+                fmt(r["parse"]),
+                fmt(r["modelSetup"]),
+                fmt(r["incrementMean"]),
+                fmt(r["conversion"]),
+                "{:.0f}".format(r["parseRecordsPerSecond"]),
+                "{:.1f}".format(r["parseMBPerSecond"]),
+                "{:.0f}".format(r["conversionRecordsPerSecond"]),
+                "{:.1f}".format(r["conversionMBPerSecond"]),
+            ]
+        )
+    print(table)
+
+    asciiResults = [r for r in results if "asciiParse" in r]
+    if asciiResults:
+        table = PrettyTable(
+            ["elements", "binary MB", "ASCII MB", "binary parse [s]", "ASCII parse [s]", "ASCII rec/s", "ASCII MB/s"]
+        )
+        table.align = "r"
+        for r in asciiResults:
+            table.add_row(
+                [
+                    r["model"]["elements"],
+                    "{:.1f}".format(r["model"]["bytes"] / 1e6),
+                    "{:.1f}".format(r["model"]["asciiBytes"] / 1e6),
+                    fmt(r["parse"]),
+                    fmt(r["asciiParse"]),
+                    "{:.0f}".format(r["asciiParseRecordsPerSecond"]),
+                    "{:.1f}".format(r["asciiParseMBPerSecond"]),
+                ]
+            )
+        print(table)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the conversion of synthetic .fil files.")
+    parser.add_argument("--elements", help="The model sizes (number of elements)", type=int, nargs="+", default=[1000])
+    parser.add_argument("--elementType", help="The Abaqus element type, e.g., C3D8 or CPS4", type=str, default="C3D8")
+    parser.add_argument("--qps", help="The number of quadrature points per element", type=int, default=8)
+    parser.add_argument("--sdv", help="The number of SDVs per quadrature point", type=int, default=0)
+    parser.add_argument("--increments", help="The number of increments", type=int, default=10)
+    parser.add_argument("--repeat", help="The number of repetitions; the fastest run is reported", type=int, default=1)
+    parser.add_argument("--json", dest="jsonFile", help="Write the results to a .json file", type=str, default=None)
+    parser.add_argument(
+        "--ascii",
+        dest="asciiFormat",
+        help="Additionally benchmark the decoding of the same model written as ASCII .fil file",
+        action="store_true",
+    )
+    parser.add_argument("--keep", help="Keep the generated files in this directory", type=str, default=None)
+    args = parser.parse_args()
+
+    results = []
+    for nElements in args.elements:
+        model = SyntheticModel(nElements, args.elementType, args.qps, args.sdv, args.increments)
+        if args.keep:
+            os.makedirs(args.keep, exist_ok=True)
+            results.append(runBenchmark(model, os.path.abspath(args.keep), args.repeat, args.asciiFormat))
+        else:
+            with tempfile.TemporaryDirectory() as directory:
+                results.append(runBenchmark(model, directory, args.repeat, args.asciiFormat))
+
+    printResults(results)
+
+    if args.jsonFile:
+        with open(args.jsonFile, "w") as f:
+            json.dump(results, f, indent=1)
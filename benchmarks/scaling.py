@@ -0,0 +1,245 @@
+"""
+Copyright (C) 2019 Matthias Neuner <matthias.neuner@uibk.ac.at>
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+Scaling harness: converts synthetic models at geometrically growing sizes, and fits the exponents p of
+runtime ~ n^p and peak memory ~ n^p per stage of the conversion, with n being the number of elements.
+Exits with a nonzero status if an exponent exceeds its bound, such that super-linear regressions
+are caught on small inputs. Run from the root directory of the repository:
+
+    python -m benchmarks.scaling --elements 1000 4000 16000 64000 --maxExponent 1.5
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import numpy as np
+from prettytable import PrettyTable
+from benchmarks.syntheticfil import SyntheticModel
+from src.exportengine import ExportEngine
+from src.filfileformat import iterateFilRecords
+from src.inputfileparser import parseInputFile
+from src.profiling import profiler
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def convert(filFile: str, inpFile: str, resultFile: str):
+    """Convert a .fil file with the profiler enabled, and write the per stage counters to a .json file.
+    This is executed in a separate process for each model size, so that peak memory of different sizes
+    does not interfere.
+
+    Parameters
+    ----------
+    filFile
+        The .fil file.
+    inpFile
+        The export definition.
+    resultFile
+        The .json file for the results.
+    """
+
+    profiler.enable(traceMemory=True)
+    exportJobs = parseInputFile(inpFile)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        with profiler.measure("stage", "conversion"):
+            exportEngine = ExportEngine(exportJobs, "scaling", quiet=True)
+            for recordLength, recordType, recordContent in iterateFilRecords(filFile):
+                exportEngine.computeRecord(recordLength, recordType, recordContent)
+            exportEngine.finalize()
+
+    # ru_maxrss is in kilobytes on Linux
+    with open(resultFile, "w") as f:
+        json.dump(
+            {
+                "counters": [c for c in profiler.getCounters() if c["category"] == "stage"],
+                "maxRSS": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+            },
+            f,
+        )
+
+
+def measureModel(model: SyntheticModel, directory: str):
+    """Generate a synthetic model and convert it in a separate process.
+
+    Parameters
+    ----------
+    model
+        The synthetic model.
+    directory
+        The working directory.
+
+    Returns
+    -------
+    dict
+        The time and peak memory per stage, and the maximum resident set size.
+    """
+
+    filFile = os.path.join(directory, "scaling.fil")
+    inpFile = os.path.join(directory, "scaling.inp")
+    resultFile = os.path.join(directory, "scaling.json")
+
+    model.write(filFile)
+    with open(inpFile, "w") as f:
+        f.write(model.exportDefinition())
+
+    subprocess.run(
+        [sys.executable, "-m", "benchmarks.scaling", "--convert", filFile, inpFile, resultFile],
+        check=True,
+        cwd=directory,
+        env=dict(os.environ, PYTHONPATH=_root),
+    )
+
+    with open(resultFile) as f:
+        result = json.load(f)
+
+    return {
+        "seconds": {c["name"]: c["seconds"] for c in result["counters"]},
+        "peakMemory": {c["name"]: c["peakMemory"] for c in result["counters"]},
+        "maxRSS": result["maxRSS"],
+    }
+
+
+def fitExponent(sizes: np.ndarray, values: np.ndarray):
+    """Fit the exponent p of values ~ sizes^p by least squares in log-log space.
+
+    Parameters
+    ----------
+    sizes
+        The problem sizes.
+    values
+        The measured values.
+
+    Returns
+    -------
+    float
+        The exponent.
+    """
+
+    return float(np.polyfit(np.log(sizes), np.log(values), 1)[0])
+
+
+def fitExponents(sizes: list[int], measurements: list[dict], minSeconds: float, minMemory: float):
+    """Fit the runtime and memory exponents for all stages present for all sizes.
+    Stages, which are too small at the largest size to be measured reliably, are skipped.
+
+    Returns
+    -------
+    dict
+        The exponents {stage: {"seconds": p or None, "peakMemory": p or None}}.
+    """
+
+    sizes = np.asarray(sizes, dtype=float)
+    stages = set.intersection(*[set(m["seconds"]) for m in measurements])
+
+    exponents = {}
+    for stage in sorted(stages):
+        exponents[stage] = {}
+        for quantity, threshold in (("seconds", minSeconds), ("peakMemory", minMemory)):
+            values = np.asarray([m[quantity][stage] for m in measurements], dtype=float)
+            if values[-1] < threshold or (values <= 0).any():
+                exponents[stage][quantity] = None
+            else:
+                exponents[stage][quantity] = fitExponent(sizes, values)
+
+    maxRSS = np.asarray([m["maxRSS"] for m in measurements], dtype=float)
+    exponents["max RSS"] = {"seconds": None, "peakMemory": fitExponent(sizes, maxRSS)}
+
+    return exponents
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit the scaling exponents of the conversion stages.")
+    parser.add_argument(
+        "--elements",
+        help="The model sizes (number of elements), preferably growing geometrically",
+        type=int,
+        nargs="+",
+        default=[1000, 4000, 16000, 64000],
+    )
+    parser.add_argument("--elementType", help="The Abaqus element type, e.g., C3D8 or CPS4", type=str, default="C3D8")
+    parser.add_argument("--qps", help="The number of quadrature points per element", type=int, default=8)
+    parser.add_argument("--sdv", help="The number of SDVs per quadrature point", type=int, default=4)
+    parser.add_argument("--increments", help="The number of increments", type=int, default=2)
+    parser.add_argument(
+        "--maxRecordValues", help="Split results into continuation records of this length", type=int, default=None
+    )
+    parser.add_argument("--maxExponent", help="The default bound for all exponents", type=float, default=1.5)
+    parser.add_argument(
+        "--bound",
+        help="The bound for the exponent of a single stage, e.g., 'build sets=1.1'",
+        type=str,
+        action="append",
+        default=[],
+    )
+    parser.add_argument(
+        "--minSeconds", help="Skip runtime exponents of stages faster than this", type=float, default=0.02
+    )
+    parser.add_argument(
+        "--minMemory", help="Skip memory exponents of stages allocating less bytes than this", type=float, default=1e6
+    )
+    parser.add_argument("--json", dest="jsonFile", help="Write the results to a .json file", type=str, default=None)
+    parser.add_argument("--convert", help=argparse.SUPPRESS, nargs=3, default=None)
+    args = parser.parse_args()
+
+    if args.convert:
+        convert(*args.convert)
+        exit(0)
+
+    if len(args.elements) < 2:
+        raise Exception("At least two model sizes are required for fitting exponents.")
+
+    bounds = {}
+    for bound in args.bound:
+        stage, value = bound.rsplit("=", 1)
+        bounds[stage.strip()] = float(value)
+
+    sizes = []
+    measurements = []
+    for nElements in sorted(args.elements):
+        model = SyntheticModel(nElements, args.elementType, args.qps, args.sdv, args.increments, args.maxRecordValues)
+        print("converting a model with {:} elements ...".format(model.nElements))
+        with tempfile.TemporaryDirectory() as directory:
+            measurements.append(measureModel(model, directory))
+        sizes.append(model.nElements)
+
+    exponents = fitExponents(sizes, measurements, args.minSeconds, args.minMemory)
+
+    failures = []
+    table = PrettyTable(["stage", "time exponent", "memory exponent", "bound", "status"])
+    table.align = "r"
+    table.align["stage"] = "l"
+    for stage, stageExponents in exponents.items():
+        bound = bounds.get(stage, args.maxExponent)
+        exceeded = [q for q, p in stageExponents.items() if p is not None and p > bound]
+        if exceeded:
+            failures.append((stage, exceeded))
+        table.add_row(
+            [
+                stage,
+                "-" if stageExponents["seconds"] is None else "{:.2f}".format(stageExponents["seconds"]),
+                "-" if stageExponents["peakMemory"] is None else "{:.2f}".format(stageExponents["peakMemory"]),
+                "{:.2f}".format(bound),
+                "FAILED" if exceeded else "ok",
+            ]
+        )
+    print(table)
+
+    if args.jsonFile:
+        with open(args.jsonFile, "w") as f:
+            json.dump({"sizes": sizes, "measurements": measurements, "exponents": exponents}, f, indent=1)
+
+    if failures:
+        for stage, quantities in failures:
+            print("scaling of stage '{:}' exceeds its bound: {:}".format(stage, ", ".join(quantities)))
+        exit(1)
@@ -0,0 +1,472 @@
+"""
+Copyright (C) 2019 Matthias Neuner <matthias.neuner@uibk.ac.at>
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+"""
+
+import argparse
+import numpy as np
+
+# words per 513 word chunk, which are available for data
+_WORDS_PER_CHUNK = 512
+
+
+def _strWord(string: str):
+    """Convert a string to a single A8 .fil word (as int64)."""
+    return np.frombuffer(string.ljust(8)[:8].encode("ascii"), dtype="<i8")[0]
+
+
+def _dblWords(values):
+    return np.asarray(values, dtype="<f8").view("<i8")
+
+
+class SyntheticFilWriter:
+    def __init__(self, fileName: str):
+        """Write binary .fil files in the 513-word chunk framing used by Abaqus.
+        Records are passed as arrays of 8 byte words (as int64) and are buffered until
+        a complete chunk can be written.
+
+        Parameters
+        ----------
+        fileName
+            The name of the .fil file to be written.
+        """
+
+        self._f = open(fileName, "wb")
+        self._pending = []
+        self._nPending = 0
+        self.nRecords = 0
+
+    def writeRecord(self, recordType: int, content: np.ndarray):
+        """Write a single record.
+
+        Parameters
+        ----------
+        recordType
+            The record type.
+        content
+            The record content, as an array of int64 words.
+        """
+
+        content = np.asarray(content, dtype="<i8").ravel()
+        self.writeWords(np.concatenate(([content.shape[0] + 2, recordType], content)), 1)
+
+    def writeWords(self, words: np.ndarray, nRecords: int):
+        """Write a contiguous block of one or more complete records.
+
+        Parameters
+        ----------
+        words
+            The records as words (int64).
+        nRecords
+            The number of records contained.
+        """
+
+        words = np.asarray(words, dtype="<i8").ravel()
+        self._pending.append(words)
+        self._nPending += words.shape[0]
+        self.nRecords += nRecords
+        if self._nPending >= _WORDS_PER_CHUNK:
+            self._flush(final=False)
+
+    def close(self):
+        self._flush(final=True)
+        self._f.close()
+
+    def _flush(self, final: bool):
+        words = np.concatenate(self._pending) if self._pending else np.empty(0, dtype="<i8")
+        nChunks = words.shape[0] // _WORDS_PER_CHUNK
+        if final and words.shape[0] % _WORDS_PER_CHUNK:
+            nChunks += 1
+            words = np.concatenate((words, np.zeros(nChunks * _WORDS_PER_CHUNK - words.shape[0], dtype="<i8")))
+
+        nWritten = nChunks * _WORDS_PER_CHUNK
+        chunks = np.empty((nChunks, _WORDS_PER_CHUNK * 8 + 8), dtype=np.uint8)
+        marker = np.frombuffer(np.int32(_WORDS_PER_CHUNK * 8).tobytes(), dtype=np.uint8)
+        chunks[:, :4] = marker
+        chunks[:, -4:] = marker
+        chunks[:, 4:-4] = words[:nWritten].view(np.uint8).reshape(nChunks, -1)
+        chunks.tofile(self._f)
+
+        rest = words[nWritten:]
+        self._pending = [rest] if rest.shape[0] else []
+        self._nPending = rest.shape[0]
+
+
+# the kinds of the content words of the records written by the SyntheticModel in ASCII format:
+# the kinds of the leading words, and the kind of all further words (I: integer, D: double, A: 8 characters)
+_asciiRecordLayouts = {
+    1: ("", "I"),
+    5: ("", "D"),
+    11: ("", "D"),
+    101: ("I", "D"),
+    104: ("I", "D"),
+    1900: ("IA", "I"),
+    1901: ("I", "D"),
+    1911: ("IAA", "I"),
+    1921: ("AAAAIID", "D"),
+    1931: ("A", "I"),
+    1932: ("", "I"),
+    1933: ("A", "I"),
+    1934: ("", "I"),
+    1940: ("I", "A"),
+    1999: ("", "D"),
+    2000: ("DDDDIIIIDDD", "D"),
+    2001: ("", "I"),
+}
+
+
+class SyntheticAsciiFilWriter(SyntheticFilWriter):
+    def __init__(self, fileName: str):
+        """Write ASCII .fil files as written by Abaqus for *FILE FORMAT, ASCII: each record starts with *,
+        and the words are written as I (number of digits, digits), D (E22.15 format) or A (8 characters),
+        in lines of 80 characters.
+
+        Parameters
+        ----------
+        fileName
+            The name of the .fil file to be written.
+        """
+
+        super().__init__(fileName)
+        self._line = ""
+
+    def _formatRecord(self, words: np.ndarray):
+        leading, further = _asciiRecordLayouts[int(words[1])]
+        kinds = "II" + leading + further * (words.shape[0] - 2 - len(leading))
+
+        tokens = ["*"]
+        for kind, word in zip(kinds, words):
+            if kind == "I":
+                digits = str(int(word))
+                tokens.append("I{:2d}{:}".format(len(digits), digits))
+            elif kind == "D":
+                tokens.append("D" + "{:22.15E}".format(word.view("<f8")).replace("E", "D"))
+            else:
+                tokens.append("A" + word.tobytes().decode("ascii"))
+        return "".join(tokens)
+
+    def _flush(self, final: bool):
+        words = np.concatenate(self._pending) if self._pending else np.empty(0, dtype="<i8")
+
+        records = []
+        wordIdx = 0
+        while wordIdx < words.shape[0] and wordIdx + words[wordIdx] <= words.shape[0]:
+            records.append(self._formatRecord(words[wordIdx : wordIdx + words[wordIdx]]))
+            wordIdx += words[wordIdx]
+
+        text = self._line + "".join(records)
+        nLines = len(text) // 80
+        self._line = text[nLines * 80 :]
+        lines = [text[i * 80 : (i + 1) * 80] for i in range(nLines)]
+        if final and self._line:
+            lines.append(self._line)
+        self._f.write("".join(line + "\n" for line in lines).encode("ascii"))
+
+        rest = words[wordIdx:]
+        self._pending = [rest] if rest.shape[0] else []
+        self._nPending = rest.shape[0]
+
+
+def _recordBlock(recordType: int, content: np.ndarray):
+    """Assemble many records of equal length to a block of words, one row per record."""
+    n, length = content.shape
+    block = np.empty((n, length + 2), dtype="<i8")
+    block[:, 0] = length + 2
+    block[:, 1] = recordType
+    block[:, 2:] = content
+    return block
+
+
+class SyntheticModel:
+    def __init__(
+        self,
+        nElements: int = 1000,
+        elementType: str = "C3D8",
+        nQps: int = 8,
+        nSdv: int = 0,
+        nIncrements: int = 10,
+        maxRecordValues: int = None,
+        writeEnergies: bool = False,
+    ):
+        """A structured hexahedral (3D) or quadrilateral (2D) mesh and its synthetic results.
+
+        Parameters
+        ----------
+        nElements
+            The (approximate) number of elements.
+        elementType
+            The Abaqus element type, 'C3D8', 'CPS4', or any other name which is treated as a 3D 8 node (user) element.
+        nQps
+            The number of quadrature points per element.
+        nSdv
+            The number of SDVs per quadrature point, 0 for no SDV output.
+        nIncrements
+            The number of increments.
+        maxRecordValues
+            (Optional) split long results into continuation records of at most this length.
+        writeEnergies
+            Write total energies (1999) records for each increment.
+        """
+
+        self.elementType = elementType
+        self.is2D = elementType.startswith("CPS") or elementType.startswith("CPE")
+        self.nQps = nQps
+        self.nSdv = nSdv
+        self.nIncrements = nIncrements
+        self.maxRecordValues = maxRecordValues
+        self.writeEnergies = writeEnergies
+        self.nStressComponents = 3 if self.is2D else 6
+        self.nDisplacementComponents = 2 if self.is2D else 3
+
+        if self.is2D:
+            n = max(int(round(nElements**0.5)), 1)
+            self.shape = (n, n)
+        else:
+            n = max(int(round(nElements ** (1.0 / 3))), 1)
+            self.shape = (n, n, n)
+
+        self._createMesh()
+
+    @property
+    def nElements(self):
+        return self.elementLabels.shape[0]
+
+    @property
+    def nNodes(self):
+        return self.nodeLabels.shape[0]
+
+    def _createMesh(self):
+        nodeGridShape = tuple(s + 1 for s in self.shape)
+        grid = np.indices(nodeGridShape).reshape(len(nodeGridShape), -1).T.astype(float)
+        self.nodeCoords = grid
+        self.nodeLabels = np.arange(1, grid.shape[0] + 1, dtype=np.int64)
+        nodeIDs = np.arange(grid.shape[0]).reshape(nodeGridShape)
+
+        if self.is2D:
+            c = nodeIDs
+            conn = [c[:-1, :-1], c[1:, :-1], c[1:, 1:], c[:-1, 1:]]
+        else:
+            c = nodeIDs
+            conn = [
+                c[:-1, :-1, :-1],
+                c[1:, :-1, :-1],
+                c[1:, 1:, :-1],
+                c[:-1, 1:, :-1],
+                c[:-1, :-1, 1:],
+                c[1:, :-1, 1:],
+                c[1:, 1:, 1:],
+                c[:-1, 1:, 1:],
+            ]
+        self.connectivity = self.nodeLabels[np.stack([x.ravel() for x in conn], axis=1)]
+        self.elementLabels = np.arange(1, self.connectivity.shape[0] + 1, dtype=np.int64)
+
+    def elementSets(self):
+        """The element sets of the model: a 'LOWER' and an 'UPPER' half."""
+        half = self.nElements // 2
+        return {"LOWER": self.elementLabels[:half], "UPPER": self.elementLabels[half:]}
+
+    def nodeSets(self):
+        """The node sets of the model: the 'BOTTOM' nodes."""
+        return {"BOTTOM": self.nodeLabels[self.nodeCoords[:, -1] == 0.0]}
+
+    def writeModel(self, writer: SyntheticFilWriter):
+        """Write the model definition: heading, elements, nodes, sets, and a closing end increment record."""
+
+        heading = np.zeros(7, dtype="<i8")
+        heading[0] = _strWord("2023")
+        heading[1] = _strWord("01-Jan-2")
+        heading[2] = _strWord("023")
+        heading[3] = _strWord("12:00:00")
+        heading[4] = self.nElements
+        heading[5] = self.nNodes
+        heading[6] = _dblWords([1.0])[0]
+        writer.writeRecord(1921, heading)
+
+        content = np.empty((self.nElements, 2 + self.connectivity.shape[1]), dtype="<i8")
+        content[:, 0] = self.elementLabels
+        content[:, 1] = _strWord(self.elementType)
+        content[:, 2:] = self.connectivity
+        writer.writeWords(_recordBlock(1900, content), self.nElements)
+
+        dim = self.nodeCoords.shape[1]
+        content = np.empty((self.nNodes, 1 + dim), dtype="<i8")
+        content[:, 0] = self.nodeLabels
+        content[:, 1:] = _dblWords(self.nodeCoords)
+        writer.writeWords(_recordBlock(1901, content), self.nNodes)
+
+        crossReferenceKey = 1
+        for sets, (recordType, contRecordType) in (
+            (self.nodeSets(), (1931, 1932)),
+            (self.elementSets(), (1933, 1934)),
+        ):
+            for name, labels in sets.items():
+                # use label cross references as Abaqus does for long names
+                writer.writeRecord(1940, [crossReferenceKey, _strWord(name)])
+                for i, start in enumerate(range(0, max(labels.shape[0], 1), 500)):
+                    part = labels[start : start + 500]
+                    if i == 0:
+                        writer.writeRecord(recordType, np.concatenate(([_strWord(str(crossReferenceKey))], part)))
+                    else:
+                        writer.writeRecord(contRecordType, part)
+                crossReferenceKey += 1
+
+        writer.writeRecord(2001, [0])
+
+    def _incrementHeader(self, increment: int):
+        content = np.zeros(21, dtype="<i8")
+        time = float(increment + 1) / self.nIncrements
+        content[0:2] = _dblWords([time, time])
+        content[4] = 1
+        content[5] = 1
+        content[6] = increment + 1
+        content[10] = _dblWords([1.0 / self.nIncrements])[0]
+        return content
+
+    def _elementOutputBlock(self, increment: int, setName: str, labels: np.ndarray):
+        """Output of S (and SDV) for all elements and qps in a set."""
+
+        nRows = labels.shape[0] * self.nQps
+        elLabels = np.repeat(labels, self.nQps)
+        qps = np.tile(np.arange(1, self.nQps + 1), labels.shape[0])
+
+        header = np.zeros((nRows, 9), dtype="<i8")
+        header[:, 0] = elLabels
+        header[:, 1] = qps
+        header[:, 3] = 1
+        header[:, 5] = 2 if self.is2D else 3
+        header[:, 6] = 1 if self.is2D else 3
+        blocks = [_recordBlock(1, header)]
+
+        scale = float(increment + 1)
+        base = (elLabels * 10 + qps).astype(float)[:, None]
+
+        S = scale * (base + np.arange(self.nStressComponents)[None, :] * 0.1)
+        blocks += self._splitRecords(11, S)
+
+        if self.nSdv:
+            SDV = scale * (base + np.arange(self.nSdv)[None, :] * 0.01)
+            blocks += self._splitRecords(5, SDV)
+
+        words = np.concatenate(blocks, axis=1).ravel()
+
+        definition = np.zeros(3, dtype="<i8")
+        definition[0] = 0
+        definition[1] = _strWord(setName)
+        definition[2] = _strWord(self.elementType)
+        return [(1911, definition)], words, nRows * len(blocks)
+
+    def _splitRecords(self, recordType, values):
+        n = self.maxRecordValues or values.shape[1]
+        return [_recordBlock(recordType, _dblWords(values[:, i : i + n])) for i in range(0, values.shape[1], n)]
+
+    def writeIncrement(self, writer: SyntheticFilWriter, increment: int):
+        """Write a complete increment with element results (S, SDV) per element set
+        and nodal results (U, RF)."""
+
+        writer.writeRecord(2000, self._incrementHeader(increment))
+
+        for setName, labels in self.elementSets().items():
+            records, words, nRecords = self._elementOutputBlock(increment, setName, labels)
+            for recordType, content in records:
+                writer.writeRecord(recordType, content)
+            writer.writeWords(words, nRecords)
+
+        scale = float(increment + 1)
+        definition = np.zeros(3, dtype="<i8")
+        definition[0] = 1
+        definition[1] = _strWord("")
+        writer.writeRecord(1911, definition)
+        content = np.empty((self.nNodes, 1 + self.nDisplacementComponents), dtype="<i8")
+        content[:, 0] = self.nodeLabels
+        content[:, 1:] = _dblWords(scale * 1e-3 * self.nodeCoords[:, : self.nDisplacementComponents])
+        writer.writeWords(_recordBlock(101, content), self.nNodes)
+
+        bottom = self.nodeSets()["BOTTOM"]
+        definition[1] = _strWord("BOTTOM")
+        writer.writeRecord(1911, definition)
+        content = np.empty((bottom.shape[0], 1 + self.nDisplacementComponents), dtype="<i8")
+        content[:, 0] = bottom
+        content[:, 1:] = _dblWords(np.full((bottom.shape[0], self.nDisplacementComponents), -scale))
+        writer.writeWords(_recordBlock(104, content), bottom.shape[0])
+
+        if self.writeEnergies:
+            writer.writeRecord(1999, _dblWords(np.arange(18) * scale))
+
+        writer.writeRecord(2001, [0])
+
+    def write(self, fileName: str, asciiFormat: bool = False):
+        """Write the complete .fil file.
+
+        Parameters
+        ----------
+        fileName
+            The file name.
+        asciiFormat
+            Write the .fil file in ASCII format instead of binary format.
+
+        Returns
+        -------
+        int
+            The number of records written.
+        """
+
+        writer = SyntheticAsciiFilWriter(fileName) if asciiFormat else SyntheticFilWriter(fileName)
+        self.writeModel(writer)
+        for i in range(self.nIncrements):
+            self.writeIncrement(writer, i)
+        writer.close()
+        return writer.nRecords
+
+    def exportDefinition(self):
+        """An export definition (.inp) exercising the nodal and elemental export paths for this model."""
+
+        shape = "quad4" if self.is2D else "hexa8"
+        lines = [
+            "*defineElementType, element={:}, shape={:}".format(self.elementType, shape),
+            "*ensightPerNodeVariableJob, name=U, dimensions=3",
+            "*ensightPerNodeVariableJobEntry, job=U, set=ALL, result=U, fillMissingValuesTo=0.0",
+            "*ensightPerNodeVariableJob, name=RF, dimensions=3",
+            "*ensightPerNodeVariableJobEntry, job=RF, set=ALL, result=RF, fillMissingValuesTo=0.0",
+            "*ensightPerNodeVariableJobEntry, job=RF, setType=nSet, set=BOTTOM, result=RF, fillMissingValuesTo=0.0",
+            "*ensightPerElementVariableJob, name=S, dimensions=6",
+            "*ensightPerElementVariableJob, name=S_qp1, dimensions={:}".format(self.nStressComponents),
+        ]
+        for setName in self.elementSets():
+            lines += [
+                "*computeAverageOverQuadraturePoints, set={:}, result=S".format(setName),
+                "*ensightPerElementVariableJobEntry, job=S, set={:}, result=S, location=computed, which=average{:}".format(
+                    setName, ", transform=voigt2d_to_voigt3d" if self.is2D else ""
+                ),
+                "*ensightPerElementVariableJobEntry, job=S_qp1, set={:}, result=S, location=qps, which=1".format(
+                    setName
+                ),
+            ]
+        return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic Abaqus .fil file and a matching export definition.")
+    parser.add_argument("name", help="The name of the files to be written (name.fil, name.inp)", type=str)
+    parser.add_argument("--elements", help="The approximate number of elements", type=int, default=1000)
+    parser.add_argument("--elementType", help="The Abaqus element type, e.g., C3D8 or CPS4", type=str, default="C3D8")
+    parser.add_argument("--qps", help="The number of quadrature points per element", type=int, default=8)
+    parser.add_argument("--sdv", help="The number of SDVs per quadrature point", type=int, default=0)
+    parser.add_argument("--increments", help="The number of increments", type=int, default=10)
+    parser.add_argument(
+        "--maxRecordValues", help="Split results into continuation records of this length", type=int, default=None
+    )
+    parser.add_argument("--energies", help="Write total energies records", action="store_true")
+    parser.add_argument("--ascii", help="Write the .fil file in ASCII format", action="store_true")
+    args = parser.parse_args()
+
+    model = SyntheticModel(
+        args.elements, args.elementType, args.qps, args.sdv, args.increments, args.maxRecordValues, args.energies
+    )
+    nRecords = model.write(args.name + ".fil", args.ascii)
+    with open(args.name + ".inp", "w") as f:
+        f.write(model.exportDefinition())
+
+    print("{:}.fil: {:} elements, {:} nodes, {:} records".format(args.name, model.nElements, model.nNodes, nRecords))
@@ -13,11 +13,28 @@ import numpy as np
 import math
 from src.exportengine import ExportEngine, filInt
 from src.inputfileparser import parseInputFile, printKeywords
-from src.misc import fileSizeHumanReadable, getCurrentFileSize
-from src.filfileformat import FIL_BATCHSIZE, getCurrentMaxIdxEnd, getFilFileWords
+from src.misc import fileSizeHumanReadable, getCurrentFileSize, ProgressReporter
+from src.filfileformat import (
+    FIL_BATCHSIZE,
+    FIL_ASCII_BATCHSIZE,
+    getCurrentMaxIdxEnd,
+    getFilFileWords,
+    isAsciiFilFile,
+    AsciiFilRecordReader,
+)
+from src.profiling import profiler
+from src.metrics import ConversionMetrics
+from src.history import HistoryExtractor
+from src.inspection import FilInspector
 import time
 import textwrap
 
+
+def getBytesProcessed(currentFileIdx: int, wordIdx: int):
+    """Get the position in the .fil file, which corresponds to a word in the current batch chunk."""
+    return currentFileIdx + (wordIdx // 512) * 513 * 8 + (wordIdx % 512) * 8 + 4
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="A translator for Abaqus .fil files.")
 
@@ -30,11 +47,58 @@ if __name__ == "__main__":
     parser.add_argument(
         "expDef",
         metavar="EXPORTDEFINITION.inp",
-        help="The .inp export definition file",
+        help="The .inp export definition file (not required for --inspect)",
         type=str,
+        nargs="?",
+        default=None,
     )
     parser.add_argument("--keywords", dest="kw", action="store_true", help="print keywords")
     parser.add_argument("--verbose", dest="verbose", action="store_true", help="print verbose output")
+    parser.add_argument("--quiet", dest="quiet", action="store_true", help="suppress the output per increment")
+    parser.add_argument(
+        "--progress",
+        dest="progress",
+        action="store_true",
+        help="print a single progress line with the throughput (implies --quiet)",
+    )
+    parser.add_argument(
+        "--profile",
+        dest="profile",
+        action="store_true",
+        help="collect timings per record type, stage and export job, print them and write them to a .json file",
+    )
+    parser.add_argument(
+        "--print-energies",
+        dest="printEnergies",
+        action="store_true",
+        help="print the total energies as a table, in addition to the energy history file",
+    )
+    parser.add_argument(
+        "--history",
+        dest="history",
+        action="store_true",
+        help="only extract the time histories defined by *timeHistory (fast, no Ensight export, no .lck waiting)",
+    )
+    parser.add_argument(
+        "--inspect",
+        dest="inspect",
+        action="store_true",
+        help="only read the model setup, and print the heading, element types, sets and label cross references",
+    )
+    parser.add_argument(
+        "--inspect-results",
+        dest="inspectResults",
+        action="store_true",
+        help="as --inspect, and additionally list the results per set and element type of the first increment",
+    )
+    parser.add_argument(
+        "--metrics-out",
+        dest="metricsOut",
+        metavar="FILE.jsonl",
+        help="write metrics per increment and a final summary as JSON lines",
+        type=str,
+        default=None,
+    )
 
     #print keywords on argprase error:
     if len(sys.argv) == 1:
@@ -46,6 +110,18 @@ if __name__ == "__main__":
     fn = args.fil
     jobFile = args.expDef
 
+    if args.inspect or args.inspectResults:
+        inspector = FilInspector(fn)
+        inspector.inspect(sampleResults=args.inspectResults)
+        inspector.printSummary()
+        exit(0)
+
+    if jobFile is None:
+        parser.error("the export definition file is required")
+
+    if args.profile:
+        profiler.enable()
+
     exportJobs = parseInputFile(jobFile)
 
     exportName = "".join(fn.split("/")[-1].split(".")[-2])
@@ -54,18 +130,58 @@ if __name__ == "__main__":
     print("| Opening file {:<64}|".format(os.path.basename(fn)))
     print("+" + "-" * 78 + "+")
 
-    exportEngine = ExportEngine(exportJobs, exportName, verbose=args.verbose)
+    if args.history:
+        historyExtractor = HistoryExtractor(exportJobs, exportName)
+        historyExtractor.extract(fn)
+        for fileName in historyExtractor.write():
+            print("time history written to {:}".format(fileName))
+        print("|{:<60}{:>18}|".format("increments:", len(historyExtractor.increments)))
+        print("|{:<60}{:>18}|".format("increment structures scanned:", historyExtractor.nTemplates))
+        print("+" + "-" * 78 + "+")
+        exit(0)
+
+    quiet = args.quiet or args.progress
+    exportEngine = ExportEngine(
+        exportJobs, exportName, verbose=args.verbose, quiet=quiet, printEnergies=args.printEnergies
+    )
+    progress = ProgressReporter(fn) if args.progress else None
+    metrics = ConversionMetrics(args.metricsOut) if args.metricsOut else None
 
     currentFileSize = getCurrentFileSize(fn)
-    numberOfBatchSteps = math.ceil(currentFileSize / FIL_BATCHSIZE)
+    asciiFormat = isAsciiFilFile(fn)
+    numberOfBatchSteps = math.ceil(currentFileSize / (FIL_ASCII_BATCHSIZE if asciiFormat else FIL_BATCHSIZE))
 
     print("file has a size of {:}".format(fileSizeHumanReadable(currentFileSize)))
+    if asciiFormat:
+        print("file is written in ASCII format")
     print("file will be processed in {:} batch(es)".format(numberOfBatchSteps))
 
     currentFileIdx = 0
     wordIdx = 0
+    nRecords = 0
 
-    parseFile = True
+    if asciiFormat:
+        # ASCII .fil files are decoded batch wise to the same records; waiting for an ongoing analysis is not supported
+        asciiRecords = AsciiFilRecordReader(fn)
+        try:
+            for recordLength, recordType, recordContent in asciiRecords:
+                exportEngine.computeRecord(recordLength, recordType, recordContent)
+                nRecords += 1
+
+                if metrics:
+                    metrics.countRecord(recordType)
+                    if recordType == 2001:
+                        metrics.writeIncrement(
+                            exportEngine, asciiRecords.bytesProcessed, modelSetup=exportEngine.nIncrements == 0
+                        )
+
+                if progress and not nRecords % 8192:
+                    progress.update(asciiRecords.bytesProcessed, nRecords, exportEngine.nIncrements)
+
+        except KeyboardInterrupt:
+            print("Interrupted by user")
+
+    parseFile = not asciiFormat
     while parseFile:
         try:
             currentFileSize = getCurrentFileSize(
@@ -74,7 +190,8 @@ if __name__ == "__main__":
 
             if currentFileIdx < currentFileSize:
                 idxEnd = getCurrentMaxIdxEnd(fn, currentFileIdx, currentFileSize)
-                words = getFilFileWords(fn, currentFileIdx, idxEnd)
+                with profiler.measure("stage", "read", nBytes=idxEnd - currentFileIdx):
+                    words = getFilFileWords(fn, currentFileIdx, idxEnd)
 
                 while wordIdx < len(words):
                     recordLength = filInt(words[wordIdx])[0]
@@ -86,7 +203,7 @@ if __name__ == "__main__":
                             currentFileSize = getCurrentFileSize(
                                 fn,
                             )
-                            idxEnd = getCurrentMaxIdxEnd(fn, currentFileIdx)
+                            idxEnd = getCurrentMaxIdxEnd(fn, currentFileIdx, currentFileSize)
                             words = getFilFileWords(fn, currentFileIdx, idxEnd)
                             continue
                         else:
@@ -108,7 +225,7 @@ if __name__ == "__main__":
                                 currentFileSize = getCurrentFileSize(
                                     fn,
                                 )
-                                idxEnd = getCurrentMaxIdxEnd(fn, currentFileIdx)
+                                idxEnd = getCurrentMaxIdxEnd(fn, currentFileIdx, currentFileSize)
                                 words = getFilFileWords(fn, currentFileIdx, idxEnd)
 
                                 continue
@@ -125,6 +242,19 @@ if __name__ == "__main__":
                     recordContent = words[wordIdx + 2 : wordIdx + recordLength]
                     success = exportEngine.computeRecord(recordLength, recordType, recordContent)
                     wordIdx += recordLength
+                    nRecords += 1
+
+                    if metrics:
+                        metrics.countRecord(recordType)
+                        if recordType == 2001:
+                            metrics.writeIncrement(
+                                exportEngine,
+                                getBytesProcessed(currentFileIdx, wordIdx),
+                                modelSetup=exportEngine.nIncrements == 0,
+                            )
+
+                    if progress and not nRecords % 8192:
+                        progress.update(getBytesProcessed(currentFileIdx, wordIdx), nRecords, exportEngine.nIncrements)
 
                 # clean finish of a batchChunk
                 if wordIdx == len(words):
@@ -145,6 +275,14 @@ if __name__ == "__main__":
 
     exportEngine.finalize()
 
+    bytesProcessed = asciiRecords.bytesProcessed if asciiFormat else getBytesProcessed(currentFileIdx, wordIdx)
+
+    if progress:
+        progress.finish(bytesProcessed, nRecords, exportEngine.nIncrements)
+
+    if metrics:
+        metrics.writeSummary(exportEngine, bytesProcessed)
+
     print("+" + "-" * 78 + "+")
     print("| Summary of {:<66}|".format(os.path.basename(fn)))
     print("+" + "-" * 78 + "+")
@@ -157,7 +295,20 @@ if __name__ == "__main__":
     print("|{:<60}{:>18}|".format("node sets:", len(exportEngine.nSets)))
     for setName, nSet in exportEngine.nSets.items():
         print("|{:<4}{:<46}{:10}{:>9}    nodes|".format(" ", setName, "", len(nSet.nodes)))
+    notBuiltSets = [name for name in exportEngine.elSetDefinitions if name not in exportEngine.elSets] + [
+        "NSET_" + name for name in exportEngine.nSetDefinitions if name not in exportEngine.nSets
+    ]
+    if notBuiltSets:
+        print("|{:<60}{:>18}|".format("sets not built:", len(notBuiltSets)))
+        for setName in notBuiltSets:
+            print("|{:<4}{:<74}|".format(" ", setName))
     print("|{:<60}{:>18}|".format("increments:", exportEngine.nIncrements))
     print("+" + "-" * 78 + "+")
     print("|{:78}|".format(" Finished"))
     print("+" + "-" * 78 + "+")
+
+    if args.profile:
+        profiler.printTable()
+        profileFileName = exportName + "_profile.json"
+        profiler.dump(profileFileName)
+        print("profile written to {:}".format(profileFileName))
@@ -0,0 +1,121 @@
+"""
+Copyright (C) 2019 Matthias Neuner <matthias.neuner@uibk.ac.at>
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+"""
+
+import numpy as np
+from prettytable import PrettyTable
+
+# the total energies in a 1999 record, in the order of the record
+energyTypes = [
+    ("ALLKE", "Total kinetic energy (ALLKE)."),
+    ("ALLSE", "Total recoverable (elastic) strain energy (ALLSE)."),
+    ("ALLWK", "Total external work (ALLWK)."),
+    ("ALLPD", "Total plastic dissipation (ALLPD)."),
+    ("ALLCD", "Total viscoelastic dissipation (ALLCD)."),
+    ("ALLVD", "Total viscous dissipation (ALLVD)."),
+    ("ALLKL", "Total loss of kinetic energy at impacts (ALLKL) (S)."),
+    ("ALLAE", "Total artificial strain energy (ALLAE)."),
+    ("ALLDC", "Total distortion control dissipation energy (ALLDC)."),
+    ("ALLEE", "Total electrostatic energy (ALLEE) (S)."),
+    ("ALLIE", "Total strain energy (ALLIE)."),
+    ("ETOTAL", "Total energy balance (ETOTAL)."),
+    ("ALLFD", "Total energy dissipated through frictional effects (ALLFD)."),
+    ("ALLJD", "Total electrical energy dissipated in conductors (ALLJD) (S)."),
+    ("DMASS", "Percent change in mass (DMASS)."),
+    ("ALLDMD", "Total damage dissipation (ALLDMD)."),
+    ("ALLIHE", "Internal heat energy (ALLIHE) (E)."),
+    ("ALLHF", "External heat energy (ALLHF) (E)."),
+]
+
+_timeColumns = ["step", "increment", "stepTime", "totalTime"]
+
+
+def printEnergyTable(values: np.ndarray):
+    """Print the total energies of a 1999 record as a table.
+
+    Parameters
+    ----------
+    values
+        The energies.
+    """
+
+    # make a pretty table with a width of 40 characters
+    t = PrettyTable(max_width=80, max_table_width=80)
+    t.field_names = ["Energy type", "Value"]
+    for value, (_, energyType) in zip(values, energyTypes):
+        t.add_row([energyType, value])
+
+    # format values with only 5 digits
+    t.float_format = "5.2"
+
+    print(t)
+
+
+class EnergyHistory:
+    def __init__(self, fileName: str, fileFormat: str = "csv"):
+        """The time series of the total energies. The file is only created with the first energy record.
+        A .csv file is streamed, i.e., one line is written per energy record. A .npy file,
+        an array with one row per energy record, is written by close().
+
+        Parameters
+        ----------
+        fileName
+            The name of the file without extension.
+        fileFormat
+            csv or npy.
+        """
+
+        if fileFormat not in ("csv", "npy"):
+            raise Exception("Energy history format must be either 'csv' or 'npy'!")
+
+        self.fileName = fileName + "." + fileFormat
+        self.fileFormat = fileFormat
+        self.rows = []
+        self._f = None
+
+    def append(self, step: int, increment: int, stepTime: float, totalTime: float, values: np.ndarray):
+        """Append the energies of a 1999 record.
+
+        Parameters
+        ----------
+        step
+            The step number of the current increment.
+        increment
+            The increment number within the step.
+        stepTime
+            The step time.
+        totalTime
+            The total time.
+        values
+            The energies.
+        """
+
+        row = np.full(len(_timeColumns) + len(energyTypes), np.nan)
+        row[:4] = step, increment, stepTime, totalTime
+        n = min(values.shape[0], len(energyTypes))
+        row[4 : 4 + n] = values[:n]
+
+        if self.fileFormat == "npy":
+            self.rows.append(row)
+            return
+
+        if self._f is None:
+            self._f = open(self.fileName, "w")
+            self._f.write(",".join(_timeColumns + [name for name, _ in energyTypes]) + "\n")
+        self._f.write("{:.0f},{:.0f},".format(row[0], row[1]) + ",".join("{:.10g}".format(x) for x in row[2:]) + "\n")
+
+    def flush(self):
+        """Make all energies written so far available in the .csv file."""
+
+        if self._f is not None:
+            self._f.flush()
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+        elif self.rows:
+            np.save(self.fileName, np.asarray(self.rows))
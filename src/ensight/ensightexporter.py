@@ -7,9 +7,15 @@ file, You can obtain one at https://mozilla.org/MPL/2.0/.
 """
 
 import numpy as np
+import time
+from concurrent.futures import ThreadPoolExecutor
 import src.ensight.ensightgoldformat as es
-from src.modeldatabase import Node, NSet, Element, ElSet
-from src.misc import sliceFromString, makeExtractionFunction
+from src.modeldatabase import Node, NSet, Element, ElSet, LabelIndex
+from src.misc import sliceFromString, makeExtractionFunction, evaluateExtractionFunction
+from src.transforms import ComponentTransform, getTransform
+from src.profiling import profiler
+from src.xdmf.xdmfformat import XdmfCase
+from src.resultstore import ResultStoreWriter
 
 
 class _EnsightExportJob:
@@ -46,6 +52,7 @@ class _EnsightPerSetJobEntry:
         which: str,
         extractionSlice: slice = None,
         extractionFunction: callable = None,
+        transform: ComponentTransform = None,
         offset: int = None,
         fillMissingValuesTo=None,
     ):
@@ -69,6 +76,8 @@ class _EnsightPerSetJobEntry:
             (Optional) A slice for extracting the result from a larger array.
         extractionFunction
             (Optional) A function for extracting the result from a larger array.
+        transform
+            (Optional) A built-in transform, applied after the extraction.
         offset
             (Optional) An offset.
         fillMissingValuesTo
@@ -80,18 +89,130 @@ class _EnsightPerSetJobEntry:
         self.setName = setName
         self.extractionSlice = extractionSlice
         self.extractionFunction = extractionFunction
+        self.transform = transform
         self.offset = offset
         self.result = result
         self.location = location
         self.which = which
         self.fillMissingValuesTo = fillMissingValuesTo if fillMissingValuesTo is None else float(fillMissingValuesTo)
 
+        # resolved after the model is set up
+        self.set = None
+        self.gatherRows = None
+        self.outputBuffer = None
+        self.gatherBuffers = None
+
+
+class _EnsightPerElementPlanEntry:
+    def __init__(
+        self,
+        setName: str,
+        partID: int,
+        result: str,
+        location: str,
+        which,
+        elementTypes: dict[str, int],
+        columns: list[slice],
+        extractionFunction: callable,
+        transform: ComponentTransform,
+        dimensions: int,
+    ):
+        """The compiled export of a per element job entry, which contains everything that is fixed
+        once the model is set up. Per increment, it is only executed on the dense element results.
+
+        Parameters
+        ----------
+        setName
+            The name of the element set.
+        partID
+            The resolved Ensight part ID of the element set.
+        result
+            The name of the result.
+        location
+            Where to find this result (computed, qps, ...).
+        which
+            Which (number of quadrature point, ...).
+        elementTypes
+            The number of elements per element type in the set.
+        columns
+            The column slices, which are applied consecutively to the result array.
+        extractionFunction
+            (Optional) A function applied on all extracted results at once.
+        transform
+            (Optional) A built-in transform, applied after the extraction function.
+        dimensions
+            The output dimension.
+
+        The output of each element type is written to a preallocated float32 buffer, which is reused in every
+        increment. Buffers are Fortran ordered, so that each component is contiguous, as required by Ensight.
+        """
+
+        self.setName = setName
+        self.partID = partID
+        self.result = result
+        self.location = location
+        self.which = which
+        self.columns = columns
+        self.extractionFunction = extractionFunction
+        self.transform = transform
+        self.dimensions = dimensions
+        self.outputShapes = {elType: (nElements, dimensions) for elType, nElements in elementTypes.items()}
+        self.outputBuffers = {elType: _createOutputBuffer(shape) for elType, shape in self.outputShapes.items()}
+
+
+def _createOutputBuffer(shape: tuple):
+    """Create a zero initialized, Fortran ordered float32 output buffer. Components, which are never written
+    (e.g., unmapped components of transforms), remain zero."""
+
+    return np.zeros(shape, dtype=np.float32, order="F")
+
 
 class EnsightExporter:
-    def __init__(self, caseName, inputFile):
-        self.ensightCase = es.EnsightChunkWiseCase(".", caseName)
+    def __init__(self, caseName, inputFile, quiet=False):
+        self._quiet = quiet
+        caseOptions = {}
+        for options in inputFile["*ensightCaseOptions"]:
+            caseOptions.update(options)
+
+        fileMode = caseOptions.get("fileMode", "single")
+        if fileMode not in ("single", "perStep"):
+            raise Exception("Invalid fileMode '{:}' in *ensightCaseOptions, use single or perStep.".format(fileMode))
+
+        outputFormat = caseOptions.get("format", "ensight")
+        if outputFormat == "ensight":
+            caseType = es.EnsightChunkWiseCase
+        elif outputFormat == "xdmf":
+            caseType = XdmfCase
+        else:
+            raise Exception("Invalid format '{:}' in *ensightCaseOptions, use ensight or xdmf.".format(outputFormat))
+
+        self.ensightCase = caseType(
+            ".",
+            caseName,
+            writeTransientSingleFiles=fileMode == "single",
+            stepFileNameDigits=caseOptions.get("stepFileNameDigits", 4),
+        )
+
+        # all exported variables are additionally written to a result store, if defined
+        self.resultStore = None
+        for options in inputFile["*exportResultStore"]:
+            self.resultStore = ResultStoreWriter(options.get("directory", caseName + "_store"))
+
+        # the case file is updated during the conversion after a number of increments and/or seconds
+        self.caseUpdateInterval = caseOptions.get("updateInterval", 10)
+        self.caseUpdateIntervalSeconds = caseOptions.get("updateIntervalSeconds", None)
+        self._nIncrementsSinceCaseUpdate = 0
+        self._lastCaseUpdate = time.monotonic()
         self.ensightCaseDiscardTimeMarks = False
 
+        # the export jobs of an increment are optionally created concurrently; each job only touches its own buffers
+        self.exportThreads = caseOptions.get("exportThreads", 1)
+        if self.exportThreads < 1:
+            raise Exception(
+                "Invalid exportThreads {:} in *ensightCaseOptions, use 1 or more.".format(self.exportThreads)
+            )
+        self._threadPool = ThreadPoolExecutor(self.exportThreads) if self.exportThreads > 1 else None
+
         self.perElementJobs = self._collectExportJobs(inputFile["*ensightPerElementVariableJob"])
         self.perNodeJobs = self._collectExportJobs(inputFile["*ensightPerNodeVariableJob"])
 
@@ -110,49 +231,154 @@ class EnsightExporter:
 
         self._setToPartIDMapping = {}
 
+        # only sets referenced by jobs, and the explicitly included sets, are exported as parts
+        self.exportOnlyReferencedParts = bool(inputFile["*ensightExportOnlyReferencedParts"])
+        self.includedPartSetNames = set()
+        for definition in inputFile["*ensightExportOnlyReferencedParts"]:
+            for line in definition.get("data", []):
+                self.includedPartSetNames.update(line)
+
+        self._exportedElSets = None
+        self._exportedNSets = None
+
         self._nodes = None
+        self._nodeIndex = None
         self._elements = None
         self._nSets = None
         self._elSets = None
 
     def setupModel(
         self,
-        nodes: list[Node],
+        nodes: dict[int, Node],
         nSets: dict[str, NSet],
         elements: dict[int, Element],
         elSets: dict[str, ElSet],
+        nodeIndex: LabelIndex,
     ):
         self._nodes = nodes
+        self._nodeIndex = nodeIndex
         self._elements = elements
         self._nSets = nSets
         self._elSets = elSets
 
+        self._assignPartIDs()
+        self._setupPerNodeJobEntries()
+        self._compilePerElementJobPlans()
+
+    def getReferencedSetNames(self):
+        """Get the names of all sets, which are referenced by export jobs,
+        including the sets explicitly included as parts.
+
+        Returns
+        -------
+        tuple[set, set]
+            The names of the element sets and the node sets.
+        """
+
+        elSetNames = set()
+        nSetNames = set()
+
+        for exportJob in self.perNodeJobs.values():
+            for setName, jobEntry in exportJob.entries.items():
+                if jobEntry.setType.lower() == "elset":
+                    elSetNames.add(setName)
+                else:
+                    nSetNames.add(setName)
+
+        for exportJob in self.perElementJobs.values():
+            elSetNames.update(exportJob.entries.keys())
+
+        # the type of the included sets is not known in advance
+        elSetNames.update(self.includedPartSetNames)
+        nSetNames.update(self.includedPartSetNames)
+
+        return elSetNames, nSetNames
+
     def setCurrentTime(self, currentTime: float):
         self.ensightCase.setCurrentTime(currentTime)
+        if self.resultStore:
+            self.resultStore.setCurrentTime(currentTime)
 
     def exportGeometry(
         self,
     ):
         geometryTimesetNumber = None
-        geometry = self._createEnsightGeometryFromModel(self._nodes, self._nSets, self._elements, self._elSets)
+        geometry = self._createEnsightGeometryFromModel(
+            self._nodes, self._exportedNSets, self._elements, self._exportedElSets
+        )
         self.ensightCase.writeGeometryTrendChunk(geometry, geometryTimesetNumber)
+        if self.resultStore:
+            self.resultStore.writeGeometry(geometry)
 
     def exportPerNodeVariables(self, nodeResults):
-        for exportJob in self.perNodeJobs.values():
-            enSightVar = self._createEnsightPerNodeVariableFromPerNodeJob(exportJob, nodeResults)
-            if enSightVar:
-                self.ensightCase.writeVariableTrendChunk(enSightVar, exportJob.timeSetID)
-                del enSightVar
+        self._runExportJobs(
+            list(self.perNodeJobs.values()),
+            lambda exportJob: self._createEnsightPerNodeVariableFromPerNodeJob(exportJob, nodeResults),
+        )
 
     def exportPerElementVariables(self, elementResults):
-        for exportJob in self.perElementJobs.values():
-            enSightVar = self._createEnsightPerElementVariableFromPerElementJob(exportJob, elementResults)
+        self._runExportJobs(
+            list(self.perElementJobs.values()),
+            lambda exportJob: self._createEnsightPerElementVariableFromPerElementJob(exportJob, elementResults),
+        )
+
+    def _runExportJobs(self, exportJobs: list, createVariable: callable):
+        """Create the Ensight variables of export jobs, and write them in the order of the jobs.
+        With a thread pool, the variables are created concurrently, while the finished variables are written,
+        so the written files do not depend on the number of threads.
+
+        Parameters
+        ----------
+        exportJobs
+            The export jobs.
+        createVariable
+            The function creating the Ensight variable of an export job.
+        """
+
+        if not self._quiet:
+            for exportJob in exportJobs:
+                for i, setName in enumerate(exportJob.entries.keys()):
+                    print(" {:<20} ... {:<28}".format(exportJob.exportName if not i else "", setName))
+
+        def runExportJob(exportJob):
+            with profiler.measure("export job", exportJob.exportName):
+                return createVariable(exportJob)
+
+        # tracing memory is not possible for concurrent measurements
+        if self._threadPool is None or profiler.traceMemory:
+            enSightVars = map(runExportJob, exportJobs)
+        else:
+            futures = [self._threadPool.submit(runExportJob, exportJob) for exportJob in exportJobs]
+            enSightVars = (future.result() for future in futures)
+
+        for exportJob, enSightVar in zip(exportJobs, enSightVars):
             if enSightVar:
                 self.ensightCase.writeVariableTrendChunk(enSightVar, exportJob.timeSetID)
+                if self.resultStore:
+                    self.resultStore.writeVariable(enSightVar)
                 del enSightVar
 
+    def updateCase(self):
+        """Called after each exported increment. Writes the case file (and flushes all data files),
+        if the update interval in increments or seconds has elapsed since the last update."""
+
+        self._nIncrementsSinceCaseUpdate += 1
+
+        if (self.caseUpdateInterval and self._nIncrementsSinceCaseUpdate >= self.caseUpdateInterval) or (
+            self.caseUpdateIntervalSeconds is not None
+            and time.monotonic() - self._lastCaseUpdate >= self.caseUpdateIntervalSeconds
+        ):
+            self.finalize(closeFileHandles=False)
+
     def finalize(self, closeFileHandles):
         self.ensightCase.finalize(self.ensightCaseDiscardTimeMarks, closeFileHandles)
+        if self.resultStore:
+            self.resultStore.finalize(closeFileHandles)
+        if closeFileHandles and self._threadPool:
+            self._threadPool.shutdown()
+            self._threadPool = None
+        self._nIncrementsSinceCaseUpdate = 0
+        self._lastCaseUpdate = time.monotonic()
 
     def _collectExportJobs(self, jobDefinitions):
         """Collect all defined per element jobs in a dictionary
@@ -182,7 +408,7 @@ class EnsightExporter:
             which = entry["which"]
 
             if location == "qps":
-                which = int(w)
+                which = int(which)
 
             perSetJob = _EnsightPerSetJobEntry(
                 job,
@@ -192,7 +418,12 @@ class EnsightExporter:
                 location=location,
                 which=which,
                 extractionSlice=sliceFromString(entry["values"]) if "values" in entry else None,
-                extractionFunction=makeExtractionFunction(entry["f(x)"]) if "f(x)" in entry else None,
+                extractionFunction=(
+                    makeExtractionFunction(entry["f(x)"], mode=entry.get("f(x)Mode", "rows"))
+                    if "f(x)" in entry
+                    else None
+                ),
+                transform=getTransform(entry["transform"]) if "transform" in entry else None,
                 offset=None,
             )
 
@@ -226,7 +457,12 @@ class EnsightExporter:
                 location=None,
                 which=None,
                 extractionSlice=sliceFromString(entry["values"]) if "values" in entry else None,
-                extractionFunction=makeExtractionFunction(entry["f(x)"]) if "f(x)" in entry else None,
+                extractionFunction=(
+                    makeExtractionFunction(entry["f(x)"], mode=entry.get("f(x)Mode", "rows"))
+                    if "f(x)" in entry
+                    else None
+                ),
+                transform=getTransform(entry["transform"]) if "transform" in entry else None,
                 offset=None,  # currently not used
                 fillMissingValuesTo=entry.get("fillMissingValuesTo", None),
             )
@@ -235,140 +471,283 @@ class EnsightExporter:
 
         return perNodeVariableJobs
 
-    def _createEnsightPerNodeVariableFromPerNodeJob(self, exportJob, nodeResults):
-        partsDict = {}
-        for i, (setName, jobEntry) in enumerate(exportJob.entries.items()):
-            print(" {:<20} ... {:<28}".format(exportJob.exportName if not i else "", setName))
-            theSet = None
+    def _setupPerNodeJobEntries(self):
+        """Resolve the sets of all per node job entries, determine the rows of the set nodes
+        in the dense nodal results once, and allocate the output buffers."""
 
-            if jobEntry.setType == "elSet":
-                elSet = self._elSets[setName]
-                theSet = elSet
+        for exportJob in self.perNodeJobs.values():
+            for setName, jobEntry in exportJob.entries.items():
+                try:
+                    if jobEntry.setType.lower() == "elset":
+                        theSet = self._elSets[setName]
+                        setNodeLabels = list(theSet.reducedNodes.keys())
+                    else:  # it"s a node set !
+                        theSet = self._nSets[setName]
+                        setNodeLabels = [node.label for node in theSet.nodes]
+                except KeyError:
+                    raise Exception(
+                        "Set {:} for Ensight per node job '{:}' does not exist in the model.".format(
+                            setName, exportJob.exportName
+                        )
+                    )
 
-                # collect all result, do not yet make a numpy array, as the results array might be ragged, or not present for all nodes
-                setNodeIndices = elSet.reducedNodes.keys()
+                jobEntry.set = theSet
+                jobEntry.gatherRows, _ = self._nodeIndex.getRows(setNodeLabels)
+                jobEntry.outputBuffer = _createOutputBuffer((jobEntry.gatherRows.shape[0], exportJob.dimensions))
 
-                results = [nodeResults[jobEntry.result].get(node, None) for node in setNodeIndices]
+    def _createEnsightPerNodeVariableFromPerNodeJob(self, exportJob, nodeResults):
+        partsDict = {}
+        d = exportJob.dimensions
+        for setName, jobEntry in exportJob.entries.items():
+            rows = jobEntry.gatherRows
+            nodeResult = nodeResults.get(jobEntry.result, None)
 
-            else:  # it"s a node set !
-                nSet = self._nSets[setName]
-                theSet = nSet
-                results = [nodeResults[jobEntry.result].get(node.label, None) for node in nSet.nodes]
+            if nodeResult is not None:
+                results, mask = self._gatherNodeResult(jobEntry, nodeResult)
+            else:
+                results = np.zeros((rows.shape[0], 0))
+                mask = np.zeros((rows.shape[0], 0), dtype=bool)
 
             if jobEntry.extractionSlice is not None:
-                results = [r[jobEntry.extractionSlice] if r is not None else r for r in results]
-
-            if jobEntry.extractionFunction is not None:
-                results = [perSetJobEntry.extractionFunction(r) if r is not None else r for r in results]
+                results = results[:, jobEntry.extractionSlice]
+                mask = mask[:, jobEntry.extractionSlice]
+
+            if jobEntry.extractionFunction is not None or jobEntry.transform is not None:
+                if mask.any():
+                    hasResult = mask.any(axis=1)
+                    if jobEntry.extractionFunction is not None:
+                        results = evaluateExtractionFunction(jobEntry.extractionFunction, results)
+                    if jobEntry.transform is not None:
+                        results = jobEntry.transform(results)
+                    mask = np.repeat(hasResult[:, np.newaxis], results.shape[1], axis=1)
+                else:
+                    # no node of the set has the result, so the extracted width is given by the transform or the job
+                    width = jobEntry.transform.nComponentsOut if jobEntry.transform is not None else d
+                    results = np.zeros((rows.shape[0], width))
+                    mask = np.zeros(results.shape, dtype=bool)
 
             if jobEntry.fillMissingValuesTo is not None:
-                defaultResult = np.full((exportJob.dimensions,), jobEntry.fillMissingValuesTo)
-                d = exportJob.dimensions
-
-                # first fill up all the results we have
-                results = [
-                    (
-                        np.append(
-                            r,
-                            (jobEntry.fillMissingValuesTo,) * (d - r.shape[0]),
-                        )
-                        if r is not None and r.shape[0] != d
-                        else r
-                    )
-                    for r in results
-                ]
-
-                # then set all those we don't have for certain nodes
-                results = [defaultResult if r is None else r for r in results]
+                # missing components are filled up
+                setVariableDimensions = max(d, results.shape[1])
 
-            try:
-                results = np.asarray(results, dtype=float)
-            except:
+            elif not mask.all():
                 raise Exception(
                     "Failed to set up all results {:} for all nodes in {:}. Try using fillMissingValuesTo= option?".format(
                         jobEntry.result, setName
                     )
                 )
+            else:
+                setVariableDimensions = results.shape[1]
 
-            setVariableDimensions = results.shape[1]
-
-            if setVariableDimensions != exportJob.dimensions:
+            if setVariableDimensions != d:
                 raise Exception(
                     "Variable dimension {:} in set {:} does not match the defined job dimension of {:} in job '{:}'. Consider using the 'fillMissingValuesTo' option for the export entry.".format(
                         setVariableDimensions,
                         setName,
-                        exportJob.dimensions,
+                        d,
                         exportJob.exportName,
                     )
                 )
 
-            partsDict[self._setToPartIDMapping[theSet]] = ("coordinates", results)
+            output = jobEntry.outputBuffer
+            if jobEntry.fillMissingValuesTo is not None and not (results.shape[1] == d and mask.all()):
+                # fill up missing components and missing nodes at once
+                output.fill(jobEntry.fillMissingValuesTo)
+                np.copyto(output[:, : results.shape[1]], results, casting="same_kind", where=mask)
+            else:
+                np.copyto(output, results, casting="same_kind")
+
+            partsDict[self._setToPartIDMapping[jobEntry.set]] = ("coordinates", output)
 
         if partsDict or exportJob.writeEmptyTimeSteps:
             return es.EnsightPerNodeVariable(exportJob.exportName, exportJob.dimensions, partsDict)
         else:
             return None
 
+    def _gatherNodeResult(self, jobEntry: _EnsightPerSetJobEntry, nodeResult):
+        """Gather the rows of the set nodes from the dense nodal result into the gather buffers of the job entry.
+        The buffers are reused, as long as the number of components of the result does not change.
+
+        Parameters
+        ----------
+        jobEntry
+            The job entry.
+        nodeResult
+            The dense nodal result.
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray]
+            The gathered values and mask.
+        """
+
+        shape = (jobEntry.gatherRows.shape[0], nodeResult.values.shape[1])
+        if jobEntry.gatherBuffers is None or jobEntry.gatherBuffers[0].shape != shape:
+            jobEntry.gatherBuffers = (
+                np.empty(shape, dtype=nodeResult.values.dtype),
+                np.empty(shape, dtype=bool),
+            )
+
+        values, mask = jobEntry.gatherBuffers
+        np.take(nodeResult.values, jobEntry.gatherRows, axis=0, out=values)
+        np.take(nodeResult.mask, jobEntry.gatherRows, axis=0, out=mask)
+
+        return values, mask
+
+    def _compilePerElementJobPlans(self):
+        """Compile all per element jobs to execution plans, one plan entry per job entry.
+        Dimension mismatches are detected here already, if the extracted width is known in advance."""
+
+        for exportJob in self.perElementJobs.values():
+            exportJob.plan = []
+            for setName, jobEntry in exportJob.entries.items():
+                if setName not in self._elSets:
+                    raise Exception(
+                        "Set {:} for Ensight per element job '{:}' does not exist in the model.".format(
+                            setName, exportJob.exportName
+                        )
+                    )
+                elSet = self._elSets[setName]
+
+                columns = []
+                if jobEntry.offset:
+                    columns.append(slice(jobEntry.offset, None))
+                if jobEntry.extractionSlice:
+                    columns.append(jobEntry.extractionSlice)
+
+                width = self._getExtractedWidth(jobEntry)
+                if width is not None and width != exportJob.dimensions:
+                    raise Exception(
+                        "Variable dimension {:} in set {:} does not match the defined job dimension of {:} in job '{:}'.".format(
+                            width,
+                            setName,
+                            exportJob.dimensions,
+                            exportJob.exportName,
+                        )
+                    )
+
+                exportJob.plan.append(
+                    _EnsightPerElementPlanEntry(
+                        setName,
+                        self._setToPartIDMapping[elSet],
+                        jobEntry.result,
+                        jobEntry.location,
+                        jobEntry.which,
+                        {elType: len(elements) for elType, elements in elSet.elementsByShape.items()},
+                        columns,
+                        jobEntry.extractionFunction,
+                        jobEntry.transform,
+                        exportJob.dimensions,
+                    )
+                )
+
+    def _getExtractedWidth(self, jobEntry: _EnsightPerSetJobEntry):
+        """Determine the number of components exported by a job entry, if possible without knowing the results.
+
+        Parameters
+        ----------
+        jobEntry
+            The job entry.
+
+        Returns
+        -------
+        int
+            The number of components, or None if it is determined by the results.
+        """
+
+        extractionSlice = jobEntry.extractionSlice
+        width = None
+
+        if not jobEntry.offset and extractionSlice is not None:
+            if extractionSlice.start >= 0 and extractionSlice.stop >= 0:
+                width = max(extractionSlice.stop - extractionSlice.start, 0)
+
+        if width is not None and jobEntry.extractionFunction is not None:
+            try:
+                width = evaluateExtractionFunction(jobEntry.extractionFunction, np.zeros((1, width))).shape[1]
+            except Exception:
+                width = None
+
+        if jobEntry.transform is not None:
+            if width is not None and width != jobEntry.transform.nComponentsIn:
+                raise Exception(
+                    "Transform {:} expects {:} components, but {:} components are extracted in set {:}.".format(
+                        jobEntry.transform.name, jobEntry.transform.nComponentsIn, width, jobEntry.setName
+                    )
+                )
+            width = jobEntry.transform.nComponentsOut
+
+        return width
+
     def _createEnsightPerElementVariableFromPerElementJob(self, exportJob, elementResults):
         partsDict = {}
-        for i, (setName, perSetJobEntry) in enumerate(exportJob.entries.items()):
-            elSet = self._elSets[setName]
-            result = perSetJobEntry.result
-            location = perSetJobEntry.location
-            which = perSetJobEntry.which
-
-            setVariableDimensions = None
+        for planEntry in exportJob.plan:
+            setName = planEntry.setName
+            result = planEntry.result
+            location = planEntry.location
+            which = planEntry.which
 
             incrementVariableResults = elementResults[result][setName]
             incrementVariableResultsArrays = {}
 
-            print(" {:<20} ... {:<28}".format(exportJob.exportName if not i else "", setName))
+            for elType, outputShape in planEntry.outputShapes.items():
+                if elType not in incrementVariableResults:
+                    continue
 
-            for elType, elDict in incrementVariableResults.items():
                 try:
-                    results = np.asarray(
-                        [elDict[el.label][location][which] for el in elSet.elementsByShape[elType]],
-                        dtype=float,
-                    )
-                except:
+                    elementResult = incrementVariableResults[elType]
+                    results = elementResult[location][which]
+                except KeyError:
                     raise Exception(
                         "Failed to retrieve result '{:}' in '{:}/{:}' for set {:}. Does it exist?".format(
                             result, location, which, setName
                         )
                     )
 
-                if perSetJobEntry.offset:
-                    results = results[:, perSetJobEntry.offset :]
+                for columns in planEntry.columns:
+                    results = results[:, columns]
 
-                if perSetJobEntry.extractionSlice:
-                    results = results[:, perSetJobEntry.extractionSlice]
+                if planEntry.extractionFunction:
+                    results = evaluateExtractionFunction(planEntry.extractionFunction, results)
 
-                if perSetJobEntry.extractionFunction:
-                    results = np.apply_along_axis(perSetJobEntry.extractionFunction, axis=1, arr=results)
-                    results = np.reshape(results, (results.shape[0], -1))  # ensure that dimensions are kept
+                width = planEntry.transform.nComponentsOut if planEntry.transform else results.shape[1]
 
-                incrementVariableResultsArrays[elType] = results
-                setVariableDimensions = results.shape[1]
+                if width != planEntry.dimensions:
+                    raise Exception(
+                        "Variable dimension {:} in set {:} does not match the defined job dimension of {:} in job '{:}'.".format(
+                            width,
+                            setName,
+                            exportJob.dimensions,
+                            exportJob.exportName,
+                        )
+                    )
 
-            if not setVariableDimensions:
-                raise Exception(
-                    "No results for set {:} in job '{:}'. ".format(
-                        setName,
-                        exportJob.exportName,
+                # rows without records are detected during the gather, NaN values of the results are kept
+                if results.shape[0] != outputShape[0] or elementResult.hasMissingRows(location, which):
+                    raise Exception(
+                        "Failed to retrieve result '{:}' in '{:}/{:}' for all elements of set {:}.".format(
+                            result, location, which, setName
+                        )
                     )
-                )
 
-            if setVariableDimensions != exportJob.dimensions:
+                # transforms and conversions write straight into the output buffer
+                output = planEntry.outputBuffers[elType]
+                if planEntry.transform:
+                    planEntry.transform(results, out=output)
+                else:
+                    np.copyto(output, results, casting="same_kind")
+
+                incrementVariableResultsArrays[elType] = output
+
+            if not incrementVariableResultsArrays:
                 raise Exception(
-                    "Variable dimension {:} in set {:} does not match the defined job dimension of {:} in job '{:}'. Consider using the 'fillMissingValuesTo' option for the export entry.".format(
-                        setVariableDimensions,
+                    "No results for set {:} in job '{:}'. ".format(
                         setName,
-                        exportJob.dimensions,
                         exportJob.exportName,
                     )
                 )
 
-            partsDict[self._setToPartIDMapping[elSet]] = incrementVariableResultsArrays
+            partsDict[planEntry.partID] = incrementVariableResultsArrays
 
         if partsDict or exportJob.writeEmptyTimeSteps:
             return es.EnsightPerElementVariable(
@@ -380,47 +759,65 @@ class EnsightExporter:
         else:
             return None
 
+    def _assignPartIDs(self):
+        """Determine the sets, which are exported as parts, and assign an Ensight part ID to each exported
+        element set and node set. Part IDs are consecutive, such that they are consistent in the geometry
+        and in all variables."""
+
+        if self.exportOnlyReferencedParts:
+            missingSetNames = self.includedPartSetNames.difference(self._elSets, self._nSets)
+            if missingSetNames:
+                raise Exception(
+                    "Sets {:} in *ensightExportOnlyReferencedParts do not exist in the model.".format(
+                        ", ".join(sorted(missingSetNames))
+                    )
+                )
+
+            elSetNames, nSetNames = self.getReferencedSetNames()
+            self._exportedElSets = {name: elSet for name, elSet in self._elSets.items() if name in elSetNames}
+            self._exportedNSets = {name: nSet for name, nSet in self._nSets.items() if name in nSetNames}
+        else:
+            self._exportedElSets = self._elSets
+            self._exportedNSets = self._nSets
+
+        partNumber = 1
+        for elSet in self._exportedElSets.values():
+            self._setToPartIDMapping[elSet] = partNumber
+            partNumber += 1
+
+        for nSet in self._exportedNSets.values():
+            self._setToPartIDMapping[nSet] = partNumber
+            partNumber += 1
+
     def _createEnsightGeometryFromModel(self, nodes: list[Node], nSets, elements: dict, elSets: dict[str, ElSet]):
         partList = []
-        partNumber = 1
 
         for elSet in elSets.values():
             elSetPart = es.EnsightUnstructuredPart(
                 elSet.name,
-                partNumber,
+                self._setToPartIDMapping[elSet],
                 elSet.reducedElements,
                 elSet.reducedNodeCoords3D,
                 list(elSet.reducedNodes.keys()),
                 self.ensightElementTypeMappings,
             )
-            # elSet.ensightPartID = partNumber
-            self._setToPartIDMapping[elSet] = partNumber
             partList.append(elSetPart)
-            partNumber += 1
 
         for nSet in nSets.values():
             nSetPart = es.EnsightUnstructuredPart(
                 "NSET_" + nSet.name,
-                partNumber,
+                self._setToPartIDMapping[nSet],
                 {
-                    "node": [
-                        (
-                            n.label,
-                            [
-                                i,
-                            ],
-                        )
-                        for i, n in enumerate(nSet.nodes)
-                    ]
+                    "node": (
+                        np.fromiter((n.label for n in nSet.nodes), dtype=np.int64, count=len(nSet.nodes)),
+                        np.arange(len(nSet.nodes)).reshape(-1, 1),
+                    )
                 },
                 np.array([n.coords for n in nSet.nodes]),
                 [n.label for n in nSet.nodes],
                 self.ensightElementTypeMappings,
             )
-            # nSet.ensightPartID = partNumber
             partList.append(nSetPart)
-            self._setToPartIDMapping[nSet] = partNumber
-            partNumber += 1
 
         geometry = es.EnsightGeometry("geometry", "-", "-", partList, "given", "given")
         return geometry
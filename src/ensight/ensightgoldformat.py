@@ -10,6 +10,7 @@ file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
 import numpy as np
 import os
+from src.profiling import profiler
 
 
 def writeCFloat(f, ndarray):
@@ -24,6 +25,63 @@ def writeC80(f, string):
     np.asarray(string, dtype="a80").tofile(f)
 
 
+class EnsightChunkBuffer:
+    def __init__(self):
+        """A buffer, to which a complete time step chunk is serialized, so that it is written with a single write.
+        The size of a chunk is known up front from the part layout. The buffer is reused for subsequent chunks,
+        and only reallocated if a chunk is larger than all previous chunks.
+        """
+
+        self.buffer = np.empty(0, dtype=np.uint8)
+        self.size = 0
+        self.position = 0
+
+    def reset(self, nBytes: int):
+        """Prepare the buffer for a new chunk.
+
+        Parameters
+        ----------
+        nBytes
+            The size of the chunk.
+        """
+
+        if self.buffer.shape[0] < nBytes:
+            self.buffer = np.empty(nBytes, dtype=np.uint8)
+        self.size = nBytes
+        self.position = 0
+
+    def _reserve(self, nBytes: int):
+        start = self.position
+        self.position += nBytes
+        if self.position > self.size:
+            raise Exception("Ensight chunk exceeds its precomputed size of {:} bytes.".format(self.size))
+        return self.buffer[start : self.position]
+
+    def writeC80(self, string):
+        self._reserve(80).view("a80")[0] = string
+
+    def writeCInt(self, ndarray):
+        values = np.asarray(ndarray).ravel()
+        self._reserve(values.shape[0] * 4).view(np.int32)[:] = values
+
+    def writeCFloat(self, ndarray):
+        # values are converted while copying, without a temporary float32 array
+        ndarray = np.asarray(ndarray)
+        self._reserve(ndarray.size * 4).view(np.float32).reshape(ndarray.shape)[...] = ndarray
+
+    def writeCFloatZeros(self, count: int):
+        self._reserve(count * 4)[:] = 0
+
+    def writeToFile(self, f):
+        if self.position != self.size:
+            raise Exception(
+                "Ensight chunk has {:} bytes instead of its precomputed size of {:} bytes.".format(
+                    self.position, self.size
+                )
+            )
+        f.write(self.buffer[: self.size].data)
+
+
 ensightPerNodeVariableTypes = {
     1: "scalar per node",
     3: "vector per node",
@@ -41,8 +99,8 @@ ensightPerElementVariableTypes = {
 
 class EnsightUnstructuredPart:
     """define an unstructured part, by a list of nodes and a dictionary of elements.
-    Each dictionary entry consists of a list of tuples of elementlabel and nodelist:
-    {strElementType : [ ( intLabel = None, [nodeList] ) ]}"""
+    Each dictionary entry consists of an array of element labels and an array of the (zero based) node indices:
+    {strElementType : ( np.array(labels), np.array(nodeIndices) ) }"""
 
     def __init__(
         self,
@@ -77,14 +135,12 @@ class EnsightUnstructuredPart:
         writeCFloat(f, self.nodes.T)
 
         # elements
-        for elType, elemList in self.elements.items():
+        for elType, (labels, nodeIndices) in self.elements.items():
             writeC80(f, self.ensightElementTypeMappings[elType])
-            writeCInt(f, len(elemList))
+            writeCInt(f, len(labels))
             if printElementLabels:
-                for elemID, nodes in elemList:
-                    writeCInt(f, elemID)
-            for elemID, nodes in elemList:
-                writeCInt(f, np.asarray(nodes, np.int32)[:] + 1)
+                writeCInt(f, labels)
+            writeCInt(f, nodeIndices + 1)
 
 
 class EnsightTimeSet:
@@ -177,22 +233,34 @@ class EnsightPerNodeVariable:
         self.variableDimension = variableDimension
         self.varType = ensightPerNodeVariableTypes[variableDimension]
 
+    def getNumberOfValues(self):
+        """The number of values written to a file, including zero padded components."""
+        return sum(values.shape[0] for _, values in self.partsDict.values()) * self.variableDimension
+
+    def getChunkSize(self):
+        """The number of bytes written by writeToBuffer."""
+        return 80 + sum(
+            80 + 4 + 80 + values.shape[0] * self.variableDimension * 4 for _, values in self.partsDict.values()
+        )
+
+    def writeToBuffer(self, buffer: EnsightChunkBuffer):
+        buffer.writeC80(self.description)
+        for ensightPartID, (structureType, values) in self.partsDict.items():
+            buffer.writeC80("part")
+            buffer.writeCInt(ensightPartID)
+            buffer.writeC80(structureType)
+            buffer.writeCFloat(values.T)
+            if values.shape[1] < self.variableDimension:
+                buffer.writeCFloatZeros(values.shape[0] * (self.variableDimension - values.shape[1]))
+
     def writeToFile(
         self,
         fileHandle,
     ):
-        f = fileHandle
-        writeC80(f, self.description)
-        for ensightPartID, (structureType, values) in self.partsDict.items():
-            writeC80(f, "part")
-            writeCInt(f, ensightPartID)
-            writeC80(f, structureType)
-            writeCFloat(f, values.T)
-            if values.shape[1] < self.variableDimension:
-                writeCFloat(
-                    f,
-                    np.zeros((values.shape[0], self.variableDimension - values.shape[1])),
-                )
+        buffer = EnsightChunkBuffer()
+        buffer.reset(self.getChunkSize())
+        self.writeToBuffer(buffer)
+        buffer.writeToFile(fileHandle)
 
 
 class EnsightPerElementVariable:
@@ -209,45 +277,121 @@ class EnsightPerElementVariable:
         self.ensightElementTypeMappings = ensightElementTypeMappings
         self.variableDimension = variableDimension
 
-    def writeToFile(self, fileHandle):
-        f = fileHandle
-        writeC80(f, self.description)
+    def getNumberOfValues(self):
+        """The number of values written to a file, including zero padded components."""
+        return (
+            sum(values.shape[0] for elTypeDict in self.partsDict.values() for values in elTypeDict.values())
+            * self.variableDimension
+        )
+
+    def getChunkSize(self):
+        """The number of bytes written by writeToBuffer."""
+        return 80 + sum(
+            80 + 4 + sum(80 + values.shape[0] * self.variableDimension * 4 for values in elTypeDict.values())
+            for elTypeDict in self.partsDict.values()
+        )
+
+    def writeToBuffer(self, buffer: EnsightChunkBuffer):
+        buffer.writeC80(self.description)
         for ensightPartID, elTypeDict in self.partsDict.items():
-            writeC80(f, "part")
-            writeCInt(f, ensightPartID)
+            buffer.writeC80("part")
+            buffer.writeCInt(ensightPartID)
             for elType, values in elTypeDict.items():
-                writeC80(f, self.ensightElementTypeMappings[elType])
-                writeCFloat(f, values.T)
+                buffer.writeC80(self.ensightElementTypeMappings[elType])
+                buffer.writeCFloat(values.T)
                 if values.shape[1] < self.variableDimension:
-                    writeCFloat(
-                        f,
-                        np.zeros((values.shape[0], self.variableDimension - values.shape[1])),
-                    )
+                    buffer.writeCFloatZeros(values.shape[0] * (self.variableDimension - values.shape[1]))
+
+    def writeToFile(self, fileHandle):
+        buffer = EnsightChunkBuffer()
+        buffer.reset(self.getChunkSize())
+        self.writeToBuffer(buffer)
+        buffer.writeToFile(fileHandle)
 
 
 class EnsightChunkWiseCase:
-    def __init__(self, directory, caseName, writeTransientSingleFiles=True):
+    def __init__(self, directory, caseName, writeTransientSingleFiles=True, stepFileNameDigits=4):
+        """An Ensight case, which is written time step by time step.
+
+        Parameters
+        ----------
+        directory
+            The directory of the case.
+        caseName
+            The name of the case, which is also the prefix of all files.
+        writeTransientSingleFiles
+            Append all time steps of a variable (or a transient geometry) to a single file.
+            Otherwise, each time step is written to a separate file, e.g., name.0000.var, name.0001.var, ...,
+            which are referenced by wildcard file names (name.****.var) in the case file.
+        stepFileNameDigits
+            The number of digits of the time step number in the file names of separate time step files.
+        """
+
         self.directory = directory
         self.caseName = caseName
         self.caseFileNamePrefix = caseName + "_"
         self.writeTransientSingleFiles = writeTransientSingleFiles
+        self.stepFileNameDigits = stepFileNameDigits
         self.timeAndFileSets = {}
         self.geometryTrends = {}
         self.variableTrends = {}
         self.fileHandles = {}
         self.currentTime = 0.0
+        # the current sizes of the written files, and the number of values written per variable
+        self.fileSizes = {}
+        self.writtenValues = {}
+        # the formatted time values of each time set, which are extended for new time steps only
+        self._timeValueLines = {}
+        # a reusable buffer per variable, to which each time step chunk is serialized
+        self._chunkBuffers = {}
 
     def setCurrentTime(self, timeValue):
         self.currentTime = timeValue
 
+    def _updateTimeSet(self, timeAndFileSetNumber):
+        if not timeAndFileSetNumber in self.timeAndFileSets:
+            self.timeAndFileSets[timeAndFileSetNumber] = EnsightTimeSet(timeAndFileSetNumber, "timeset", 0, 1)
+            self.timeAndFileSets[timeAndFileSetNumber].timeValues.append(self.currentTime)
+
+        elif self.currentTime > self.timeAndFileSets[timeAndFileSetNumber].timeValues[-1]:
+            self.timeAndFileSets[timeAndFileSetNumber].timeValues.append(self.currentTime)
+
+    def _getStepFileName(self, name, extension, timeAndFileSetNumber):
+        """The file name of the current time step of a time set, e.g., prefix_name.0012.var"""
+
+        timeSet = self.timeAndFileSets[timeAndFileSetNumber]
+        step = timeSet.fileNameStartNumber + (len(timeSet.timeValues) - 1) * timeSet.fileNameNumberIncrement
+        if step >= 10**self.stepFileNameDigits:
+            raise Exception(
+                "Time step {:} of {:} exceeds the {:} digits of the file names.".format(
+                    step, name, self.stepFileNameDigits
+                )
+            )
+        return "{:}{:}.{:0{:}d}{:}".format(self.caseFileNamePrefix, name, step, self.stepFileNameDigits, extension)
+
+    def _getWildcardFileName(self, name, extension):
+        return "{:}{:}.{:}{:}".format(self.caseFileNamePrefix, name, "*" * self.stepFileNameDigits, extension)
+
     def writeGeometryTrendChunk(self, ensightGeometry, timeAndFileSetNumber=1):
         if timeAndFileSetNumber != None:
-            if not timeAndFileSetNumber in self.timeAndFileSets:
-                self.timeAndFileSets[timeAndFileSetNumber] = EnsightTimeSet(timeAndFileSetNumber, "timeset", 0, 1)
-                self.timeAndFileSets[timeAndFileSetNumber].timeValues.append(self.currentTime)
+            self._updateTimeSet(timeAndFileSetNumber)
 
-            elif self.currentTime > self.timeAndFileSets[timeAndFileSetNumber].timeValues[-1]:
-                self.timeAndFileSets[timeAndFileSetNumber].timeValues.append(self.currentTime)
+        if not self.writeTransientSingleFiles:
+            # a static geometry is written once to a plain file, a transient geometry to a file per time step
+            if timeAndFileSetNumber != None:
+                fileName = self._getStepFileName(ensightGeometry.name, ".geo", timeAndFileSetNumber)
+            else:
+                fileName = self.caseFileNamePrefix + ensightGeometry.name + ".geo"
+
+            self.geometryTrends[ensightGeometry.name] = timeAndFileSetNumber
+
+            with open(fileName, mode="wb") as f:
+                with profiler.measure("write", ensightGeometry.name + ".geo") as measurement:
+                    writeC80(f, "C Binary")
+                    ensightGeometry.writeToFile(f)
+                    measurement.nBytes = f.tell()
+                self.fileSizes[fileName] = f.tell()
+            return
 
         if ensightGeometry.name not in self.fileHandles:
             fileName = ("{:}" * 3).format(
@@ -256,6 +400,7 @@ class EnsightChunkWiseCase:
                 ".geo",
             )
             self.fileHandles[ensightGeometry.name] = open(fileName, mode="wb")
+            self.fileSizes[fileName] = 0
 
         f = self.fileHandles[ensightGeometry.name]
 
@@ -263,22 +408,42 @@ class EnsightChunkWiseCase:
             self.geometryTrends[ensightGeometry.name] = timeAndFileSetNumber
             writeC80(f, "C Binary")
 
-        if self.writeTransientSingleFiles:
+        with profiler.measure("write", ensightGeometry.name + ".geo") as measurement:
+            start = f.tell()
             writeC80(f, "BEGIN TIME STEP")
             ensightGeometry.writeToFile(f)
             writeC80(f, "END TIME STEP")
+            measurement.nBytes = f.tell() - start
+
+        self.fileSizes[f.name] = f.tell()
 
     def writeVariableTrendChunk(self, ensightVariable, timeAndFileSetNumber=2):
-        if not timeAndFileSetNumber in self.timeAndFileSets:
-            self.timeAndFileSets[timeAndFileSetNumber] = EnsightTimeSet(timeAndFileSetNumber, "timeset", 0, 1)
-            self.timeAndFileSets[timeAndFileSetNumber].timeValues.append(self.currentTime)
+        self._updateTimeSet(timeAndFileSetNumber)
 
-        elif self.currentTime > self.timeAndFileSets[timeAndFileSetNumber].timeValues[-1]:
-            self.timeAndFileSets[timeAndFileSetNumber].timeValues.append(self.currentTime)
+        if not ensightVariable.name in self.writtenValues:
+            self.writtenValues[ensightVariable.name] = 0
+
+        if not self.writeTransientSingleFiles:
+            self.variableTrends[ensightVariable.name] = (
+                timeAndFileSetNumber,
+                ensightVariable.varType,
+            )
+
+            fileName = self._getStepFileName(ensightVariable.name, ".var", timeAndFileSetNumber)
+            with open(fileName, mode="wb") as f:
+                with profiler.measure("write", ensightVariable.name + ".var") as measurement:
+                    buffer = self._getChunkBuffer(ensightVariable.name, ensightVariable.getChunkSize())
+                    ensightVariable.writeToBuffer(buffer)
+                    buffer.writeToFile(f)
+                    measurement.nBytes = buffer.size
+                self.fileSizes[fileName] = f.tell()
+            self.writtenValues[ensightVariable.name] += ensightVariable.getNumberOfValues()
+            return
 
         if ensightVariable.name not in self.fileHandles:
             fileName = ("{:}" * 3).format(self.caseFileNamePrefix, ensightVariable.name, ".var")
             self.fileHandles[ensightVariable.name] = open(fileName, mode="wb")
+            self.fileSizes[fileName] = 0
 
         f = self.fileHandles[ensightVariable.name]
 
@@ -289,18 +454,57 @@ class EnsightChunkWiseCase:
             )
             writeC80(f, "C Binary")
 
-        if self.writeTransientSingleFiles:
-            writeC80(f, "BEGIN TIME STEP")
-            ensightVariable.writeToFile(f)
-            writeC80(f, "END TIME STEP")
+        with profiler.measure("write", ensightVariable.name + ".var") as measurement:
+            buffer = self._getChunkBuffer(ensightVariable.name, 80 + ensightVariable.getChunkSize() + 80)
+            buffer.writeC80("BEGIN TIME STEP")
+            ensightVariable.writeToBuffer(buffer)
+            buffer.writeC80("END TIME STEP")
+            buffer.writeToFile(f)
+            measurement.nBytes = buffer.size
+        self.writtenValues[ensightVariable.name] += ensightVariable.getNumberOfValues()
+
+        self.fileSizes[f.name] = f.tell()
+
+    def _getChunkBuffer(self, name, nBytes):
+        if name not in self._chunkBuffers:
+            self._chunkBuffers[name] = EnsightChunkBuffer()
+        buffer = self._chunkBuffers[name]
+        buffer.reset(nBytes)
+        return buffer
+
+    def _getTimeValueLines(self, timeSet, discardTimeMarks):
+        """The formatted time values of a time set. Only time values added since the last call are formatted."""
+
+        key = (timeSet.number, discardTimeMarks)
+        lines = self._timeValueLines.setdefault(key, [])
+        for i in range(len(lines), len(timeSet.timeValues)):
+            if discardTimeMarks:
+                lines.append("{:}".format(i) + "\n")
+            else:
+                lines.append("{:1.10f}".format(timeSet.timeValues[i]) + "\n")
+        return lines
 
     def finalize(self, discardTimeMarks=False, closeFileHandles=True):
-        if closeFileHandles:
-            for f in self.fileHandles.values():
+        """Write the case file. It is written to a temporary file first, which then replaces the case file,
+        so that a reader never sees an incomplete case file. All data files are flushed before,
+        so that the case file never references time steps, which are not yet written.
+
+        Parameters
+        ----------
+        discardTimeMarks
+            Replace the time values by the enumeration of time steps.
+        closeFileHandles
+            Close all data files, i.e., the case is complete.
+        """
+
+        for f in self.fileHandles.values():
+            if closeFileHandles:
                 f.close()
+            else:
+                f.flush()
 
         caseFName = self.caseName + ".case"
-        with open(caseFName, mode="w") as cf:
+        with open(caseFName + ".tmp", mode="w") as cf:
             cf.write("FORMAT\n")
             cf.write("type: ensight gold\n")
 
@@ -311,11 +515,7 @@ class EnsightChunkWiseCase:
                 cf.write("filename start number: " + str(timeSet.fileNameStartNumber) + "\n")
                 cf.write("filename increment: " + str(timeSet.fileNameNumberIncrement) + "\n")
                 cf.write("time values: ")
-                for i, timeVal in enumerate(timeSet.timeValues):
-                    if discardTimeMarks:
-                        cf.write("{:}".format(i) + "\n")
-                    else:
-                        cf.write("{:1.10f}".format(timeVal) + "\n")
+                cf.write("".join(self._getTimeValueLines(timeSet, discardTimeMarks)))
 
             if self.writeTransientSingleFiles:
                 cf.write("FILE\n")
@@ -325,19 +525,34 @@ class EnsightChunkWiseCase:
 
             cf.write("GEOMETRY\n")
             for geometryName, tAndFSetNum in self.geometryTrends.items():
-                cf.write("model: {:}\n".format(self.caseFileNamePrefix + geometryName + ".geo"))
+                if not self.writeTransientSingleFiles and tAndFSetNum != None:
+                    cf.write("model: {:} {:}\n".format(tAndFSetNum, self._getWildcardFileName(geometryName, ".geo")))
+                else:
+                    cf.write("model: {:}\n".format(self.caseFileNamePrefix + geometryName + ".geo"))
 
             cf.write("VARIABLE\n")
             for variableName, (
                 tAndFSetNum,
                 variableType,
             ) in self.variableTrends.items():
-                cf.write(
-                    "{:}: {:} {:} {:} {:}.var\n".format(
-                        variableType,
-                        tAndFSetNum,
-                        tAndFSetNum,
-                        variableName,
-                        self.caseFileNamePrefix + variableName,
+                if self.writeTransientSingleFiles:
+                    cf.write(
+                        "{:}: {:} {:} {:} {:}.var\n".format(
+                            variableType,
+                            tAndFSetNum,
+                            tAndFSetNum,
+                            variableName,
+                            self.caseFileNamePrefix + variableName,
+                        )
                     )
-                )
+                else:
+                    cf.write(
+                        "{:}: {:} {:} {:}\n".format(
+                            variableType,
+                            tAndFSetNum,
+                            variableName,
+                            self._getWildcardFileName(variableName, ".var"),
+                        )
+                    )
+
+        os.replace(caseFName + ".tmp", caseFName)
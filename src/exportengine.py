@@ -11,8 +11,14 @@ file, You can obtain one at https://mozilla.org/MPL/2.0/.
 import numpy as np
 from collections import defaultdict
 from src.ensight.ensightexporter import EnsightExporter
-from src.modeldatabase import Node, NSet, Element, ElSet
-from src.misc import RecursiveDefaultDict
+from src.modeldatabase import Node, NSet, Element, ElSet, LabelIndex
+from src.resultdatabase import NodeResult, ElementResult, ElementResultRecords
+from src.misc import RecursiveDefaultDict, sliceFromString
+from src.invariants import computeInvariants
+from src.nodalaveraging import NodalAveragingOperator
+from src.profiling import profiler
+from src.filfileformat import perElementResultRecordTypes, perNodeResultRecordTypes
+from src.energies import EnergyHistory, printEnergyTable
 from prettytable import PrettyTable
 
 
@@ -51,7 +57,7 @@ def filString(word):
 
 
 def filStrippedString(word):
-    return filString(word).tostring().decode("utf-8").strip()
+    return filString(word).tobytes().decode("utf-8").strip()
 
 
 def filDouble(word):
@@ -161,7 +167,9 @@ class _NSetDefinition:
 
 
 class ExportEngine:
-    def __init__(self, inputFile: dict, exportName: str, verbose: bool = False):
+    def __init__(
+        self, inputFile: dict, exportName: str, verbose: bool = False, quiet: bool = False, printEnergies: bool = False
+    ):
         """This is the export engine. It parses a .fil file record wise,
         and exports results based on user defined jobs.
 
@@ -173,14 +181,26 @@ class ExportEngine:
             The export name.
         verbose
             Add additional output in case of warnings.
+        quiet
+            Suppress all output per increment.
+        printEnergies
+            Print the total energies as a table, in addition to the energy history.
         """
 
         self.uelSdvToQpJobs = self.collectUelSDVToQpJobs(inputFile["*UELSDVToQuadraturePoints"])
         self.qpAverageJobs = self.collectQpAverageJobs(inputFile["*computeAverageOverQuadraturePoints"])
+        self.invariantJobs = self.collectInvariantJobs(inputFile["*computeTensorInvariants"])
+        self.nodalAverageJobs = self.collectNodalAverageJobs(inputFile["*computeNodalAverage"])
 
         self.ignoreLastNodesForElType = {x["element"]: x["number"] for x in inputFile["*ignoreLastNodesForElementType"]}
+        self.ensightShapes = {x["element"]: x["shape"] for x in inputFile["*defineElementType"]}
 
-        self.ensightExporter = EnsightExporter(exportName, inputFile)
+        self.ensightExporter = EnsightExporter(exportName, inputFile, quiet=quiet)
+
+        energyHistoryOptions = {}
+        for options in inputFile["*energyHistory"]:
+            energyHistoryOptions.update(options)
+        self.energyHistory = EnergyHistory(exportName + "_energies", energyHistoryOptions.get("format", "csv"))
 
         self.nodes = {}
         # add a default node, to which abaqus falls back if it creates node in place (e.g, for hex27 elements in contact)
@@ -190,10 +210,13 @@ class ExportEngine:
         self.elSetDefinitions = {}
         self.nSetDefinitions = {}
 
+        self.nodeIndex = None
+        self._elementIndices = {}
         self.elements = {}
         self.nSets = {}
         self.elSets = {}
         self._substituteElSets = self._assembleSubsitutionElSets(inputFile)
+        self._requiredElSets, self._requiredNSets = self._collectRequiredSets(inputFile)
 
         self.currentState = "model setup"
         self.currentIncrement = {}
@@ -204,21 +227,13 @@ class ExportEngine:
         self.timeHistory = []
         self.labelCrossReferences = {}
         self._verbose = verbose
+        self._quiet = quiet
+        self._printEnergies = printEnergies
+        self._unknownRecords = set()
 
         self.knownRecords = {
             1: ("Element header record", self._elementHeaderRecord),
-            5: ("SDV output", lambda x: self._handlePerElementOutput(x, "SDV")),
-            11: ("S output", lambda x: self._handlePerElementOutput(x, "S")),
-            21: ("E output", lambda x: self._handlePerElementOutput(x, "E")),
-            22: ("PE output", lambda x: self._handlePerElementOutput(x, "PE")),
             85: ("Local coordinate system(?)", lambda x: None),
-            89: ("LE output", lambda x: self._handlePerElementOutput(x, "LE")),
-            101: ("U output", lambda x: self._handlePerNodeOutput(x, "U")),
-            102: ("V output", lambda x: self._handlePerNodeOutput(x, "V")),
-            103: ("A output", lambda x: self._handlePerNodeOutput(x, "A")),
-            108: ("POR output", lambda x: self._handlePerNodeOutput(x, "POR")),
-            104: ("RF output", lambda x: self._handlePerNodeOutput(x, "RF")),
-            201: ("NT output", lambda x: self._handlePerNodeOutput(x, "NT")),
             1501: ("Surface definition header", self._surfaceDefHeader),
             1502: ("Surface facet", lambda x: None),
             1900: ("element definition", self._addElementDefinition),
@@ -232,11 +247,22 @@ class ExportEngine:
             1933: ("element set definition", self._addElsetDefinition),
             1934: ("element set definition cont.", self._contAddElset),
             1940: ("label cross reference", self._addLabelCrossReference),
-            1999: ("total energies", self._printEnergies),
+            1999: ("total energies", self._addEnergies),
             2000: ("start increment", self._addIncrement),
             2001: ("end increment", self._finishAndParseIncrement),
         }
 
+        for recordType, result in perElementResultRecordTypes.items():
+            self.knownRecords[recordType] = (
+                result + " output",
+                lambda x, result=result: self._handlePerElementOutput(x, result),
+            )
+        for recordType, result in perNodeResultRecordTypes.items():
+            self.knownRecords[recordType] = (
+                result + " output",
+                lambda x, result=result: self._handlePerNodeOutput(x, result),
+            )
+
     def computeRecord(self, recordLength: int, recordType: int, recordContent: np.ndarray):
         """The main function of the export engine. It computes a .fil file record.
 
@@ -257,10 +283,17 @@ class ExportEngine:
 
         if recordType in self.knownRecords:
             doc, action = self.knownRecords[recordType]
-            action(recordContent)
+            if profiler.enabled:
+                with profiler.measure("record", "{:>5} {:}".format(recordType, doc), 1, recordLength * 8):
+                    action(recordContent)
+            else:
+                action(recordContent)
             return True
         else:
-            print("{:<20}{:>6}{:>10}{:>4}".format("unknown record:", recordType, " of length", recordLength))
+            # in quiet mode, each unknown record type is reported only once
+            if not self._quiet or recordType not in self._unknownRecords:
+                print("{:<20}{:>6}{:>10}{:>4}".format("unknown record:", recordType, " of length", recordLength))
+                self._unknownRecords.add(recordType)
             return False
 
     def _finishAndParseIncrement(self, recordContent: np.ndarray):
@@ -278,12 +311,13 @@ class ExportEngine:
             self.elSetDefinitions["ALL"] = ALLSet
 
             # Time to create Elements, ElSets and NodeSets from the definitions!
-            for elDef in self.elementDefinitions.values():
-                self.elements[elDef.label] = Element(
-                    elDef.label,
-                    elDef.shape,
-                    [self.nodes[label] for label in elDef.nodeLabels],
-                )
+            with profiler.measure("stage", "build elements"):
+                for elDef in self.elementDefinitions.values():
+                    self.elements[elDef.label] = Element(
+                        elDef.label,
+                        elDef.shape,
+                        [self.nodes[label] for label in elDef.nodeLabels],
+                    )
             # replace all label references by the respective labels
             for key, label in self.labelCrossReferences.items():
                 strKey = key  # str(key)
@@ -297,32 +331,20 @@ class ExportEngine:
                     del self.elSetDefinitions[strKey]
 
             self.elSetDefinitions.update(self._substituteElSets)
-            for elSetDef in self.elSetDefinitions.values():
+            with profiler.measure("stage", "build sets"):
+                self._buildSets()
 
-                try:
-                    self.elSets[elSetDef.name] = ElSet(
-                        elSetDef.name,
-                        [self.elements[label] for label in elSetDef.elementLabels],
-                    )
-                except KeyError as e:
-                    print("Element set {:} not created!".format(elSetDef.name))
-                    print(
-                        "For Abaqus/Explicit, it is observed that the definition of some element sets is faulty if multiple CPUs are used. You may want to try the *substituteElSet keyword in the input file."
-                    )
-                    if self._verbose:
-                        print(
-                            "Please check following element labels: {:}".format(
-                                [int(i) for i in elSetDef.elementLabels]
-                            )
-                        )
-                        print("Error: {:}".format(e))
-                    continue
+            # the rows of dense nodal results
+            self.nodeIndex = LabelIndex(np.fromiter(self.nodes.keys(), dtype=np.int64, count=len(self.nodes)))
 
-            for nSetDef in self.nSetDefinitions.values():
-                self.nSets[nSetDef.name] = NSet(nSetDef.name, [self.nodes[n] for n in nSetDef.nodeLabels])
+            with profiler.measure("stage", "setup nodal average"):
+                for nodalAverageJob in self.nodalAverageJobs:
+                    self.setupNodalAverage(nodalAverageJob)
 
-            self.ensightExporter.setupModel(self.nodes, self.nSets, self.elements, self.elSets)
-            self.ensightExporter.exportGeometry()
+            with profiler.measure("stage", "setup export"):
+                self.ensightExporter.setupModel(self.nodes, self.nSets, self.elements, self.elSets, self.nodeIndex)
+            with profiler.measure("stage", "export geometry"):
+                self.ensightExporter.exportGeometry()
 
         elif self.currentState == "surface definition":
             pass
@@ -332,53 +354,103 @@ class ExportEngine:
             self.ensightExporter.setCurrentTime(self.currentIncrement["tTotal"])
             self.timeHistory.append(self.currentIncrement["tTotal"])
 
-            print("increment contains element results for")
-            print(
-                "\n".join(
-                    [
-                        " {:5} [{:}]".format(resName, ", ".join([s for s in resEntries]))
-                        for resName, resEntries in self.currentIncrement["elementResults"].items()
-                    ]
-                )
-            )
-            print("")
-            print("increment contains node results for")
-            print(
-                "\n".join(
-                    [
-                        " {:5} [{:10} nodes]".format(resName, len(resEntries))
-                        for resName, resEntries in self.currentIncrement["nodeResults"].items()
-                    ]
-                )
-            )
-            print("")
+            with profiler.measure("stage", "assemble results"):
+                self.currentIncrement["nodeResults"] = {
+                    result: NodeResult(self.nodeIndex, labels, values)
+                    for result, (labels, values) in self.currentIncrement["nodeResults"].items()
+                }
+                self._assembleElementResults(self.currentIncrement["elementResults"])
 
-            print("exporting...")
+            if not self._quiet:
+                self._printIncrementContent()
 
             # operate on elemetal results (e.g. compute average over quadraturePoint )
-            for uelSdvToQpJob in self.uelSdvToQpJobs:
-                self.computeUelSdvToQp(uelSdvToQpJob)
+            with profiler.measure("stage", "uel sdv to qp"):
+                for uelSdvToQpJob in self.uelSdvToQpJobs:
+                    self.computeUelSdvToQp(uelSdvToQpJob)
 
-            for qpAverageJob in self.qpAverageJobs:
-                self.computeQpAverage(qpAverageJob)
+            with profiler.measure("stage", "qp average"):
+                for qpAverageJob in self.qpAverageJobs:
+                    self.computeQpAverage(qpAverageJob)
 
-            self.ensightExporter.exportPerNodeVariables(self.currentIncrement["nodeResults"])
-            self.ensightExporter.exportPerElementVariables(self.currentIncrement["elementResults"])
+            with profiler.measure("stage", "tensor invariants"):
+                for invariantJob in self.invariantJobs:
+                    self.computeTensorInvariants(invariantJob)
 
-            if self.nIncrements % 10 == 0:
-                # intermediate saving ...
+            with profiler.measure("stage", "nodal average"):
+                for nodalAverageJob in self.nodalAverageJobs:
+                    self.computeNodalAverage(nodalAverageJob)
 
-                self.ensightExporter.finalize(
-                    closeFileHandles=False,
-                )
+            with profiler.measure("stage", "export per node"):
+                self.ensightExporter.exportPerNodeVariables(self.currentIncrement["nodeResults"])
+            with profiler.measure("stage", "export per element"):
+                self.ensightExporter.exportPerElementVariables(self.currentIncrement["elementResults"])
+
+            # intermediate saving ...
+            self.ensightExporter.updateCase()
+            self.energyHistory.flush()
 
             # data might consume a lot of memory, so we delete it (explicitly)
             del self.currentIncrement
             # and create a new dict for a new increment; it is filled with the next start increment entry in the fil file
             self.currentIncrement = dict()
 
+    def _buildSets(self):
+        """Create the ElSets and NSets from their definitions."""
+
+        for elSetDef in self.elSetDefinitions.values():
+            if self._requiredElSets is not None and elSetDef.name not in self._requiredElSets:
+                continue
+
+            try:
+                self.elSets[elSetDef.name] = ElSet(
+                    elSetDef.name,
+                    [self.elements[label] for label in elSetDef.elementLabels],
+                )
+            except KeyError as e:
+                print("Element set {:} not created!".format(elSetDef.name))
+                print(
+                    "For Abaqus/Explicit, it is observed that the definition of some element sets is faulty if multiple CPUs are used. You may want to try the *substituteElSet keyword in the input file."
+                )
+                if self._verbose:
+                    print("Please check following element labels: {:}".format([int(i) for i in elSetDef.elementLabels]))
+                    print("Error: {:}".format(e))
+                continue
+
+        for nSetDef in self.nSetDefinitions.values():
+            if self._requiredNSets is not None and nSetDef.name not in self._requiredNSets:
+                continue
+            self.nSets[nSetDef.name] = NSet(nSetDef.name, [self.nodes[n] for n in nSetDef.nodeLabels])
+
     def finalize(self):
         self.ensightExporter.finalize(closeFileHandles=True)
+        self.energyHistory.close()
+
+    def _printIncrementContent(self):
+        """Print the results contained in the current increment."""
+
+        print("increment contains element results for")
+        print(
+            "\n".join(
+                [
+                    " {:5} [{:}]".format(resName, ", ".join([s for s in resEntries]))
+                    for resName, resEntries in self.currentIncrement["elementResults"].items()
+                ]
+            )
+        )
+        print("")
+        print("increment contains node results for")
+        print(
+            "\n".join(
+                [
+                    " {:5} [{:10} nodes]".format(resName, len(resEntries))
+                    for resName, resEntries in self.currentIncrement["nodeResults"].items()
+                ]
+            )
+        )
+        print("")
+
+        print("exporting...")
 
     def collectQpAverageJobs(self, entries):
         """Commonly, the average of a result over all quadrature points per element should be computed.
@@ -408,8 +480,130 @@ class ExportEngine:
         setResults = self.currentIncrement["elementResults"][result][setName]
 
         for elTypeResults in setResults.values():
-            for elResults in elTypeResults.values():
-                elResults["computed"]["average"] = np.mean([qpRes for qpRes in elResults["qps"].values()], axis=0)
+            elTypeResults["computed"]["average"] = np.mean(list(elTypeResults["qps"].values()), axis=0)
+
+    def collectInvariantJobs(self, entries: list):
+        """Invariants and principal values of stresses and strains are commonly required for postprocessing.
+        This function gathers the respective jobs from the input file.
+
+        Parameters
+        ----------
+        entries
+            The list of job definitions."""
+
+        jobs = []
+        for entry in entries:
+            tensorType = entry.get("type", "stress").lower()
+            if tensorType not in ("stress", "strain"):
+                raise Exception(
+                    "*computeTensorInvariants for {:}: type must be either 'stress' or 'strain'!".format(
+                        entry["result"]
+                    )
+                )
+            entry["isStrain"] = tensorType == "strain"
+            entry["valuesSlice"] = sliceFromString(entry["values"]) if "values" in entry else slice(None)
+            jobs.append(entry)
+
+        return jobs
+
+    def computeTensorInvariants(self, job: dict):
+        """Compute the invariants and principal values of an elemental (Voigt) tensor result,
+        for all quadrature points and all computed results (e.g., the average), at once for all elements.
+
+        Parameters
+        ----------
+        job
+            The job definition."""
+
+        setName = job["set"]
+        valuesSlice = job["valuesSlice"]
+
+        source = self.currentIncrement["elementResults"][job["result"]][setName]
+        destination = self.currentIncrement["elementResults"][job["destination"]][setName]
+
+        for elType, elTypeResults in source.items():
+            invariants = ElementResult(
+                elTypeResults.labels,
+                {
+                    qp: computeInvariants(qpResults[:, valuesSlice], job["isStrain"])
+                    for qp, qpResults in elTypeResults["qps"].items()
+                },
+                elTypeResults.filledRows,
+            )
+            for which, computedResults in elTypeResults["computed"].items():
+                invariants["computed"][which] = computeInvariants(computedResults[:, valuesSlice], job["isStrain"])
+
+            destination[elType] = invariants
+
+    def collectNodalAverageJobs(self, entries: list):
+        """Elemental results are commonly averaged at the nodes for smooth contour plots.
+        This function gathers the respective jobs from the input file.
+
+        Parameters
+        ----------
+        entries
+            The list of job definitions."""
+
+        jobs = []
+        for entry in entries:
+            weighting = entry.get("weighting", "uniform").lower()
+            if weighting not in ("uniform", "volume"):
+                raise Exception(
+                    "*computeNodalAverage for {:}: weighting must be either 'uniform' or 'volume'!".format(
+                        entry["result"]
+                    )
+                )
+            entry["weighting"] = weighting
+            if entry["location"] == "qps":
+                entry["which"] = int(entry["which"])
+            jobs.append(entry)
+
+        return jobs
+
+    def setupNodalAverage(self, job: dict):
+        """Build the averaging operator of a job once the model is set up.
+
+        Parameters
+        ----------
+        job
+            The job definition."""
+
+        setName = job["set"]
+        if setName not in self.elSets:
+            raise Exception("Element set {:} for *computeNodalAverage does not exist in the model.".format(setName))
+
+        elSet = self.elSets[setName]
+        job["operator"] = NodalAveragingOperator(elSet, self.ensightShapes if job["weighting"] == "volume" else None)
+        job["nodeRows"], _ = self.nodeIndex.getRows(list(elSet.reducedNodes.keys()))
+
+    def computeNodalAverage(self, job: dict):
+        """Average an elemental result to the nodes of an element set, which results in a new nodal result.
+
+        Parameters
+        ----------
+        job
+            The job definition."""
+
+        setName = job["set"]
+        elSet = self.elSets[setName]
+        setResults = self.currentIncrement["elementResults"][job["result"]][setName]
+
+        try:
+            elementValues = np.concatenate(
+                [setResults[elType][job["location"]][job["which"]] for elType in elSet.elementsByShape.keys()]
+            )
+        except KeyError:
+            raise Exception(
+                "Failed to retrieve result '{:}' in '{:}/{:}' for all element types of set {:}.".format(
+                    job["result"], job["location"], job["which"], setName
+                )
+            )
+
+        nodeResults = self.currentIncrement["nodeResults"]
+        if job["destination"] not in nodeResults:
+            nodeResults[job["destination"]] = NodeResult(self.nodeIndex, [], [])
+
+        nodeResults[job["destination"]].assign(job["nodeRows"], job["operator"](elementValues))
 
     def collectUelSDVToQpJobs(self, entries: list):
         """Abaqus UEL SDVs commonly should be computed to something resonable!
@@ -448,12 +642,56 @@ class ExportEngine:
 
         destination = self.currentIncrement["elementResults"][job["destination"]][setName]
 
-        for ensElType, elements in source.items():
-            for elLabel, uelResults in elements.items():
-                uelSdv = uelResults["qps"][1]
-                qpsData = [uelSdv[qpSlice] for qpSlice in qpSlices]
+        for ensElType, uelResults in source.items():
+            uelSdv = uelResults["qps"][1]
+            qpsData = [uelSdv[:, qpSlice] for qpSlice in qpSlices]
+            filled = uelResults.filledRows.get(1)
 
-                destination[ensElType][elLabel]["qps"] = {(i + 1): qpData for i, qpData in enumerate(qpsData)}
+            destination[ensElType] = ElementResult(
+                uelResults.labels,
+                {(i + 1): qpData for i, qpData in enumerate(qpsData)},
+                {(i + 1): filled for i in range(len(qpsData))} if filled is not None else None,
+            )
+
+    def _assembleElementResults(self, elementResults: dict):
+        """Assemble the collected records of all elemental results to dense ElementResults.
+        Rows are aligned with the elements of the respective element set, if it exists.
+
+        Parameters
+        ----------
+        elementResults
+            The elemental results of the increment."""
+
+        for setResults in elementResults.values():
+            for setName, elTypeResults in setResults.items():
+                for elType, records in elTypeResults.items():
+                    elTypeResults[elType] = records.toElementResult(self._getElementIndex(setName, elType))
+
+    def _getElementIndex(self, setName: str, elType: str):
+        """Get the index of the elements of a certain type in an element set.
+
+        Parameters
+        ----------
+        setName
+            The name of the element set.
+        elType
+            The element type.
+
+        Returns
+        -------
+        LabelIndex
+            The index, or None if the set does not exist.
+        """
+
+        key = (setName, elType)
+        if key not in self._elementIndices:
+            elSet = self.elSets.get(setName, None)
+            self._elementIndices[key] = (
+                LabelIndex([element.label for element in elSet.elementsByShape[elType]])
+                if elSet is not None and elType in elSet.elementsByShape
+                else None
+            )
+        return self._elementIndices[key]
 
     def _outputDefinition(self, recordContent: np.ndarray):
         """Initialize a new output we are working on.
@@ -509,21 +747,14 @@ class ExportEngine:
         """
 
         res = filDouble(recordContent)
-        currentIncrement = self.currentIncrement
-        currentSetName = self.currentSetName
-        currentElementType = self.currentElementType
-        qp = self.currentIpt
-        currentElementLabel = self.currentElementLabel
 
-        targetLocation = currentIncrement["elementResults"][result][currentSetName][currentElementType]
+        setResults = self.currentIncrement["elementResults"][result][self.currentSetName]
 
-        if qp not in targetLocation[currentElementLabel]["qps"]:
-            targetLocation[currentElementLabel]["qps"][qp] = res
-        else:
-            # continuation of an existing record
-            targetLocation[currentElementLabel]["qps"][qp] = np.concatenate(
-                (targetLocation[currentElementLabel]["qps"][qp], res)
-            )
+        records = setResults.get(self.currentElementType, None)
+        if records is None:
+            records = setResults[self.currentElementType] = ElementResultRecords()
+
+        records.append(self.currentElementLabel, self.currentIpt, res)
 
     def _handlePerNodeOutput(self, recordContent: np.ndarray, result: str):
         """Data for a node.
@@ -540,8 +771,10 @@ class ExportEngine:
         vals = filDouble(recordContent[1:])
 
         if result not in self.currentIncrement["nodeResults"]:
-            self.currentIncrement["nodeResults"][result] = {}
-        self.currentIncrement["nodeResults"][result][node] = vals
+            self.currentIncrement["nodeResults"][result] = ([], [])
+        labels, values = self.currentIncrement["nodeResults"][result]
+        labels.append(node)
+        values.append(vals)
 
     def _addNode(self, recordContent: np.ndarray):
         """Definition of a node.
@@ -677,21 +910,23 @@ class ExportEngine:
         currentIncrement["nStep"] = nStep
         currentIncrement["timeInc"] = timeInc
 
-        # a level 4 RecursiveDefaultDict
-        currentIncrement["elementResults"] = RecursiveDefaultDict(4)  # result / set / shape / element number / location
+        # a level 1 RecursiveDefaultDict, holding ElementResultRecords,
+        # which are assembled to dense ElementResults at the end of the increment
+        currentIncrement["elementResults"] = RecursiveDefaultDict(1)  # result / set / shape
 
-        # a level 2 RecursiveDefaultDict
-        currentIncrement["nodeResults"] = RecursiveDefaultDict(2)  # result / node
+        # node labels and results per result, which are assembled to dense NodeResults at the end of the increment
+        currentIncrement["nodeResults"] = {}  # result / (labels, values)
 
-        print("+" + "-" * 78 + "+")
-        print(
-            "| processing increment {:>5} | step time:{:>11.5f} | total time:{:>12.5f} |".format(
-                self.nIncrements,
-                self.currentIncrement["tStep"],
-                self.currentIncrement["tTotal"],
+        if not self._quiet:
+            print("+" + "-" * 78 + "+")
+            print(
+                "| processing increment {:>5} | step time:{:>11.5f} | total time:{:>12.5f} |".format(
+                    self.nIncrements,
+                    self.currentIncrement["tStep"],
+                    self.currentIncrement["tTotal"],
+                )
             )
-        )
-        print("+" + "-" * 78 + "+")
+            print("+" + "-" * 78 + "+")
 
     def _addLabelCrossReference(self, recordContent):
         """Reference to a label using an integer.
@@ -718,45 +953,27 @@ class ExportEngine:
         """
         self.currentState = "surface definition"
 
-    def _printEnergies(self, recordContent):
-        """Print the total energies.
+    def _addEnergies(self, recordContent):
+        """Append the total energies to the energy history, and print them if requested.
 
         Parameters
         ----------
         recordContent
             The fil record. Contains the energy information.
         """
-        energyTypes = [
-            "Total kinetic energy (ALLKE).",
-            "Total recoverable (elastic) strain energy (ALLSE).",
-            "Total external work (ALLWK).",
-            "Total plastic dissipation (ALLPD).",
-            "Total viscoelastic dissipation (ALLCD).",
-            "Total viscous dissipation (ALLVD).",
-            "Total loss of kinetic energy at impacts (ALLKL) (S).",
-            "Total artificial strain energy (ALLAE).",
-            "Total distortion control dissipation energy (ALLDC).",
-            "Total electrostatic energy (ALLEE) (S).",
-            "Total strain energy (ALLIE).",
-            "Total energy balance (ETOTAL).",
-            "Total energy dissipated through frictional effects (ALLFD).",
-            "Total electrical energy dissipated in conductors (ALLJD) (S).",
-            "Percent change in mass (DMASS).",
-            "Total damage dissipation (ALLDMD).",
-            "Internal heat energy (ALLIHE) (E).",
-            "External heat energy (ALLHF) (E).",
-        ]
-
-        # make a pretty table with a width of 40 characters
-        t = PrettyTable(max_width=80, max_table_width=80)
-        t.field_names = ["Energy type", "Value"]
-        for value, energyType in zip(filDouble(recordContent), energyTypes):
-            t.add_row([energyType, value])
 
-        # format values with only 5 digits
-        t.float_format = "5.2"
+        values = filDouble(recordContent)
+        increment = self.currentIncrement
+        self.energyHistory.append(
+            increment.get("nStep", 0),
+            increment.get("nInc", 0),
+            increment.get("tStep", np.nan),
+            increment.get("tTotal", np.nan),
+            values,
+        )
 
-        print(t)
+        if self._printEnergies and not self._quiet:
+            printEnergyTable(values)
 
     def _printHeading1921(self, recordContent):
         """Print the heading of the .fil file.
@@ -781,6 +998,36 @@ class ExportEngine:
 
         print(t)
 
+    def _collectRequiredSets(self, inputFile: dict):
+        """Determine the element sets and node sets to be built, if only the sets referenced by
+        computations and exports should be built.
+
+        Parameters
+        ----------
+        inputFile
+            The dictionary containing the input file.
+
+        Returns
+        -------
+        tuple[set, set]
+            The names of the required element sets and node sets, or None if all sets are built.
+        """
+
+        if not inputFile["*buildOnlyReferencedSets"]:
+            return None, None
+
+        requiredElSets, requiredNSets = self.ensightExporter.getReferencedSetNames()
+
+        for job in self.uelSdvToQpJobs + self.qpAverageJobs + self.invariantJobs + self.nodalAverageJobs:
+            requiredElSets.add(job["set"])
+
+        for definition in inputFile["*buildOnlyReferencedSets"]:
+            for line in definition.get("data", []):
+                requiredElSets.update(line)
+                requiredNSets.update(line)
+
+        return requiredElSets, requiredNSets
+
     def _assembleSubsitutionElSets(self, inputFile: dict):
 
         elementSets = dict()
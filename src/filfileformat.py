@@ -7,6 +7,7 @@ file, You can obtain one at https://mozilla.org/MPL/2.0/.
 """
 
 import numpy as np
+import os
 
 # a word in a .fil file has a size of 8 bytes
 FIL_WORDSIZE = 8
@@ -16,6 +17,10 @@ FIL_CHUNKSIZE = 513 * FIL_WORDSIZE
 # but rather we split them into multiple batch sizes
 FIL_BATCHSIZE = FIL_CHUNKSIZE * 4096 * 32  # = ~ 538 MByte  ... size in BYTES
 
+# the record types of results, which are written per element (following an element header record 1) and per node
+perElementResultRecordTypes = {5: "SDV", 11: "S", 21: "E", 22: "PE", 89: "LE"}
+perNodeResultRecordTypes = {101: "U", 102: "V", 103: "A", 108: "POR", 104: "RF", 201: "NT"}
+
 
 def getCurrentMaxIdxEnd(fn: str, fileIdx: str, fileSize: int):
     """Determine the maximum index in the .fil file depending on the current position.
@@ -68,3 +73,214 @@ def getFilFileWords(fn, fileIdx, idxEnd):
     words = words[:, 4:-4]
     words = words.reshape(-1, 8)
     return words
+
+
+def iterateFilRecords(fn: str):
+    """Iterate over all records of a complete .fil file, batch chunk wise.
+    The iteration stops at the end of the file, or at a record with empty content,
+    which indicates an aborted analysis. ASCII .fil files are read by the AsciiFilRecordReader.
+
+    Parameters
+    ----------
+    fn
+        The .fil file name.
+
+    Yields
+    ------
+    tuple[int, int, np.ndarray]
+        The record length, the record type, and the record content.
+    """
+
+    if isAsciiFilFile(fn):
+        yield from AsciiFilRecordReader(fn)
+        return
+
+    fileSize = os.path.getsize(fn)
+    fileIdx = 0
+    wordIdx = 0
+
+    while fileIdx < fileSize:
+        idxEnd = getCurrentMaxIdxEnd(fn, fileIdx, fileSize)
+        if idxEnd <= fileIdx:
+            return
+
+        words = getFilFileWords(fn, fileIdx, idxEnd)
+        header = words.view("<i8").ravel()
+
+        while wordIdx < len(words):
+            recordLength = int(header[wordIdx])
+            if recordLength <= 2:
+                return
+
+            if wordIdx + recordLength > len(words):
+                if wordIdx < 512:
+                    # the record exceeds even a complete batch chunk; the file is truncated
+                    return
+                # move the batch chunk to the beginning of the current 512 word block
+                fileIdx += (wordIdx // 512) * FIL_CHUNKSIZE
+                wordIdx = wordIdx % 512
+                break
+
+            yield recordLength, int(header[wordIdx + 1]), words[wordIdx + 2 : wordIdx + recordLength]
+            wordIdx += recordLength
+        else:
+            fileIdx = idxEnd
+            wordIdx = 0
+
+
+# ASCII .fil files (*FILE FORMAT, ASCII) are read in batches of this size ... size in BYTES
+FIL_ASCII_BATCHSIZE = 64 * 1024 * 1024
+
+# the lengths of the tokens of ASCII .fil files, without the digits of integers
+_asciiTokenLengths = np.zeros(256, dtype=np.int64)
+_asciiTokenLengths[ord("*")] = 1  # the start of a record
+_asciiTokenLengths[ord("I")] = 3  # I, the number of digits (2 characters), and the digits
+_asciiTokenLengths[ord("D")] = 23  # D, and the number in E22.15 format with D as exponent character
+_asciiTokenLengths[ord("A")] = 9  # A, and 8 characters
+
+
+def isAsciiFilFile(fn: str):
+    """Check if a .fil file is written in ASCII format, i.e., it starts with the first record instead of a chunk marker."""
+
+    with open(fn, "rb") as f:
+        return f.read(1) == b"*"
+
+
+def _getAsciiIntegers(text: np.ndarray, positions: np.ndarray, widths: np.ndarray):
+    """Decode integers of (at most 19) characters at positions in the text, column by column. Blanks are ignored."""
+
+    values = np.zeros(positions.shape[0], dtype=np.int64)
+    isNegative = np.zeros(positions.shape[0], dtype=bool)
+    for column in range(int(widths.max()) if widths.shape[0] else 0):
+        characters = text[np.minimum(positions + column, text.shape[0] - 1)]
+        isCharacter = column < widths
+        isDigit = isCharacter & (characters >= ord("0")) & (characters <= ord("9"))
+        values[isDigit] = values[isDigit] * 10 + (characters[isDigit] - ord("0"))
+        isNegative |= isCharacter & (characters == ord("-"))
+    return np.where(isNegative, -values, values)
+
+
+def decodeAsciiFilWords(text: np.ndarray, final: bool = True):
+    """Decode a batch of an ASCII .fil file to 8 byte words, which are identical to the words of a binary .fil file.
+
+    The batch is tokenized without a loop over the tokens: The length of a token is determined by its first character,
+    so a potential token is assumed at every position with the character *, I, D or A.
+    The actual tokens are the chain of potential tokens, which starts at the beginning of the batch.
+    It is found by pointer jumping, i.e., by doubling the distance of the successors in each iteration.
+
+    Parameters
+    ----------
+    text
+        The characters of the batch, without line breaks, starting with a record.
+    final
+        The batch contains the end of the file. Otherwise, the last record may be incomplete, and it is not decoded.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray, int]
+        The words (nWords, 8), the word indices of the starts of the records, and the number of characters decoded.
+    """
+
+    candidates = np.flatnonzero(_asciiTokenLengths.astype(bool)[text])
+    nCandidates = candidates.shape[0]
+    if not nCandidates or text[0] != ord("*"):
+        return np.zeros((0, 8), dtype="b"), np.zeros(0, dtype=np.int64), 0
+
+    kinds = text[candidates]
+    isInteger = kinds == ord("I")
+    tokenLengths = _asciiTokenLengths[kinds]
+    tokenLengths[isInteger] += _getAsciiIntegers(
+        text, candidates[isInteger] + 1, np.full(np.count_nonzero(isInteger), 2)
+    )
+    ends = candidates + tokenLengths
+
+    # the successor of each potential token, or the sentinel nCandidates, if its end is not a potential token
+    successors = np.searchsorted(candidates, ends)
+    isValid = successors < nCandidates
+    isValid[isValid] = candidates[successors[isValid]] == ends[isValid]
+    successors[~isValid] = nCandidates
+    successors = np.append(successors, nCandidates)
+
+    isToken = np.zeros(nCandidates + 1, dtype=bool)
+    isToken[0] = True
+    nTokens = 1
+    while True:
+        isToken[successors[isToken]] = True
+        if np.count_nonzero(isToken) == nTokens:
+            break
+        nTokens = np.count_nonzero(isToken)
+        successors = successors[successors]
+
+    positions = candidates[isToken[:-1]]
+    kinds = kinds[isToken[:-1]]
+
+    # only complete records are decoded
+    nTokens = positions.shape[0]
+    if not final or ends[isToken[:-1]][-1] > text.shape[0]:
+        nTokens = np.flatnonzero(kinds == ord("*"))[-1]
+    nDecoded = int(positions[nTokens]) if nTokens < positions.shape[0] else text.shape[0]
+    positions, kinds = positions[:nTokens], kinds[:nTokens]
+
+    isWord = kinds != ord("*")
+    recordStarts = np.flatnonzero(~isWord) - np.arange(np.count_nonzero(~isWord))
+    positions, kinds = positions[isWord], kinds[isWord]
+
+    words = np.zeros((positions.shape[0], 8), dtype=np.uint8)
+    integers = words.view("<i8").ravel()
+    doubles = words.view("<d").ravel()
+
+    isInteger = kinds == ord("I")
+    nDigits = _getAsciiIntegers(text, positions[isInteger] + 1, np.full(np.count_nonzero(isInteger), 2))
+    integers[isInteger] = _getAsciiIntegers(text, positions[isInteger] + 3, nDigits)
+
+    isDouble = kinds == ord("D")
+    numbers = text[positions[isDouble, None] + np.arange(1, 23)]
+    numbers[numbers == ord("D")] = ord("E")
+    doubles[isDouble] = numbers.view("S22").ravel().astype(np.float64)
+
+    isString = kinds == ord("A")
+    words[isString] = text[positions[isString, None] + np.arange(1, 9)]
+
+    return words.view("b"), recordStarts, nDecoded
+
+
+class AsciiFilRecordReader:
+    def __init__(self, fn: str):
+        """Iterate over all records of a complete ASCII .fil file, batch wise.
+        The records are identical to the records of a binary .fil file.
+
+        Parameters
+        ----------
+        fn
+            The .fil file name.
+        """
+
+        self.fn = fn
+        self.bytesProcessed = 0
+
+    def __iter__(self):
+        fileSize = os.path.getsize(self.fn)
+        remainder = np.zeros(0, dtype=np.uint8)
+        fileIdx = 0
+
+        while fileIdx < fileSize or remainder.shape[0]:
+            count = min(FIL_ASCII_BATCHSIZE, fileSize - fileIdx)
+            batch = np.fromfile(self.fn, dtype=np.uint8, count=count, offset=fileIdx)
+            fileIdx += count
+            final = fileIdx >= fileSize
+
+            text = np.concatenate((remainder, batch[(batch != ord("\n")) & (batch != ord("\r"))]))
+            words, recordStarts, nDecoded = decodeAsciiFilWords(text, final)
+            remainder = text[nDecoded:]
+            self.bytesProcessed = fileIdx - remainder.shape[0]
+
+            header = words.view("<i8").ravel()
+            for wordIdx in recordStarts:
+                recordLength = int(header[wordIdx])
+                if recordLength <= 2:
+                    return
+                yield recordLength, int(header[wordIdx + 1]), words[wordIdx + 2 : wordIdx + recordLength]
+
+            if final or not nDecoded:
+                # the end of the file, or a record, which does not fit in a batch; the file is truncated
+                return
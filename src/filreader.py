@@ -0,0 +1,331 @@
+"""
+Copyright (C) 2019 Matthias Neuner <matthias.neuner@uibk.ac.at>
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+A library API for reading .fil files in Python, without an export definition and without writing any files:
+
+    fil = openFil("job.fil")
+    coordinates = fil.model.coordinates
+    for increment in fil.increments():
+        s = increment.getElementResult("S", "LOWER", "C3D8")
+        u = increment.getNodeResult("U")
+
+Results are decoded lazily: while an increment is read, only the positions of its records are collected,
+and the records of a result are decoded to dense arrays when the result is accessed for the first time.
+"""
+
+import numpy as np
+from src.exportengine import filInt, filFlag, filDouble, filStrippedString
+from src.filfileformat import iterateFilRecords, perElementResultRecordTypes, perNodeResultRecordTypes
+from src.modeldatabase import LabelIndex
+from src.resultdatabase import NodeResult, ElementResultRecords
+
+
+class FilModel:
+    def __init__(self):
+        """The model defined in the model setup of a .fil file.
+
+        Attributes
+        ----------
+        nodeLabels
+            The node labels, (nNodes,).
+        coordinates
+            The node coordinates, (nNodes, 3), in the order of the node labels.
+        elements
+            The element labels and the connectivity (node labels) per element type, {elType: (labels, connectivity)}.
+        elementSets
+            The element labels per element set.
+        nodeSets
+            The node labels per node set.
+        labelCrossReferences
+            The label cross references, which are already applied to the set names.
+        heading
+            The Abaqus release, the date and the time of the heading.
+        """
+
+        self.nodeLabels = np.zeros(0, dtype=np.int64)
+        self.coordinates = np.zeros((0, 3))
+        self.elements = {}
+        self.elementSets = {}
+        self.nodeSets = {}
+        self.labelCrossReferences = {}
+        self.heading = None
+
+        self.nodeIndex = LabelIndex(self.nodeLabels)
+        self._elementLabelsPerType = {}
+
+    def getSetName(self, setName: str):
+        if not setName:
+            return "ALL"
+        return self.labelCrossReferences.get(setName, setName)
+
+    def getElementLabels(self, setName: str, elType: str):
+        """Get the labels of the elements of a type in an element set, in the order of the set definition.
+        If the set does not exist (e.g., for output without a set), all elements of the type are returned.
+
+        Parameters
+        ----------
+        setName
+            The name of the element set.
+        elType
+            The element type.
+
+        Returns
+        -------
+        np.ndarray
+            The element labels.
+        """
+
+        allLabels = self.elements[elType][0] if elType in self.elements else np.zeros(0, dtype=np.int64)
+        if setName not in self.elementSets:
+            return allLabels
+
+        key = (setName, elType)
+        if key not in self._elementLabelsPerType:
+            labels = self.elementSets[setName]
+            self._elementLabelsPerType[key] = labels[np.isin(labels, allLabels)]
+        return self._elementLabelsPerType[key]
+
+
+class FilIncrement:
+    def __init__(self, model: FilModel, number: int):
+        """An increment of a .fil file. The records are collected while the increment is read,
+        and they are decoded when a result is accessed.
+
+        Parameters
+        ----------
+        model
+            The model.
+        number
+            The number of the increment in the .fil file, starting with 1.
+        """
+
+        self.model = model
+        self.number = number
+        self.step = 0
+        self.increment = 0
+        self.stepTime = 0.0
+        self.totalTime = 0.0
+        self.timeIncrement = 0.0
+        self.energies = None
+
+        self._elementRecords = {}
+        self._nodeRecords = {}
+        self._elementResults = {}
+        self._nodeResults = {}
+
+    @property
+    def elementResultKeys(self):
+        """The available element results as (result, set name, element type)."""
+        return list(self._elementRecords.keys())
+
+    @property
+    def nodeResultKeys(self):
+        """The available nodal results."""
+        return list(self._nodeRecords.keys())
+
+    def getElementResult(self, result: str, setName: str, elType: str):
+        """Get the dense results of the elements of a type in an element set.
+
+        Parameters
+        ----------
+        result
+            The result, e.g., S or SDV.
+        setName
+            The name of the element set.
+        elType
+            The element type.
+
+        Returns
+        -------
+        ElementResult
+            The results, with rows in the order of FilModel.getElementLabels(setName, elType),
+            and one array of shape (nElements, nComponents) per quadrature point in ElementResult["qps"].
+        """
+
+        key = (result, setName, elType)
+        if key not in self._elementResults:
+            if key not in self._elementRecords:
+                raise Exception("Result {:} is not available for set {:} and element type {:}.".format(*key))
+
+            records = ElementResultRecords()
+            for header, content in self._elementRecords.pop(key):
+                records.append(filFlag(header[0]), filFlag(header[1]), filDouble(content))
+
+            elementIndex = LabelIndex(self.model.getElementLabels(setName, elType))
+            self._elementResults[key] = records.toElementResult(elementIndex if len(elementIndex) else None)
+
+        return self._elementResults[key]
+
+    def getNodeResult(self, result: str):
+        """Get the dense results of all nodes.
+
+        Parameters
+        ----------
+        result
+            The result, e.g., U or RF.
+
+        Returns
+        -------
+        NodeResult
+            The results, with rows in the order of FilModel.nodeLabels, and a mask for nodes without results.
+        """
+
+        if result not in self._nodeResults:
+            if result not in self._nodeRecords:
+                raise Exception("Nodal result {:} is not available.".format(result))
+
+            contents = self._nodeRecords.pop(result)
+            self._nodeResults[result] = NodeResult(
+                self.model.nodeIndex,
+                [filInt(content[0])[0] for content in contents],
+                [filDouble(content[1:]) for content in contents],
+            )
+
+        return self._nodeResults[result]
+
+
+class FilReader:
+    def __init__(self, fn: str):
+        """Read the model setup of a .fil file.
+
+        Parameters
+        ----------
+        fn
+            The .fil file name.
+        """
+
+        self.fn = fn
+        self.model = FilModel()
+
+        records = iterateFilRecords(fn)
+        self._readModelSetup(records)
+        records.close()
+
+    def _readModelSetup(self, records):
+        model = self.model
+        nodes = {}
+        elements = {}
+        elementSets = {}
+        nodeSets = {}
+        currentSet = None
+
+        for _, recordType, recordContent in records:
+            if recordType == 2001:
+                break
+
+            elif recordType == 1900:
+                elType = filStrippedString(recordContent[1])
+                elements.setdefault(elType, {})[int(filInt(recordContent[0])[0])] = filInt(recordContent[2:]).copy()
+
+            elif recordType == 1901:
+                coords = filDouble(recordContent[1:4])
+                nodes[int(filInt(recordContent[0])[0])] = np.pad(coords, (0, 3 - coords.shape[0]))
+
+            elif recordType in (1931, 1933):
+                sets = nodeSets if recordType == 1931 else elementSets
+                currentSet = sets.setdefault(filStrippedString(recordContent[0]), [])
+                currentSet.append(filInt(recordContent[1:]).copy())
+
+            elif recordType in (1932, 1934) and currentSet is not None:
+                currentSet.append(filInt(recordContent).copy())
+
+            elif recordType == 1940:
+                model.labelCrossReferences[str(filFlag(recordContent[0]))] = filStrippedString(recordContent[1:])
+
+            elif recordType == 1921:
+                model.heading = (
+                    filStrippedString(recordContent[0]),
+                    filStrippedString(recordContent[1:3]),
+                    filStrippedString(recordContent[3]),
+                )
+
+        model.nodeLabels = np.fromiter(nodes.keys(), dtype=np.int64, count=len(nodes))
+        model.coordinates = np.asarray(list(nodes.values()), dtype=float).reshape(-1, 3)
+        model.nodeIndex = LabelIndex(model.nodeLabels)
+
+        for elType, connectivity in elements.items():
+            model.elements[elType] = (
+                np.fromiter(connectivity.keys(), dtype=np.int64, count=len(connectivity)),
+                np.asarray(list(connectivity.values()), dtype=np.int64),
+            )
+
+        for sets, modelSets in ((elementSets, model.elementSets), (nodeSets, model.nodeSets)):
+            for setName, labels in sets.items():
+                modelSets[model.getSetName(setName)] = np.concatenate(labels)
+
+    def increments(self):
+        """Iterate over the complete increments of the .fil file. An incomplete last increment,
+        e.g., of a running or aborted analysis, is omitted.
+
+        The records of an increment reference the batch chunk of the .fil file, from which they are read.
+        Results should therefore be accessed while iterating, instead of keeping all increments.
+
+        Yields
+        ------
+        FilIncrement
+            The increment.
+        """
+
+        model = self.model
+        modelSetup = True
+        increment = None
+        setName = None
+        elType = None
+        elementHeader = None
+        nIncrements = 0
+
+        for _, recordType, recordContent in iterateFilRecords(self.fn):
+            if modelSetup:
+                modelSetup = recordType != 2001
+
+            elif recordType == 1:
+                elementHeader = recordContent[0:2]
+
+            elif recordType in perElementResultRecordTypes:
+                if setName is not None and elementHeader is not None:
+                    key = (perElementResultRecordTypes[recordType], setName, elType)
+                    increment._elementRecords.setdefault(key, []).append((elementHeader, recordContent))
+
+            elif recordType in perNodeResultRecordTypes:
+                increment._nodeRecords.setdefault(perNodeResultRecordTypes[recordType], []).append(recordContent)
+
+            elif recordType == 1911:
+                flag = filFlag(recordContent[0])
+                setName = model.getSetName(filStrippedString(recordContent[1])) if flag in (0, 1) else None
+                elType = filStrippedString(recordContent[2]) if flag == 0 else ""
+
+            elif recordType == 2000:
+                nIncrements += 1
+                increment = FilIncrement(model, nIncrements)
+                increment.totalTime, increment.stepTime = (float(x) for x in filDouble(recordContent[0:2]))
+                increment.step, increment.increment = (int(x) for x in filInt(recordContent[5:7]))
+                increment.timeIncrement = float(filDouble(recordContent[10])[0])
+                setName = None
+                elementHeader = None
+
+            elif recordType == 1999:
+                increment.energies = filDouble(recordContent).copy()
+
+            elif recordType == 2001:
+                yield increment
+
+
+def openFil(fn: str):
+    """Open a .fil file for reading in Python. The model setup is read immediately.
+
+    Parameters
+    ----------
+    fn
+        The .fil file name.
+
+    Returns
+    -------
+    FilReader
+        The reader, which provides the model, and the increments.
+    """
+
+    return FilReader(fn)
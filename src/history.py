@@ -0,0 +1,359 @@
+"""
+Copyright (C) 2019 Matthias Neuner <matthias.neuner@uibk.ac.at>
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+Fast extraction of time histories of results at selected nodes and elements (filconverter.py --history).
+Instead of decoding every record, the first increment is scanned for the records of the selected labels,
+and their positions relative to the start of the increment are stored in a template.
+Subsequent increments with the same structure are read directly at these positions.
+"""
+
+import os
+import numpy as np
+from src.filfileformat import FIL_CHUNKSIZE, isAsciiFilFile, perElementResultRecordTypes, perNodeResultRecordTypes
+
+_resultRecordTypes = {result: recordType for recordType, result in perElementResultRecordTypes.items()}
+_resultRecordTypes.update({result: recordType for recordType, result in perNodeResultRecordTypes.items()})
+
+
+class FilWords:
+    def __init__(self, fn: str):
+        """Random access to the words of a .fil file by memory-mapping, without the leading and trailing bytes
+        of each chunk. Only complete chunks are accessible.
+
+        Parameters
+        ----------
+        fn
+            The .fil file name.
+        """
+
+        if isAsciiFilFile(fn):
+            raise Exception(
+                "Random access is only possible for binary .fil files, but {:} is an ASCII .fil file.".format(fn)
+            )
+
+        nChunks = os.path.getsize(fn) // FIL_CHUNKSIZE
+        self.nWords = nChunks * 512
+        if nChunks:
+            self._map = np.memmap(fn, dtype=np.uint8, mode="r", shape=(nChunks * FIL_CHUNKSIZE,))
+            self._words = np.ndarray(
+                (nChunks, 512, 8), dtype=np.uint8, buffer=self._map, offset=4, strides=(FIL_CHUNKSIZE, 8, 1)
+            )
+        else:
+            self._words = np.zeros((0, 512, 8), dtype=np.uint8)
+
+    def getInt(self, index: int):
+        return int(self._words[index // 512, index % 512].view("<i8")[0])
+
+    def getFlag(self, index: int):
+        return int(self._words[index // 512, index % 512, 0:4].view("<i4")[0])
+
+    def getInts(self, indices: np.ndarray):
+        return self._words[indices // 512, indices % 512].view("<i8").reshape(indices.shape)
+
+    def getDoubles(self, indices: np.ndarray):
+        return self._words[indices // 512, indices % 512].view("<d").reshape(indices.shape)
+
+
+class _IncrementTemplate:
+    def __init__(self, length: int, keyPositions: list, keyValues: list, valuePositions: list):
+        """The structure of an increment: the positions of all values of the time histories, and the key words
+        (record headers and labels), which identify the records at these positions. All positions are relative
+        to the start of the increment.
+
+        Parameters
+        ----------
+        length
+            The number of words of the increment, including the start and the end increment record.
+        keyPositions
+            The positions of the key words.
+        keyValues
+            The expected values of the key words.
+        valuePositions
+            The positions of the values per time history, (nLabels, nComponents), -1 for missing values.
+        """
+
+        self.length = length
+        self.keyPositions = np.asarray(keyPositions, dtype=np.int64)
+        self.keyValues = np.asarray(keyValues, dtype=np.int64)
+        self.valuePositions = valuePositions
+
+
+class TimeHistory:
+    def __init__(self, definition: dict):
+        """The time history of a result at selected nodes or elements.
+
+        Parameters
+        ----------
+        definition
+            The *timeHistory definition.
+        """
+
+        self.result = definition["result"]
+        self.name = definition.get("name", self.result)
+        self.qp = definition.get("qp", 1)
+        self.fileFormat = definition.get("format", "csv")
+
+        if self.result not in _resultRecordTypes:
+            raise Exception(
+                "*timeHistory {:}: result {:} is not supported; use one of {:}.".format(
+                    self.name, self.result, ", ".join(_resultRecordTypes)
+                )
+            )
+        if self.fileFormat not in ("csv", "npz"):
+            raise Exception("*timeHistory {:}: format must be either 'csv' or 'npz'!".format(self.name))
+
+        self.recordType = _resultRecordTypes[self.result]
+        self.isPerNode = self.recordType in perNodeResultRecordTypes
+        self.labels = np.asarray([int(label) for line in definition.get("data", []) for label in line], dtype=np.int64)
+        if not self.labels.shape[0]:
+            raise Exception("*timeHistory {:}: no node or element labels defined.".format(self.name))
+
+        self.rows = {int(label): row for row, label in enumerate(self.labels)}
+        self.nComponents = None
+        self.values = []
+
+
+class HistoryExtractor:
+    def __init__(self, inputFile: dict, exportName: str):
+        """Extract the time histories defined by *timeHistory from a .fil file.
+
+        Parameters
+        ----------
+        inputFile
+            The dictionary containing the input file.
+        exportName
+            The export name, which is the prefix of the written files.
+        """
+
+        self.exportName = exportName
+        self.histories = [TimeHistory(definition) for definition in inputFile["*timeHistory"]]
+        if not self.histories:
+            raise Exception("No time histories defined; use the keyword *timeHistory.")
+
+        self.increments = []
+        self.nTemplates = 0
+
+    def extract(self, fn: str):
+        """Extract the time histories of all increments of a .fil file.
+
+        Parameters
+        ----------
+        fn
+            The .fil file name.
+        """
+
+        words = FilWords(fn)
+        template = None
+        position = self._findIncrement(words, 0)
+
+        while position is not None:
+            if template is None or not self._matchesTemplate(words, position, template):
+                template = self._scanIncrement(words, position)
+                if template is None:
+                    # an incomplete increment of an aborted or running analysis
+                    break
+                self.nTemplates += 1
+
+            self._readIncrement(words, position, template)
+            position = self._findIncrement(words, position + template.length)
+
+    def _getRecordHeader(self, words: FilWords, position: int):
+        """The length and type of the record at a position, or None if there is no complete record."""
+
+        if position + 2 > words.nWords:
+            return None
+        recordLength = words.getInt(position)
+        if recordLength <= 2 or position + recordLength > words.nWords:
+            return None
+        return recordLength, words.getInt(position + 1)
+
+    def _findIncrement(self, words: FilWords, position: int):
+        """Find the next start increment record, starting from a position."""
+
+        while True:
+            header = self._getRecordHeader(words, position)
+            if header is None:
+                return None
+            recordLength, recordType = header
+            if recordType == 2000:
+                return position
+            position += recordLength
+
+    def _matchesTemplate(self, words: FilWords, start: int, template: _IncrementTemplate):
+        if start + template.length > words.nWords:
+            return False
+        return np.array_equal(words.getInts(start + template.keyPositions), template.keyValues)
+
+    def _scanIncrement(self, words: FilWords, start: int):
+        """Scan all records of an increment for the records of the time histories, and create the template.
+
+        Returns
+        -------
+        _IncrementTemplate
+            The template, or None if the increment is incomplete.
+        """
+
+        keyPositions = [0, 1]
+        keyValues = [words.getInt(start), 2000]
+        valuePositions = [{} for _ in self.histories]
+
+        perNodeHistories = {}
+        perElementHistories = {}
+        for i, history in enumerate(self.histories):
+            (perNodeHistories if history.isPerNode else perElementHistories).setdefault(history.recordType, []).append(
+                (i, history)
+            )
+
+        elementLabel = None
+        elementIpt = None
+        elementHeader = None
+        # the time histories and labels of the current element result, which may be continued by records of the same type
+        continued = []
+        continuedRecordType = None
+
+        position = start
+        while True:
+            header = self._getRecordHeader(words, position)
+            if header is None:
+                return None
+            recordLength, recordType = header
+            relativePosition = position - start
+
+            if recordType == 1:
+                elementLabel = words.getFlag(position + 2)
+                elementIpt = words.getFlag(position + 3)
+                elementHeader = relativePosition
+                continued = []
+
+            elif recordType in perNodeHistories:
+                label = words.getInt(position + 2)
+                for i, history in perNodeHistories[recordType]:
+                    if label in history.rows and label not in valuePositions[i]:
+                        valuePositions[i][label] = list(range(relativePosition + 3, relativePosition + recordLength))
+                        keyPositions += [relativePosition, relativePosition + 1, relativePosition + 2]
+                        keyValues += [recordLength, recordType, words.getInt(position + 2)]
+
+            elif recordType in perElementHistories and elementHeader is not None:
+                if continued and recordType == continuedRecordType:
+                    for i, label in continued:
+                        valuePositions[i][label] += range(relativePosition + 2, relativePosition + recordLength)
+                    keyPositions += [relativePosition, relativePosition + 1]
+                    keyValues += [recordLength, recordType]
+                else:
+                    continued = []
+                    continuedRecordType = recordType
+                    for i, history in perElementHistories[recordType]:
+                        if (
+                            elementLabel in history.rows
+                            and elementIpt == history.qp
+                            and elementLabel not in valuePositions[i]
+                        ):
+                            valuePositions[i][elementLabel] = list(
+                                range(relativePosition + 2, relativePosition + recordLength)
+                            )
+                            continued.append((i, elementLabel))
+                    if continued:
+                        keyPositions += [elementHeader + k for k in range(4)]
+                        keyValues += [words.getInt(start + elementHeader + k) for k in range(4)]
+                        keyPositions += [relativePosition, relativePosition + 1]
+                        keyValues += [recordLength, recordType]
+
+            else:
+                continued = []
+
+            if recordType == 2001:
+                keyPositions += [relativePosition, relativePosition + 1]
+                keyValues += [recordLength, recordType]
+                length = relativePosition + recordLength
+                break
+
+            position += recordLength
+
+        return _IncrementTemplate(
+            length,
+            keyPositions,
+            keyValues,
+            [self._getValuePositions(h, p) for h, p in zip(self.histories, valuePositions)],
+        )
+
+    def _getValuePositions(self, history: TimeHistory, positions: dict):
+        """Arrange the positions of the values of a time history as (nLabels, nComponents), -1 for missing values.
+        The number of components is determined by the first increment, in which the result is found."""
+
+        if history.nComponents is None and positions:
+            history.nComponents = max(len(p) for p in positions.values())
+
+        valuePositions = np.full((history.labels.shape[0], history.nComponents or 0), -1, dtype=np.int64)
+        for label, p in positions.items():
+            p = p[: valuePositions.shape[1]]
+            valuePositions[history.rows[label], : len(p)] = p
+        return valuePositions
+
+    def _readIncrement(self, words: FilWords, start: int, template: _IncrementTemplate):
+        """Read the time and all values of the time histories of an increment using its template."""
+
+        tTotal, tStep = words.getDoubles(np.array([start + 2, start + 3]))
+        nStep, nInc = words.getInts(np.array([start + 7, start + 8]))
+        self.increments.append((len(self.increments) + 1, nStep, nInc, tStep, tTotal))
+
+        for history, positions in zip(self.histories, template.valuePositions):
+            nComponents = history.nComponents or 0
+            values = np.full((history.labels.shape[0], nComponents), np.nan)
+            if positions.shape[1] == nComponents:
+                found = positions >= 0
+                values[found] = words.getDoubles(start + positions[found])
+            history.values.append(values)
+
+    def write(self):
+        """Write all time histories to .csv or .npz files.
+
+        Returns
+        -------
+        list[str]
+            The names of the written files.
+        """
+
+        increments = np.asarray(self.increments, dtype=float).reshape(-1, 5)
+        fileNames = []
+
+        for history in self.histories:
+            nComponents = history.nComponents or 0
+            values = np.asarray(
+                [v if v.shape[1] == nComponents else np.full((v.shape[0], nComponents), np.nan) for v in history.values]
+            ).reshape(-1, history.labels.shape[0], nComponents)
+
+            fileName = "{:}_{:}.{:}".format(self.exportName, history.name, history.fileFormat)
+            if history.fileFormat == "npz":
+                np.savez(
+                    fileName,
+                    increment=increments[:, 0].astype(np.int64),
+                    step=increments[:, 1].astype(np.int64),
+                    stepIncrement=increments[:, 2].astype(np.int64),
+                    stepTime=increments[:, 3],
+                    totalTime=increments[:, 4],
+                    labels=history.labels,
+                    values=values,
+                )
+            else:
+                columns = ["increment", "step", "stepIncrement", "stepTime", "totalTime"]
+                qp = "" if history.isPerNode else "_qp{:}".format(history.qp)
+                columns += [
+                    "{:}_{:}{:}_{:}".format(history.result, label, qp, c + 1)
+                    for label in history.labels
+                    for c in range(nComponents)
+                ]
+                np.savetxt(
+                    fileName,
+                    np.hstack([increments, values.reshape(values.shape[0], -1)]),
+                    delimiter=",",
+                    header=",".join(columns),
+                    comments="",
+                    fmt=["%d"] * 3 + ["%.10g"] * (2 + values.shape[1] * nComponents),
+                )
+            fileNames.append(fileName)
+
+        return fileNames
@@ -12,6 +12,7 @@ import numpy as np
 from os.path import dirname, join
 import textwrap
 import shlex
+from src.transforms import transforms
 
 
 class InputSyntaxException(Exception):
@@ -52,6 +53,55 @@ typeMappings = {
                 str,
                 "discard Time values and replace by enumeration of time steps",
             ),
+            "format": (
+                str,
+                "(optional), ensight (default): Ensight Gold, or xdmf: flat little-endian binary arrays described by an XDMF index (caseName.xmf), which can be memory-mapped",
+            ),
+            "fileMode": (
+                str,
+                "(optional), single (default): append all time steps of a variable to a single file, or perStep: write each time step to a separate file (name.****.var, or name.****.bin for xdmf)",
+            ),
+            "stepFileNameDigits": (
+                int,
+                "(optional), number of digits of the time step number in the file names for fileMode=perStep, default is 4",
+            ),
+            "updateInterval": (
+                int,
+                "(optional), update the case file during the conversion every N increments (default 10), 0 to disable",
+            ),
+            "updateIntervalSeconds": (
+                float,
+                "(optional), update the case file during the conversion if N seconds have elapsed since the last update",
+            ),
+            "exportThreads": (
+                int,
+                "(optional), create the variables of the export jobs of an increment concurrently using N threads, default is 1",
+            ),
+        },
+    ),
+    "*timeHistory": (
+        "define a time history of a result at selected nodes or elements, which is extracted by filconverter.py --history "
+        "without a full conversion. It is written to exportName_name.csv or exportName_name.npz",
+        {
+            "result": (str, "Abaqus variable identifier, e.g., U, RF, S, SDV"),
+            "name": (str, "(optional), the name of the time history, default is the result"),
+            "qp": (int, "(optional), the quadrature point for element results, default is 1"),
+            "format": (str, "(optional), csv (default) or npz"),
+            "data": (str, "node or element labels"),
+        },
+    ),
+    "*energyHistory": (
+        "modify the output of the total energies (1999 records), which are written as time series to exportName_energies.csv",
+        {
+            "format": (str, "(optional), csv (default), streamed per energy record, or npy, written at the end"),
+        },
+    ),
+    "*exportResultStore": (
+        "additionally write all exported variables to a columnar result store, "
+        "i.e., one append-only (time, node/element, component) float32 array per variable and a JSON manifest, "
+        "which can be queried for time histories and fields using src.resultstore.ResultStore without reading all data",
+        {
+            "directory": (str, "(optional), the directory of the store, default is exportName_store"),
         },
     ),
     "*computeAverageOverQuadraturePoints": (
@@ -61,6 +111,45 @@ typeMappings = {
             "result": (str, "Abaqus variable identifier"),
         },
     ),
+    "*computeNodalAverage": (
+        "average an elemental result at the nodes of an element set, resulting in a nodal result (e.g., for smooth contour plots)",
+        {
+            "set": (str, "Abaqus element set"),
+            "result": (str, "Abaqus variable identifier"),
+            "location": (str, "where is the result ? qps | computed "),
+            "which": (
+                str,
+                'which one? e.g. quadrature point numbers or "average" for average computed results',
+            ),
+            "destination": (
+                str,
+                "new name of the nodal result, which can be exported by per node variable jobs",
+            ),
+            "weighting": (
+                str,
+                "(optional), uniform (default) or volume; weight the contributions of the elements by their volume (area, length)",
+            ),
+        },
+    ),
+    "*computeTensorInvariants": (
+        "compute invariants and principal values of a stress or strain result in Voigt notation, for all quadrature points and computed results (e.g., average)",
+        {
+            "set": (str, "Abaqus element set"),
+            "result": (str, "Abaqus variable identifier"),
+            "destination": (
+                str,
+                "new name of the result, with the components: equivalent value (von Mises stress or equivalent strain), pressure, I1, J2, J3, max./mid./min. principal value",
+            ),
+            "values": (
+                str,
+                "(optional), define a index/slice to extract the 3, 4 or 6 Voigt components from the total result array",
+            ),
+            "type": (
+                str,
+                "(optional), stress (default) or strain; strains are expected with engineering shear components",
+            ),
+        },
+    ),
     "*UELSDVToQuadraturePoints": (
         "relate SDV data to quadrature points",
         {
@@ -104,11 +193,21 @@ typeMappings = {
             ),
             "f(x)": (
                 str,
-                "(optional), apply a mathematical/array expression on the result array (per Element, slow!)",
+                "(optional), apply a mathematical/array expression on the result array x of each node, e.g., x[0]+x[1] or max(x)",
             ),
-            "fillMissingValues": (
+            "f(x)Mode": (
+                str,
+                "(optional), rows (default): evaluate f(x) once per node; components: evaluate f(x) once for all nodes, "
+                "x[i] denotes the i-th component of all nodes. This is much faster, but only for expressions indexing "
+                "components, e.g., x[0]+x[1]; other expressions, e.g., max(x), raise an error",
+            ),
+            "transform": (
+                str,
+                "(optional), apply a built-in vectorized transform (see below) after values and f(x), e.g., voigt2d_to_voigt3d",
+            ),
+            "fillMissingValuesTo": (
                 float,
-                "(optional), fill missing nodal values with a constant values, requires specified dimensions (slow!)",
+                "(optional), fill missing nodal values and components with a constant value, requires specified dimensions",
             ),
         },
     ),
@@ -140,10 +239,36 @@ typeMappings = {
             ),
             "f(x)": (
                 str,
-                "(optional), apply a mathematical/array expression on the result array (per Element, slow!)",
+                "(optional), apply a mathematical/array expression on the result array x of each element, e.g., x[0]+x[1] or max(x)",
+            ),
+            "f(x)Mode": (
+                str,
+                "(optional), rows (default): evaluate f(x) once per element; components: evaluate f(x) once for all elements, "
+                "x[i] denotes the i-th component of all elements. This is much faster, but only for expressions indexing "
+                "components, e.g., x[0]+x[1]; other expressions, e.g., max(x), raise an error",
+            ),
+            "transform": (
+                str,
+                "(optional), apply a built-in vectorized transform (see below) after values and f(x), e.g., voigt2d_to_voigt3d",
             ),
         },
     ),
+    "*buildOnlyReferencedSets": (
+        "build and export only element sets and node sets, which are referenced by computations or export jobs. "
+        "This may save a lot of time and disk space for models with many sets. "
+        "The names of all sets in the .fil file are still listed in the summary.",
+        {
+            "data": (str, "(optional), names of additional sets to be built and exported"),
+        },
+    ),
+    "*ensightExportOnlyReferencedParts": (
+        "write only those sets as Ensight parts to the geometry, which are referenced by per node or per element jobs. "
+        "Part IDs are numbered consecutively. This may reduce the size of the geometry file considerably, "
+        "as every part contains the coordinates of all its nodes.",
+        {
+            "data": (str, "(optional), names of additional sets to be exported as parts"),
+        },
+    ),
     "*substituteElSet": (
         "define an substitution for an element set in the .fil file. This is useful if you want to replace an element set with another one."
         "For instance Abaqus/Explicit is know to write faulty element sets to the *.inp file if multiple cpu cores are used in combination with VUEL/VUMAT. ",
@@ -253,3 +378,13 @@ def printKeywords():
             wrapper.subsequent_indent = " " * len(wrapper.initial_indent)
             print(wrapper.fill(description))
         print("\n")
+
+    print("available transforms:")
+    print("---------------------")
+    print("")
+    for name, transform in transforms.items():
+        wrapper.initial_indent = kwDataString.format(
+            name, "{:} -> {:}".format(transform.nComponentsIn, transform.nComponentsOut)
+        )
+        wrapper.subsequent_indent = " " * len(wrapper.initial_indent)
+        print(wrapper.fill(transform.description))
@@ -0,0 +1,172 @@
+"""
+Copyright (C) 2019 Matthias Neuner <matthias.neuner@uibk.ac.at>
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+Fast inspection of a .fil file (filconverter.py --inspect). Only the model setup is read,
+which ends with the first end increment record, and optionally the first increment.
+"""
+
+import os
+import numpy as np
+from collections import Counter
+from src.exportengine import filInt, filFlag, filDouble, filStrippedString
+from src.filfileformat import iterateFilRecords, perElementResultRecordTypes, perNodeResultRecordTypes
+
+
+class FilInspector:
+    def __init__(self, fn: str):
+        """Collect the heading, the element types, the sets and the label cross references of a .fil file.
+
+        Parameters
+        ----------
+        fn
+            The .fil file name.
+        """
+
+        self.fn = fn
+        self.heading = None
+        self.nNodes = 0
+        self.elementTypes = {}
+        self.elSetDefinitions = {}
+        self.nSetDefinitions = {}
+        self.labelCrossReferences = {}
+        self.results = None
+        self.modelSetupComplete = False
+
+        self._currentSet = None
+        self._currentOutput = None
+
+    def inspect(self, sampleResults: bool = False):
+        """Read the model setup, and stop at its end increment record.
+
+        Parameters
+        ----------
+        sampleResults
+            Continue with the first increment, and collect the available combinations of result, set and element type.
+        """
+
+        if sampleResults:
+            self.results = Counter()
+
+        for recordLength, recordType, recordContent in iterateFilRecords(self.fn):
+            if recordType == 2001:
+                if self.modelSetupComplete or not sampleResults:
+                    self.modelSetupComplete = True
+                    break
+                self.modelSetupComplete = True
+
+            elif not self.modelSetupComplete:
+                self._computeModelSetupRecord(recordType, recordContent)
+
+            elif recordType == 1911:
+                self._currentOutput = self._getOutputDefinition(recordContent)
+
+            elif recordType in perElementResultRecordTypes and self._currentOutput is not None:
+                self.results[(perElementResultRecordTypes[recordType],) + self._currentOutput] += 1
+
+            elif recordType in perNodeResultRecordTypes and self._currentOutput is not None:
+                setName, _ = self._currentOutput
+                self.results[(perNodeResultRecordTypes[recordType], setName, "")] += 1
+
+    def _computeModelSetupRecord(self, recordType: int, recordContent: np.ndarray):
+        if recordType == 1900:
+            self.elementTypes[int(filInt(recordContent[0])[0])] = filStrippedString(recordContent[1])
+
+        elif recordType == 1901:
+            self.nNodes += 1
+
+        elif recordType == 1921:
+            self.heading = (
+                filStrippedString(recordContent[0]),
+                filStrippedString(recordContent[1:3]),
+                filStrippedString(recordContent[3]),
+                int(filInt(recordContent[4])[0]),
+                int(filInt(recordContent[5])[0]),
+                float(filDouble(recordContent[6])[0]),
+            )
+
+        elif recordType in (1931, 1933):
+            definitions = self.nSetDefinitions if recordType == 1931 else self.elSetDefinitions
+            self._currentSet = definitions.setdefault(filStrippedString(recordContent[0]), [])
+            self._currentSet.append(filInt(recordContent[1:]).copy())
+
+        elif recordType in (1932, 1934) and self._currentSet is not None:
+            self._currentSet.append(filInt(recordContent).copy())
+
+        elif recordType == 1940:
+            self.labelCrossReferences[str(filFlag(recordContent[0]))] = filStrippedString(recordContent[1:])
+
+    def _getOutputDefinition(self, recordContent: np.ndarray):
+        """The set name and the element type of an output request definition, or None for modal or energy output."""
+
+        flag = filFlag(recordContent[0])
+        if flag not in (0, 1):
+            return None
+        return self.getSetName(filStrippedString(recordContent[1])), (
+            filStrippedString(recordContent[2]) if flag == 0 else ""
+        )
+
+    def getSetName(self, setName: str):
+        """The name of a set, as it is used by the export definition."""
+
+        if not setName:
+            return "ALL"
+        return self.labelCrossReferences.get(setName, setName)
+
+    def getElementCountsPerType(self, labels: np.ndarray):
+        return Counter(self.elementTypes.get(int(label), "undefined") for label in labels)
+
+    def printSummary(self):
+        print("+" + "-" * 78 + "+")
+        print("| Inspection of {:<63}|".format(os.path.basename(self.fn)))
+        print("+" + "-" * 78 + "+")
+
+        if self.heading:
+            abqRelease, date, time, nElements, nNodes, elLength = self.heading
+            print("|{:<60}{:>18}|".format("Abaqus release:", abqRelease))
+            print("|{:<50}{:>28}|".format("date:", date + " " + time))
+            print("|{:<60}{:>18}|".format("elements (heading):", nElements))
+            print("|{:<60}{:>18}|".format("nodes (heading):", nNodes))
+            print("|{:<60}{:>18.5g}|".format("typical element length:", elLength))
+
+        if not self.modelSetupComplete:
+            print("|{:<78}|".format("the model setup is incomplete"))
+
+        print("|{:<60}{:>18}|".format("nodes:", self.nNodes))
+        print("|{:<60}{:>18}|".format("elements:", len(self.elementTypes)))
+        for elType, count in sorted(self.getElementCountsPerType(self.elementTypes.keys()).items()):
+            print("|{:<4}{:<46}{:10}{:>9} elements|".format(" ", "", elType, count))
+
+        print("|{:<60}{:>18}|".format("element sets:", len(self.elSetDefinitions)))
+        for setName, labels in self.elSetDefinitions.items():
+            counts = self.getElementCountsPerType(np.concatenate(labels))
+            for i, (elType, count) in enumerate(sorted(counts.items())):
+                print(
+                    "|{:<4}{:<46}{:10}{:>9} elements|".format(
+                        " ", self.getSetName(setName) if not i else "", elType, count
+                    )
+                )
+            if not counts:
+                print("|{:<4}{:<46}{:10}{:>9} elements|".format(" ", self.getSetName(setName), "", 0))
+
+        print("|{:<60}{:>18}|".format("node sets:", len(self.nSetDefinitions)))
+        for setName, labels in self.nSetDefinitions.items():
+            print(
+                "|{:<4}{:<46}{:10}{:>9}    nodes|".format(
+                    " ", self.getSetName(setName), "", sum(len(l) for l in labels)
+                )
+            )
+
+        print("|{:<60}{:>18}|".format("label cross references:", len(self.labelCrossReferences)))
+        for key, label in self.labelCrossReferences.items():
+            print("|{:<4}{:>10}  {:<62}|".format(" ", key, label[:62]))
+
+        if self.results is not None:
+            print("|{:<60}{:>18}|".format("results in the first increment:", len(self.results)))
+            for (result, setName, elType), nRecords in sorted(self.results.items()):
+                print("|{:<4}{:<8}{:<38}{:10}{:>10} records|".format(" ", result, setName, elType, nRecords))
+
+        print("+" + "-" * 78 + "+")
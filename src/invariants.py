@@ -0,0 +1,80 @@
+"""
+Copyright (C) 2019 Matthias Neuner <matthias.neuner@uibk.ac.at>
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+"""
+
+import numpy as np
+from src.transforms import transforms
+
+# the components of the computed result
+invariantComponents = ["equivalent", "pressure", "I1", "J2", "J3", "principal max", "principal mid", "principal min"]
+
+# Voigt notations with less than 6 components are expanded to 3D first
+_toVoigt3D = {
+    3: transforms["voigt2d_to_voigt3d"],
+    4: transforms["voigt2d4_to_voigt3d"],
+}
+
+
+def computeInvariants(voigt: np.ndarray, isStrain: bool = False):
+    """Compute the invariants and the principal values of symmetric tensors for many elements at once.
+
+    Parameters
+    ----------
+    voigt
+        The tensors in Abaqus Voigt notation (11, 22, 33, 12, 13, 23), or (11, 22, 12) / (11, 22, 33, 12)
+        for plane stress / plane strain, one row per element.
+    isStrain
+        The tensors are strains with engineering shear components. The shear components are halved,
+        and the equivalent value is the equivalent strain instead of the von Mises stress.
+
+    Returns
+    -------
+    np.ndarray
+        The results, one row per element, with the components given by invariantComponents.
+    """
+
+    nComponents = voigt.shape[1]
+    if nComponents in _toVoigt3D:
+        voigt = _toVoigt3D[nComponents](voigt)
+    elif nComponents != 6:
+        raise Exception("Invariants require 3, 4 or 6 Voigt components, but the result has {:}.".format(nComponents))
+
+    s11, s22, s33, s12, s13, s23 = voigt.T
+    if isStrain:
+        s12, s13, s23 = 0.5 * s12, 0.5 * s13, 0.5 * s23
+
+    result = np.empty((voigt.shape[0], len(invariantComponents)))
+
+    I1 = s11 + s22 + s33
+    d11 = s11 - I1 / 3
+    d22 = s22 - I1 / 3
+    d33 = s33 - I1 / 3
+
+    J2 = ((s11 - s22) ** 2 + (s22 - s33) ** 2 + (s33 - s11) ** 2) / 6 + s12**2 + s13**2 + s23**2
+    J3 = d11 * d22 * d33 + 2 * s12 * s13 * s23 - d11 * s23**2 - d22 * s13**2 - d33 * s12**2
+
+    result[:, 0] = np.sqrt(4.0 / 3.0 * J2) if isStrain else np.sqrt(3.0 * J2)
+    result[:, 1] = -I1 / 3
+    result[:, 2] = I1
+    result[:, 3] = J2
+    result[:, 4] = J3
+
+    tensors = np.empty((voigt.shape[0], 3, 3))
+    tensors[:, 0, 0], tensors[:, 1, 1], tensors[:, 2, 2] = s11, s22, s33
+    tensors[:, 0, 1] = tensors[:, 1, 0] = s12
+    tensors[:, 0, 2] = tensors[:, 2, 0] = s13
+    tensors[:, 1, 2] = tensors[:, 2, 1] = s23
+
+    # eigvalsh returns the eigenvalues in ascending order; missing results (NaN) are skipped
+    isFinite = np.isfinite(voigt).all(axis=1)
+    if isFinite.all():
+        result[:, 5:8] = np.linalg.eigvalsh(tensors)[:, ::-1]
+    else:
+        result[:, 5:8] = np.nan
+        result[isFinite, 5:8] = np.linalg.eigvalsh(tensors[isFinite])[:, ::-1]
+
+    return result
@@ -0,0 +1,126 @@
+"""
+Copyright (C) 2019 Matthias Neuner <matthias.neuner@uibk.ac.at>
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+"""
+
+import json
+import time
+from collections import defaultdict
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+
+def getPeakRSS():
+    """Get the peak resident set size of the process in bytes, or None if it is not available."""
+
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _difference(current: dict, previous: dict):
+    return {key: value - previous.get(key, 0) for key, value in current.items() if value != previous.get(key, 0)}
+
+
+class ConversionMetrics:
+    def __init__(self, fileName: str):
+        """Write machine-readable metrics of a conversion to a JSON lines file:
+        one record per increment, and a final summary record.
+
+        Parameters
+        ----------
+        fileName
+            The name of the .jsonl file.
+        """
+
+        self._f = open(fileName, "w")
+        self.recordCounts = defaultdict(int)
+        self.startTime = time.perf_counter()
+
+        self._lastTime = self.startTime
+        self._lastBytesRead = 0
+        self._lastRecordCounts = {}
+        self._lastFileSizes = {}
+        self._lastWrittenValues = {}
+
+    def countRecord(self, recordType: int):
+        self.recordCounts[int(recordType)] += 1
+
+    def writeIncrement(self, exportEngine, bytesRead: int, modelSetup: bool = False):
+        """Write the record of the increment (or the model setup), which has just been finished by the ExportEngine.
+        All quantities refer to the increment, i.e., they are counted since the previous increment.
+
+        Parameters
+        ----------
+        exportEngine
+            The ExportEngine.
+        bytesRead
+            The number of bytes of the .fil file processed so far.
+        modelSetup
+            The finished step is the model setup, not an increment.
+        """
+
+        now = time.perf_counter()
+        ensightCase = exportEngine.ensightExporter.ensightCase
+        recordCounts = {str(recordType): n for recordType, n in self.recordCounts.items()}
+
+        self._write(
+            {
+                "type": "model setup" if modelSetup else "increment",
+                "increment": exportEngine.nIncrements,
+                "totalTime": float(exportEngine.timeHistory[-1]) if exportEngine.timeHistory else None,
+                "wallTime": now - self._lastTime,
+                "bytesRead": int(bytesRead - self._lastBytesRead),
+                "records": _difference(recordCounts, self._lastRecordCounts),
+                "valuesWritten": _difference(ensightCase.writtenValues, self._lastWrittenValues),
+                "bytesWritten": _difference(ensightCase.fileSizes, self._lastFileSizes),
+                "peakRSS": getPeakRSS(),
+            }
+        )
+
+        self._lastTime = now
+        self._lastBytesRead = bytesRead
+        self._lastRecordCounts = recordCounts
+        self._lastFileSizes = dict(ensightCase.fileSizes)
+        self._lastWrittenValues = dict(ensightCase.writtenValues)
+
+    def writeSummary(self, exportEngine, bytesRead: int):
+        """Write the summary record of the complete conversion, and close the file.
+
+        Parameters
+        ----------
+        exportEngine
+            The ExportEngine.
+        bytesRead
+            The number of bytes of the .fil file processed.
+        """
+
+        ensightCase = exportEngine.ensightExporter.ensightCase
+
+        self._write(
+            {
+                "type": "summary",
+                "increments": exportEngine.nIncrements,
+                "nodes": len(exportEngine.nodes),
+                "elements": len(exportEngine.elements),
+                "wallTime": time.perf_counter() - self.startTime,
+                "bytesRead": int(bytesRead),
+                "records": {str(recordType): n for recordType, n in self.recordCounts.items()},
+                "valuesWritten": dict(ensightCase.writtenValues),
+                "bytesWritten": dict(ensightCase.fileSizes),
+                "peakRSS": getPeakRSS(),
+            }
+        )
+        self._f.close()
+
+    def _write(self, record: dict):
+        self._f.write(json.dumps(record) + "\n")
+        self._f.flush()
@@ -7,7 +7,10 @@ file, You can obtain one at https://mozilla.org/MPL/2.0/.
 """
 
 from collections import defaultdict
+import numpy as np
 import os
+import sys
+import time
 
 
 class RecursiveDefaultDict(dict):
@@ -50,9 +53,81 @@ def sliceFromString(string: str, shift: int = 0):
         return slice(int(string) + shift, int(string) + 1 + shift)
 
 
-def makeExtractionFunction(expression, symbol="x"):
-    """make a simple f(x) expression from string"""
-    return lambda x: eval(expression, globals(), {symbol: x})
+def makeExtractionFunction(expression, symbol="x", mode="rows"):
+    """make a simple f(x) expression from string.
+    mode 'rows': x is the result array of a single node or element.
+    mode 'components': x[i] is the i-th component of all nodes or elements (vectorized)."""
+
+    if mode not in ("rows", "components"):
+        raise Exception("Invalid f(x)Mode '{:}' for f(x) {:}, use rows or components.".format(mode, expression))
+
+    extractionFunction = lambda x: eval(expression, globals(), {symbol: x})
+    extractionFunction.expression = expression
+    extractionFunction.componentWise = mode == "components"
+    return extractionFunction
+
+
+def evaluateExtractionFunction(extractionFunction: callable, values: np.ndarray):
+    """Evaluate an extraction function for all rows of a 2D array of results.
+
+    By default, the function is called once per row, i.e., x is the result array of a single node or element.
+    Functions created with mode 'components' are called once for all rows, with x[i] referring to the i-th component
+    of all rows. Such a function must only index components; this is checked against the evaluation of the first row,
+    and an Exception is raised otherwise.
+
+    Parameters
+    ----------
+    extractionFunction
+        The function, e.g., created by makeExtractionFunction.
+    values
+        The results, one row per node or element.
+
+    Returns
+    -------
+    np.ndarray
+        The transformed results, one row per node or element.
+    """
+
+    nRows = values.shape[0]
+
+    def evaluateRow(row):
+        return np.atleast_1d(np.asarray(extractionFunction(row), dtype=float)).ravel()
+
+    if not nRows:
+        return np.zeros((0, evaluateRow(np.zeros(values.shape[1])).shape[0]))
+
+    if not getattr(extractionFunction, "componentWise", False):
+        return np.asarray([evaluateRow(row) for row in values], dtype=float).reshape(nRows, -1)
+
+    result = _evaluateComponentWise(extractionFunction, values)
+    if result is None or not np.array_equal(result[0], evaluateRow(values[0]), equal_nan=True):
+        raise Exception(
+            "f(x) {:} is not evaluated component wise for all nodes or elements; use f(x)Mode=rows.".format(
+                getattr(extractionFunction, "expression", "")
+            )
+        )
+
+    return result
+
+
+def _evaluateComponentWise(extractionFunction: callable, values: np.ndarray):
+    """Evaluate an extraction function once for all rows, or return None if the result is not one row per row."""
+
+    nRows = values.shape[0]
+    try:
+        result = extractionFunction(values.T)
+        if isinstance(result, (list, tuple)):
+            result = [np.asarray(r, dtype=float) for r in result]
+            if all(r.shape == (nRows,) for r in result):
+                return np.column_stack(result)
+            return None
+
+        result = np.asarray(result, dtype=float)
+        if result.ndim in (1, 2) and result.shape[-1] == nRows:
+            return result.T.reshape(nRows, -1)
+        return None
+    except (ValueError, TypeError, IndexError):
+        return None
 
 
 def fileSizeHumanReadable(num: int, suffix: str = "B"):
@@ -97,3 +172,91 @@ def getCurrentFileSize(
     fileStat = os.stat(fn)
     fileSize = fileStat.st_size
     return fileSize
+
+
+class ProgressReporter:
+    def __init__(self, fn: str, refreshInterval: float = 1.0, stream=None):
+        """Report the progress of a conversion in a single, periodically refreshed console line.
+
+        Parameters
+        ----------
+        fn
+            The .fil file name, used to estimate the remaining time based on its current size.
+        refreshInterval
+            The minimum time in seconds between two refreshs of the line.
+        stream
+            (Optional) The stream to write to, default is stdout.
+        """
+
+        self.fn = fn
+        self.refreshInterval = refreshInterval
+        self.stream = stream if stream is not None else sys.stdout
+        self.startTime = time.monotonic()
+        self._lastRefresh = self.startTime
+        self._lineLength = 0
+
+    def update(self, bytesProcessed: int, nRecords: int, nIncrements: int, force: bool = False):
+        """Refresh the progress line, if the refresh interval has elapsed.
+
+        Parameters
+        ----------
+        bytesProcessed
+            The number of bytes of the .fil file processed so far.
+        nRecords
+            The number of records processed so far.
+        nIncrements
+            The number of increments processed so far.
+        force
+            Refresh regardless of the refresh interval.
+        """
+
+        now = time.monotonic()
+        if not force and now - self._lastRefresh < self.refreshInterval:
+            return
+        self._lastRefresh = now
+
+        elapsed = max(now - self.startTime, 1e-9)
+        bytesPerSecond = bytesProcessed / elapsed
+        remainingBytes = max(getCurrentFileSize(self.fn) - bytesProcessed, 0)
+        eta = remainingBytes / bytesPerSecond if bytesPerSecond > 0 else float("inf")
+
+        line = "{:>10} | {:8.2f} MB/s | {:10.0f} records/s | {:8.2f} increments/s | {:>7} incs | ETA {:>9}".format(
+            fileSizeHumanReadable(bytesProcessed),
+            bytesPerSecond / 1e6,
+            nRecords / elapsed,
+            nIncrements / elapsed,
+            nIncrements,
+            formatDuration(eta),
+        )
+
+        self.stream.write("\r" + line.ljust(self._lineLength))
+        self.stream.flush()
+        self._lineLength = len(line)
+
+    def finish(self, bytesProcessed: int, nRecords: int, nIncrements: int):
+        """Print the final state, and terminate the progress line."""
+        self.update(bytesProcessed, nRecords, nIncrements, force=True)
+        self.stream.write("\n")
+        self.stream.flush()
+
+
+def formatDuration(seconds: float):
+    """Pretty format a duration to a human readable form.
+
+    Parameters
+    ----------
+    seconds
+        The duration in seconds.
+
+    Returns
+    -------
+    str
+        The pretty formatted string.
+    """
+
+    if seconds == float("inf"):
+        return "--:--:--"
+
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return "{:02d}:{:02d}:{:02d}".format(hours, minutes, seconds)
@@ -12,6 +12,49 @@ import numpy as np
 from collections import defaultdict
 
 
+class LabelIndex:
+    def __init__(self, labels: np.ndarray):
+        """Maps (arbitrary, possibly non-contiguous) integer labels of nodes or elements
+        to consecutive row indices, i.e., to their position in the given array of labels.
+
+        Parameters
+        ----------
+        labels
+            The unique labels, in the order of the rows.
+        """
+
+        self.labels = np.asarray(labels, dtype=np.int64)
+        self._sorter = np.argsort(self.labels, kind="stable")
+        self._sortedLabels = self.labels[self._sorter]
+
+    def __len__(self):
+        return self.labels.shape[0]
+
+    def getRows(self, labels: np.ndarray):
+        """Get the row indices for a list of labels.
+
+        Parameters
+        ----------
+        labels
+            The labels to be looked up.
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray]
+            The row indices, and a boolean mask marking the labels which actually exist.
+            Row indices of nonexistent labels are meaningless.
+        """
+
+        labels = np.asarray(labels, dtype=np.int64)
+        if not len(self):
+            return np.zeros(labels.shape, dtype=np.int64), np.zeros(labels.shape, dtype=bool)
+
+        positions = np.searchsorted(self._sortedLabels, labels)
+        np.minimum(positions, len(self) - 1, out=positions)
+        found = self._sortedLabels[positions] == labels
+        return self._sorter[positions], found
+
+
 class Node:
     def __init__(self, label: int, coords: np.array):
         """A spatial node.
@@ -69,7 +112,9 @@ class ElSet:
             self.elementsByShape[element.shape].append(element)
 
         self.reducedNodes = self._getEnsightCompatibleReducedNodes()
-        self.reducedNodeIndices = self._getEnsightCompatibleElementNodeIndices()
+        self.reducedNodeIndex = LabelIndex(
+            np.fromiter(self.reducedNodes.keys(), dtype=np.int64, count=len(self.reducedNodes))
+        )
         self.reducedElements = self._getEnsightCompatibleElements()
         self.reducedNodeCoords3D = self._getEnsightCompatibleReducedNodeCoords()
 
@@ -94,19 +139,23 @@ class ElSet:
 
         return reducedNodeCoords3D
 
-    def _getEnsightCompatibleElementNodeIndices(
-        self,
-    ):
-        reducedNodeIndices = {node: i for (i, node) in enumerate(self.reducedNodes.keys())}
-        return reducedNodeIndices
-
     def _getEnsightCompatibleElements(
         self,
     ):
+        """The elements per shape as arrays of their labels (nElements,),
+        and of their connectivity in terms of reduced node indices (nElements, nNodesPerElement)."""
+
         reducedElements = dict()
 
         for eShape, elements in self.elementsByShape.items():
-            reducedElements[eShape] = [(e.label, [self.reducedNodeIndices[n.label] for n in e.nodes]) for e in elements]
+            labels = np.fromiter((e.label for e in elements), dtype=np.int64, count=len(elements))
+            try:
+                nodeLabels = np.asarray([[n.label for n in e.nodes] for e in elements], dtype=np.int64)
+            except ValueError:
+                raise Exception(
+                    "Elements of type {:} in set {:} have different numbers of nodes.".format(eShape, self.name)
+                )
+            reducedElements[eShape] = (labels, self.reducedNodeIndex.getRows(nodeLabels)[0])
         return reducedElements
 
 
@@ -0,0 +1,131 @@
+"""
+Copyright (C) 2019 Matthias Neuner <matthias.neuner@uibk.ac.at>
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+"""
+
+import numpy as np
+from src.modeldatabase import ElSet
+
+# decomposition of Ensight shapes (by their corner nodes) into simplices for computing their measure
+_simplices = {
+    "bar2": [(0, 1)],
+    "bar3": [(0, 1)],
+    "tria3": [(0, 1, 2)],
+    "tria6": [(0, 1, 2)],
+    "quad4": [(0, 1, 2), (0, 2, 3)],
+    "quad8": [(0, 1, 2), (0, 2, 3)],
+    "tetra4": [(0, 1, 2, 3)],
+    "tetra10": [(0, 1, 2, 3)],
+    "pyramid5": [(0, 1, 2, 4), (0, 2, 3, 4)],
+    "pyramid13": [(0, 1, 2, 4), (0, 2, 3, 4)],
+    "penta6": [(0, 1, 2, 3), (1, 2, 3, 4), (2, 3, 4, 5)],
+    "penta15": [(0, 1, 2, 3), (1, 2, 3, 4), (2, 3, 4, 5)],
+    "hexa8": [(0, 1, 3, 4), (1, 2, 3, 6), (1, 4, 5, 6), (3, 4, 6, 7), (1, 3, 4, 6)],
+    "hexa20": [(0, 1, 3, 4), (1, 2, 3, 6), (1, 4, 5, 6), (3, 4, 6, 7), (1, 3, 4, 6)],
+}
+
+
+def computeElementMeasures(coordinates: np.ndarray, connectivity: np.ndarray, shape: str):
+    """Compute the length, area or volume of elements of the same shape.
+
+    Parameters
+    ----------
+    coordinates
+        The nodal coordinates (nNodes, 3).
+    connectivity
+        The node indices of the elements (nElements, nNodesPerElement).
+    shape
+        The Ensight shape. For unknown shapes, all measures are 1.
+
+    Returns
+    -------
+    np.ndarray
+        The measures of the elements.
+    """
+
+    if shape not in _simplices:
+        return np.ones(connectivity.shape[0])
+
+    measures = np.zeros(connectivity.shape[0])
+    for simplex in _simplices[shape]:
+        p = [coordinates[connectivity[:, i]] for i in simplex]
+        if len(simplex) == 2:
+            measures += np.linalg.norm(p[1] - p[0], axis=1)
+        elif len(simplex) == 3:
+            measures += 0.5 * np.linalg.norm(np.cross(p[1] - p[0], p[2] - p[0]), axis=1)
+        else:
+            measures += np.abs(np.einsum("ij,ij->i", np.cross(p[1] - p[0], p[2] - p[0]), p[3] - p[0])) / 6.0
+
+    return measures
+
+
+class NodalAveragingOperator:
+    def __init__(self, elSet: ElSet, ensightShapes: dict[str, str] = None):
+        """A sparse operator, which averages elemental results to the nodes of an element set.
+        Each node obtains the (weighted) mean of the results of all elements connected to it.
+        The operator is stored in a compressed row format, such that its application is a single
+        gather followed by a segmented sum.
+
+        Parameters
+        ----------
+        elSet
+            The element set.
+        ensightShapes
+            (Optional) The Ensight shapes of the element types. If given, the contributions
+            of the elements are weighted by their length, area, or volume.
+        """
+
+        nodeIndices = []
+        elementIndices = []
+        weights = []
+
+        offset = 0
+        for elType, (labels, connectivity) in elSet.reducedElements.items():
+            nElements, nNodesPerElement = connectivity.shape
+
+            if ensightShapes is not None:
+                measures = computeElementMeasures(
+                    elSet.reducedNodeCoords3D, connectivity, ensightShapes.get(elType, None)
+                )
+            else:
+                measures = np.ones(nElements)
+
+            nodeIndices.append(connectivity.ravel())
+            elementIndices.append(np.repeat(np.arange(offset, offset + nElements), nNodesPerElement))
+            weights.append(np.repeat(measures, nNodesPerElement))
+            offset += nElements
+
+        nodeIndices = np.concatenate(nodeIndices)
+        elementIndices = np.concatenate(elementIndices)
+        weights = np.concatenate(weights)
+
+        weights /= np.bincount(nodeIndices, weights=weights)[nodeIndices]
+
+        order = np.argsort(nodeIndices, kind="stable")
+        nodeIndices = nodeIndices[order]
+
+        self.nNodes = len(elSet.reducedNodes)
+        self.nElements = offset
+        self._columns = elementIndices[order]
+        self._weights = weights[order][:, np.newaxis]
+        self._rowStarts = np.flatnonzero(np.diff(nodeIndices, prepend=-1))
+
+    def __call__(self, elementValues: np.ndarray):
+        """Apply the operator.
+
+        Parameters
+        ----------
+        elementValues
+            The results of all elements in the set (nElements, nComponents),
+            in the order of the element types in the set.
+
+        Returns
+        -------
+        np.ndarray
+            The averaged results at the nodes of the set (nNodes, nComponents).
+        """
+
+        return np.add.reduceat(elementValues[self._columns] * self._weights, self._rowStarts, axis=0)
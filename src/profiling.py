@@ -0,0 +1,231 @@
+"""
+Copyright (C) 2019 Matthias Neuner <matthias.neuner@uibk.ac.at>
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+"""
+
+import json
+import threading
+import time
+import tracemalloc
+from prettytable import PrettyTable
+
+
+class _Measurement:
+    def __init__(self, profiler, category: str, name: str, records: int, nBytes: int):
+        """Times a block of code, and adds it to the counters of a profiler on exit.
+        The numbers of records and bytes may be updated within the block."""
+
+        self.profiler = profiler
+        self.category = category
+        self.name = name
+        self.records = records
+        self.nBytes = nBytes
+
+    def __enter__(self):
+        if self.profiler.traceMemory:
+            self.profiler._enterMemoryMeasurement(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        seconds = time.perf_counter() - self.start
+        peakMemory = self.profiler._exitMemoryMeasurement(self) if self.profiler.traceMemory else 0
+        self.profiler.add(self.category, self.name, seconds, self.records, self.nBytes, peakMemory)
+
+
+class _NoMeasurement:
+    """The measurement of a disabled profiler, which does nothing."""
+
+    records = 0
+    nBytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+_noMeasurement = _NoMeasurement()
+
+
+class Profiler:
+    def __init__(self):
+        """Low overhead counters for the time spent in the stages of a conversion.
+        For each category (e.g., 'record', 'stage', 'export job') and name, the number of calls, records, bytes
+        and the cumulative wall time are collected. Times are inclusive, i.e., the time of a record which finishes
+        an increment contains the time of all stages of the increment.
+
+        The profiler is disabled by default. Instrumented code checks 'enabled' before taking any time.
+        """
+
+        self.enabled = False
+        self.traceMemory = False
+        self.counters = {}
+        self.startTime = time.perf_counter()
+        self._measurements = []
+        self._lock = threading.Lock()
+
+    def enable(self, traceMemory: bool = False):
+        """Enable the profiler.
+
+        Parameters
+        ----------
+        traceMemory
+            Additionally trace the peak memory allocated within each measurement using tracemalloc.
+            This slows down the conversion considerably.
+        """
+
+        self.enabled = True
+        self.traceMemory = traceMemory
+        if traceMemory:
+            tracemalloc.start()
+        self.startTime = time.perf_counter()
+
+    def _enterMemoryMeasurement(self, measurement: _Measurement):
+        # the traced peak is reset for each measurement, so the peak so far is passed to the enclosing measurement
+        current, peak = tracemalloc.get_traced_memory()
+        if self._measurements:
+            self._measurements[-1].peakMemory = max(self._measurements[-1].peakMemory, peak)
+        tracemalloc.reset_peak()
+        measurement.startMemory = current
+        measurement.peakMemory = current
+        self._measurements.append(measurement)
+
+    def _exitMemoryMeasurement(self, measurement: _Measurement):
+        self._measurements.pop()
+        peak = max(measurement.peakMemory, tracemalloc.get_traced_memory()[1])
+        if self._measurements:
+            self._measurements[-1].peakMemory = max(self._measurements[-1].peakMemory, peak)
+        return peak - measurement.startMemory
+
+    def add(self, category: str, name: str, seconds: float, records: int = 0, nBytes: int = 0, peakMemory: int = 0):
+        """Add a measurement to the counters.
+
+        Parameters
+        ----------
+        category
+            The category, e.g., 'stage'.
+        name
+            The name within the category.
+        seconds
+            The measured wall time.
+        records
+            The number of processed records.
+        nBytes
+            The number of processed bytes.
+        peakMemory
+            The peak memory allocated during the measurement.
+        """
+
+        # measurements may be added concurrently, e.g., by export jobs running in a thread pool
+        with self._lock:
+            counter = self.counters.get((category, name))
+            if counter is None:
+                counter = self.counters[(category, name)] = [0, 0, 0, 0.0, 0]
+            counter[0] += 1
+            counter[1] += int(records)
+            counter[2] += int(nBytes)
+            counter[3] += seconds
+            counter[4] = max(counter[4], peakMemory)
+
+    def measure(self, category: str, name: str, records: int = 0, nBytes: int = 0):
+        """Time a block of code in a with statement, if the profiler is enabled.
+
+        Parameters
+        ----------
+        category
+            The category, e.g., 'stage'.
+        name
+            The name within the category.
+        records
+            The number of processed records.
+        nBytes
+            The number of processed bytes.
+
+        Returns
+        -------
+        _Measurement
+            The context manager.
+        """
+
+        if not self.enabled:
+            return _noMeasurement
+        return _Measurement(self, category, name, records, nBytes)
+
+    def getCounters(self):
+        """Get the counters, sorted by category and descending time.
+
+        Returns
+        -------
+        list[dict]
+            The counters.
+        """
+
+        return [
+            {
+                "category": category,
+                "name": str(name),
+                "calls": calls,
+                "records": records,
+                "bytes": nBytes,
+                "seconds": seconds,
+                "peakMemory": peakMemory,
+            }
+            for (category, name), (calls, records, nBytes, seconds, peakMemory) in sorted(
+                self.counters.items(), key=lambda x: (x[0][0], -x[1][3])
+            )
+        ]
+
+    def printTable(self):
+        """Print the counters as a table, sorted by category and descending time."""
+
+        totalTime = time.perf_counter() - self.startTime
+
+        columns = ["category", "name", "calls", "records", "MB", "time [s]", "% total"]
+        if self.traceMemory:
+            columns.append("peak memory [MB]")
+
+        table = PrettyTable(columns)
+        table.align = "r"
+        table.align["category"] = "l"
+        table.align["name"] = "l"
+        for c in self.getCounters():
+            row = [
+                c["category"],
+                c["name"],
+                c["calls"],
+                c["records"],
+                "{:.2f}".format(c["bytes"] / 1e6),
+                "{:.4f}".format(c["seconds"]),
+                "{:.1f}".format(100 * c["seconds"] / totalTime),
+            ]
+            if self.traceMemory:
+                row.append("{:.2f}".format(c["peakMemory"] / 1e6))
+            table.add_row(row)
+
+        print(table)
+        print("total time: {:.4f} s".format(totalTime))
+
+    def dump(self, fileName: str):
+        """Write the counters to a .json file.
+
+        Parameters
+        ----------
+        fileName
+            The name of the file.
+        """
+
+        with open(fileName, "w") as f:
+            json.dump(
+                {"totalSeconds": time.perf_counter() - self.startTime, "counters": self.getCounters()},
+                f,
+                indent=1,
+            )
+
+
+# the profiler of the conversion, which is enabled by the --profile option
+profiler = Profiler()
@@ -0,0 +1,218 @@
+"""
+Copyright (C) 2019 Matthias Neuner <matthias.neuner@uibk.ac.at>
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+"""
+
+import numpy as np
+from src.modeldatabase import LabelIndex
+
+
+class NodeResult:
+    def __init__(self, nodeIndex: LabelIndex, labels: list[int], values: list[np.ndarray]):
+        """The dense results of one nodal result type (e.g., U) for all nodes of the model in an increment.
+        Rows are aligned with the node index of the model. Nodes without results, and missing
+        components of nodes with less components than others, are marked in a mask.
+
+        Parameters
+        ----------
+        nodeIndex
+            The index of all nodes of the model.
+        labels
+            The labels of the nodes, for which results are available.
+        values
+            The results of the nodes.
+        """
+
+        nRows = len(nodeIndex)
+        lengths = np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+        width = int(lengths.max()) if lengths.shape[0] else 0
+
+        self.values = np.zeros((nRows, width))
+        self.mask = np.zeros((nRows, width), dtype=bool)
+
+        if not lengths.shape[0]:
+            return
+
+        rows, found = nodeIndex.getRows(labels)
+
+        if (lengths == width).all():
+            data = np.asarray(values, dtype=float)
+            self.values[rows[found]] = data[found]
+            self.mask[rows[found]] = True
+        else:
+            # a ragged result, e.g., if some nodes carry more degrees of freedom than others
+            offsets = np.cumsum(lengths) - lengths
+            columns = np.arange(lengths.sum()) - np.repeat(offsets, lengths)
+            rows = np.repeat(rows, lengths)
+            found = np.repeat(found, lengths)
+            self.values[rows[found], columns[found]] = np.concatenate(values)[found]
+            self.mask[rows[found], columns[found]] = True
+
+    def __len__(self):
+        """The number of nodes with results."""
+        return int(np.count_nonzero(self.mask.any(axis=1)))
+
+    def assign(self, rows: np.ndarray, values: np.ndarray):
+        """Set the results of some nodes, e.g., of results computed for a set.
+        Nonfinite values are treated as missing.
+
+        Parameters
+        ----------
+        rows
+            The rows of the nodes.
+        values
+            The results, one row per node.
+        """
+
+        width = values.shape[1]
+        if width > self.values.shape[1]:
+            padding = width - self.values.shape[1]
+            self.values = np.pad(self.values, ((0, 0), (0, padding)))
+            self.mask = np.pad(self.mask, ((0, 0), (0, padding)))
+
+        self.values[rows, :width] = values
+        self.mask[rows, :width] = np.isfinite(values)
+        self.mask[rows, width:] = False
+
+
+class ElementResult:
+    def __init__(self, labels: np.ndarray, qps: dict[int, np.ndarray], filledRows: dict[int, np.ndarray] = None):
+        """The dense results of one elemental result type (e.g., S) for all elements of one type in an element set.
+        Each location ('qps', 'computed') holds one array of shape (nElements, nComponents) per quadrature point
+        number or computed quantity (e.g., 'average'), with rows in the order of the labels.
+        Results missing for some elements are NaN.
+
+        Parameters
+        ----------
+        labels
+            The element labels, i.e., the rows.
+        qps
+            The results at the quadrature points.
+        filledRows
+            (Optional) The mask of the rows with results per quadrature point. If not given, all rows are filled.
+        """
+
+        self.labels = labels
+        self.locations = {"qps": qps, "computed": {}}
+        self.filledRows = filledRows if filledRows is not None else {}
+
+    def __getitem__(self, location: str):
+        return self.locations[location]
+
+    def hasMissingRows(self, location: str, which):
+        """Check if results are missing for some elements, independent of the values (which may be NaN).
+        Computed results are missing for an element if it is missing at any quadrature point.
+
+        Parameters
+        ----------
+        location
+            The location, 'qps' or 'computed'.
+        which
+            The quadrature point number or the computed quantity.
+
+        Returns
+        -------
+        bool
+            True, if some rows were not filled.
+        """
+
+        if location == "qps":
+            filledRows = [self.filledRows[which]] if which in self.filledRows else []
+        else:
+            filledRows = self.filledRows.values()
+
+        return any(not filled.all() for filled in filledRows)
+
+
+class ElementResultRecords:
+    def __init__(self):
+        """Collects the records of one elemental result type for all elements of one type in an element set,
+        while an increment is parsed. At the end of the increment, the records are assembled to an ElementResult.
+        """
+
+        self.labels = []
+        self.qps = []
+        self.values = []
+        self.entries = []
+
+    def append(self, label: int, qp: int, values: np.ndarray):
+        """Add the record of an element at a quadrature point.
+
+        Parameters
+        ----------
+        label
+            The element label.
+        qp
+            The quadrature point number.
+        values
+            The result values.
+        """
+
+        if self.labels and self.labels[-1] == label and self.qps[-1] == qp:
+            # continuation of an existing record, which is joined when the ElementResult is assembled
+            self.entries.append(len(self.labels) - 1)
+        else:
+            self.entries.append(len(self.labels))
+            self.labels.append(label)
+            self.qps.append(qp)
+
+        self.values.append(values)
+
+    def toElementResult(self, elementIndex: LabelIndex = None):
+        """Assemble the records to dense arrays.
+
+        Parameters
+        ----------
+        elementIndex
+            (Optional) The index of the elements of the set, which determines the rows.
+            If not given, the rows are in the order of appearance of the elements.
+
+        Returns
+        -------
+        ElementResult
+            The dense results.
+        """
+
+        labels = np.asarray(self.labels, dtype=np.int64)
+        qps = np.asarray(self.qps, dtype=np.int64)
+        nEntries = labels.shape[0]
+
+        pieceLengths = np.fromiter(map(len, self.values), dtype=np.int64, count=len(self.values))
+        lengths = np.bincount(self.entries, weights=pieceLengths, minlength=nEntries).astype(np.int64)
+        width = int(lengths.max()) if nEntries else 0
+
+        if len(self.values) == nEntries and (pieceLengths == width).all():
+            data = np.asarray(self.values, dtype=float).reshape(nEntries, width)
+        else:
+            flat = np.concatenate(self.values)
+            if (lengths == width).all():
+                data = flat.reshape(nEntries, width)
+            else:
+                data = np.full((nEntries, width), np.nan)
+                offsets = np.cumsum(lengths) - lengths
+                columns = np.arange(flat.shape[0]) - np.repeat(offsets, lengths)
+                data[np.repeat(np.arange(nEntries), lengths), columns] = flat
+
+        if elementIndex is None:
+            uniqueLabels, firstAppearance = np.unique(labels, return_index=True)
+            elementIndex = LabelIndex(uniqueLabels[np.argsort(firstAppearance)])
+
+        rows, found = elementIndex.getRows(labels)
+        complete = found & (lengths == width)
+
+        qpResults = {}
+        filledRows = {}
+        for qp in np.unique(qps):
+            selection = (qps == qp) & found
+            qpResult = np.full((len(elementIndex), width), np.nan)
+            qpResult[rows[selection]] = data[selection]
+            qpResults[int(qp)] = qpResult
+
+            filled = np.zeros(len(elementIndex), dtype=bool)
+            filled[rows[(qps == qp) & complete]] = True
+            filledRows[int(qp)] = filled
+
+        return ElementResult(elementIndex.labels, qpResults, filledRows)
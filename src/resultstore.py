@@ -0,0 +1,300 @@
+"""
+Copyright (C) 2019 Matthias Neuner <matthias.neuner@uibk.ac.at>
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+A columnar on-disk store of exported results. Each variable is stored as an append-only array
+of shape (time, entity, component) in a raw little-endian float32 file, where the entities are the nodes or elements
+of all its parts. A small JSON manifest describes the arrays, and it only lists completely written time steps.
+
+Results are accessed without reading the complete files by memory-mapping:
+
+    store = ResultStore("job_store")
+    times, history = store["S"].getHistory([17, 42], part="LOWER")
+    field = store["U"].getField(-1)
+"""
+
+import json
+import os
+import numpy as np
+from src.modeldatabase import LabelIndex
+from src.profiling import profiler
+
+_manifestFileName = "manifest.json"
+_dtype = np.dtype("<f4")
+
+
+class ResultStoreWriter:
+    def __init__(self, directory: str):
+        """Write exported variables to a result store, time step by time step.
+        The Ensight geometry and variables are written, i.e., the same objects as for the Ensight case.
+
+        Parameters
+        ----------
+        directory
+            The directory of the store, which is created if it does not exist.
+        """
+
+        self.directory = directory
+        self.currentTime = 0.0
+        self.fileHandles = {}
+        self.variables = {}
+        self._parts = {}
+
+        os.makedirs(directory, exist_ok=True)
+
+    def setCurrentTime(self, timeValue):
+        self.currentTime = timeValue
+
+    def writeGeometry(self, ensightGeometry):
+        """Collect the node and element labels of all parts, which define the entities of the variables."""
+
+        self._parts = {
+            part.partNumber: (
+                part.description,
+                np.asarray(part.nodeLabels, dtype=np.int64),
+                {elType: np.asarray(labels, dtype=np.int64) for elType, (labels, _) in part.elements.items()},
+            )
+            for part in ensightGeometry.partList
+        }
+
+    def writeVariable(self, ensightVariable):
+        """Append the current time step of a variable. The layout of the entities is defined
+        by the first time step, and it must not change.
+
+        Parameters
+        ----------
+        ensightVariable
+            The EnsightPerNodeVariable or EnsightPerElementVariable.
+        """
+
+        name = ensightVariable.name
+
+        blocks = []
+        for partID, partValues in ensightVariable.partsDict.items():
+            if isinstance(partValues, tuple):
+                blocks.append((partID, None, partValues[1]))
+            else:
+                blocks += [(partID, elType, values) for elType, values in partValues.items()]
+
+        if name not in self.variables:
+            self._createVariable(name, ensightVariable.variableDimension, blocks)
+
+        variable = self.variables[name]
+        layout = [(part["partID"], part["elementType"], part["stop"] - part["start"]) for part in variable["parts"]]
+        if layout != [(partID, elType, values.shape[0]) for partID, elType, values in blocks]:
+            raise Exception("The parts of variable {:} in the result store must not change over time.".format(name))
+
+        f = self.fileHandles[name]
+        with profiler.measure("write", name + " result store") as measurement:
+            for _, _, values in blocks:
+                if values.shape[1] != variable["nComponents"]:
+                    raise Exception(
+                        "Variable {:} has {:} instead of {:} components.".format(
+                            name, values.shape[1], variable["nComponents"]
+                        )
+                    )
+                f.write(np.ascontiguousarray(values, dtype=_dtype).data)
+            measurement.nBytes = variable["nEntities"] * variable["nComponents"] * _dtype.itemsize
+
+        variable["times"].append(float(self.currentTime))
+
+    def _createVariable(self, name: str, nComponents: int, blocks: list):
+        parts = []
+        labels = []
+        start = 0
+        for partID, elType, values in blocks:
+            if partID not in self._parts:
+                raise Exception("Part {:} of variable {:} is not part of the geometry.".format(partID, name))
+            partName, nodeLabels, elementLabels = self._parts[partID]
+            labels.append(nodeLabels if elType is None else elementLabels[elType])
+            parts.append(
+                {
+                    "name": partName,
+                    "partID": partID,
+                    "elementType": elType,
+                    "start": start,
+                    "stop": start + values.shape[0],
+                }
+            )
+            start += values.shape[0]
+
+        labelsFile = name + ".labels.npy"
+        np.save(os.path.join(self.directory, labelsFile), np.concatenate(labels) if labels else np.zeros(0, np.int64))
+
+        dataFile = name + ".f32"
+        self.fileHandles[name] = open(os.path.join(self.directory, dataFile), mode="wb")
+
+        self.variables[name] = {
+            "location": "node" if not blocks or blocks[0][1] is None else "element",
+            "dataFile": dataFile,
+            "labelsFile": labelsFile,
+            "dtype": _dtype.str,
+            "nEntities": start,
+            "nComponents": nComponents,
+            "parts": parts,
+            "times": [],
+        }
+
+    def finalize(self, closeFileHandles=True):
+        """Write the manifest. All data files are flushed before, and the manifest is replaced atomically,
+        so that it never references time steps, which are not yet written.
+
+        Parameters
+        ----------
+        closeFileHandles
+            Close all data files, i.e., the store is complete.
+        """
+
+        for f in self.fileHandles.values():
+            if closeFileHandles:
+                f.close()
+            else:
+                f.flush()
+
+        fileName = os.path.join(self.directory, _manifestFileName)
+        with open(fileName + ".tmp", "w") as f:
+            json.dump({"variables": self.variables}, f)
+        os.replace(fileName + ".tmp", fileName)
+
+
+class StoredVariable:
+    def __init__(self, directory: str, name: str, definition: dict):
+        """A variable in a result store. Its values are memory-mapped, i.e., only the accessed parts are read.
+
+        Parameters
+        ----------
+        directory
+            The directory of the store.
+        name
+            The name of the variable.
+        definition
+            The definition of the variable in the manifest.
+        """
+
+        self.name = name
+        self.location = definition["location"]
+        self.times = np.asarray(definition["times"])
+        self.nComponents = definition["nComponents"]
+        self.parts = {}
+        for part in definition["parts"]:
+            self.parts.setdefault(part["name"], []).append(part)
+        self.labels = np.load(os.path.join(directory, definition["labelsFile"]), mmap_mode="r")
+
+        shape = (self.times.shape[0], definition["nEntities"], self.nComponents)
+        if self.times.shape[0] and definition["nEntities"] and self.nComponents:
+            self.values = np.memmap(
+                os.path.join(directory, definition["dataFile"]), dtype=definition["dtype"], mode="r", shape=shape
+            )
+        else:
+            self.values = np.zeros(shape, dtype=definition["dtype"])
+
+        self._labelIndices = {}
+
+    def _getEntities(self, part: str = None):
+        """The entities of a part, or of all entities. A part with multiple element types consists of
+        one range per element type, which are usually adjacent and merged to a slice; otherwise, the rows are returned.
+        """
+
+        if part is None:
+            return slice(0, self.labels.shape[0])
+        if part not in self.parts:
+            raise Exception("Variable {:} is not defined on part {:}.".format(self.name, part))
+
+        ranges = self.parts[part]
+        if all(previous["stop"] == current["start"] for previous, current in zip(ranges, ranges[1:])):
+            return slice(ranges[0]["start"], ranges[-1]["stop"])
+        return np.concatenate([np.arange(r["start"], r["stop"]) for r in ranges])
+
+    def getRows(self, labels, part: str = None):
+        """Get the entity rows of node or element labels.
+
+        Parameters
+        ----------
+        labels
+            The labels.
+        part
+            (Optional) The part, in which the labels are looked up. Otherwise, all parts are searched,
+            and for labels existing in multiple parts, the first occurrence is used.
+
+        Returns
+        -------
+        np.ndarray
+            The rows.
+        """
+
+        if part not in self._labelIndices:
+            self._labelIndices[part] = LabelIndex(self.labels[self._getEntities(part)])
+        rows, found = self._labelIndices[part].getRows(np.atleast_1d(labels))
+        if not found.all():
+            raise Exception(
+                "Labels {:} do not exist for variable {:}.".format(np.atleast_1d(labels)[~found], self.name)
+            )
+        entities = self._getEntities(part)
+        if isinstance(entities, slice):
+            return rows + entities.start
+        return entities[rows]
+
+    def getHistory(self, labels, part: str = None):
+        """Get the time history of nodes or elements.
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray]
+            The times, and the values of shape (time, label, component).
+        """
+
+        return self.times, self.values[:, self.getRows(labels, part), :]
+
+    def getField(self, step: int, part: str = None):
+        """Get the values of all nodes or elements of a part (or of all parts) at a time step.
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray]
+            The labels, and the values of shape (entity, component).
+        """
+
+        entities = self._getEntities(part)
+        return self.labels[entities], self.values[step, entities, :]
+
+    def getPart(self, part: str):
+        """Get the values of all nodes or elements of a part at all time steps.
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray, np.ndarray]
+            The times, the labels, and a (memory-mapped) view of the values of shape (time, entity, component).
+        """
+
+        entities = self._getEntities(part)
+        return self.times, self.labels[entities], self.values[:, entities, :]
+
+
+class ResultStore:
+    def __init__(self, directory: str):
+        """Open a result store for querying. Only the time steps listed in the manifest at this point are accessible.
+
+        Parameters
+        ----------
+        directory
+            The directory of the store.
+        """
+
+        self.directory = directory
+        with open(os.path.join(directory, _manifestFileName)) as f:
+            self._manifest = json.load(f)
+        self._variables = {}
+
+    @property
+    def variableNames(self):
+        return list(self._manifest["variables"].keys())
+
+    def __getitem__(self, name: str):
+        if name not in self._variables:
+            if name not in self._manifest["variables"]:
+                raise Exception("Variable {:} does not exist in the result store {:}.".format(name, self.directory))
+            self._variables[name] = StoredVariable(self.directory, name, self._manifest["variables"][name])
+        return self._variables[name]
@@ -0,0 +1,185 @@
+"""
+Copyright (C) 2019 Matthias Neuner <matthias.neuner@uibk.ac.at>
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+"""
+
+import numpy as np
+
+
+class ComponentTransform:
+    def __init__(self, name: str, description: str, nComponentsIn: int, nComponentsOut: int, mapping: list[tuple]):
+        """A precompiled transform between notations (e.g., Voigt to a 3x3 tensor), which is applied on the results
+        of all nodes/elements at once. Each output component is either zero or a scaled input component.
+
+        Parameters
+        ----------
+        name
+            The name of the transform.
+        description
+            A short description.
+        nComponentsIn
+            The expected number of components of the input.
+        nComponentsOut
+            The number of components of the output.
+        mapping
+            The list of (output component, input component, factor) tuples. Unmapped output components are zero.
+        """
+
+        self.name = name
+        self.description = description
+        self.nComponentsIn = nComponentsIn
+        self.nComponentsOut = nComponentsOut
+        self._target = np.asarray([m[0] for m in mapping], dtype=np.intp)
+        self._source = np.asarray([m[1] for m in mapping], dtype=np.intp)
+        self._factors = np.asarray([m[2] for m in mapping], dtype=float)
+        self._isScaled = (self._factors != 1.0).any()
+        self._mapping = [(int(t), int(s), float(f)) for t, s, f in mapping]
+
+    def __call__(self, values: np.ndarray, out: np.ndarray = None):
+        """Apply the transform.
+
+        Parameters
+        ----------
+        values
+            The input, one row per node/element.
+        out
+            (Optional) The array to write the output to, e.g., a preallocated output buffer of any float type.
+            Its unmapped components are left untouched. The output is written column by column,
+            without allocating any temporary arrays.
+
+        Returns
+        -------
+        np.ndarray
+            The transformed results, one row per node/element.
+        """
+
+        if values.shape[1] != self.nComponentsIn:
+            raise Exception(
+                "Transform {:} expects {:} components, but the result has {:}.".format(
+                    self.name, self.nComponentsIn, values.shape[1]
+                )
+            )
+
+        if out is not None:
+            for target, source, factor in self._mapping:
+                if factor == 1.0:
+                    np.copyto(out[:, target], values[:, source], casting="same_kind")
+                else:
+                    np.multiply(values[:, source], factor, out=out[:, target], casting="same_kind")
+            return out
+
+        out = np.zeros((values.shape[0], self.nComponentsOut))
+
+        if self._isScaled:
+            out[:, self._target] = values[:, self._source] * self._factors
+        else:
+            out[:, self._target] = values[:, self._source]
+
+        return out
+
+
+def _voigtToTensor(shearFactor: float, voigt2D: bool = False):
+    """Mapping from Abaqus Voigt notation (11, 22, 33, 12, 13, 23), or (11, 22, 12) in 2D,
+    to a row-wise 3x3 tensor (11, 12, 13, 21, 22, 23, 31, 32, 33)."""
+
+    if voigt2D:
+        return [(0, 0, 1.0), (4, 1, 1.0), (1, 2, shearFactor), (3, 2, shearFactor)]
+
+    return [
+        (0, 0, 1.0),
+        (4, 1, 1.0),
+        (8, 2, 1.0),
+        (1, 3, shearFactor),
+        (3, 3, shearFactor),
+        (2, 4, shearFactor),
+        (6, 4, shearFactor),
+        (5, 5, shearFactor),
+        (7, 5, shearFactor),
+    ]
+
+
+transforms = {
+    t.name: t
+    for t in (
+        ComponentTransform(
+            "vector2d_to_vector3d",
+            "2D vector (2 components) to 3D vector (3 components), zero filled",
+            2,
+            3,
+            [(0, 0, 1.0), (1, 1, 1.0)],
+        ),
+        ComponentTransform(
+            "voigt2d_to_voigt3d",
+            "plane stress Voigt (11, 22, 12) to 3D Voigt (11, 22, 33, 12, 13, 23), zero filled",
+            3,
+            6,
+            [(0, 0, 1.0), (1, 1, 1.0), (3, 2, 1.0)],
+        ),
+        ComponentTransform(
+            "voigt2d4_to_voigt3d",
+            "plane strain/axisymmetric Voigt (11, 22, 33, 12) to 3D Voigt (11, 22, 33, 12, 13, 23), zero filled",
+            4,
+            6,
+            [(0, 0, 1.0), (1, 1, 1.0), (2, 2, 1.0), (3, 3, 1.0)],
+        ),
+        ComponentTransform(
+            "voigt_to_tensor",
+            "3D Voigt (11, 22, 33, 12, 13, 23) to a full 3x3 tensor",
+            6,
+            9,
+            _voigtToTensor(1.0),
+        ),
+        ComponentTransform(
+            "voigt2d_to_tensor",
+            "plane stress Voigt (11, 22, 12) to a full 3x3 tensor, zero filled",
+            3,
+            9,
+            _voigtToTensor(1.0, voigt2D=True),
+        ),
+        ComponentTransform(
+            "strain_voigt_to_tensor",
+            "3D Voigt strain with engineering shear strains to a full 3x3 tensor with tensorial shear strains",
+            6,
+            9,
+            _voigtToTensor(0.5),
+        ),
+        ComponentTransform(
+            "strain_voigt2d_to_tensor",
+            "plane Voigt strain (11, 22, 12) with engineering shear strain to a full 3x3 tensor, zero filled",
+            3,
+            9,
+            _voigtToTensor(0.5, voigt2D=True),
+        ),
+        ComponentTransform(
+            "strain_voigt_halve_shear",
+            "3D Voigt strain with engineering shear strains to 3D Voigt strain with tensorial shear strains",
+            6,
+            6,
+            [(0, 0, 1.0), (1, 1, 1.0), (2, 2, 1.0), (3, 3, 0.5), (4, 4, 0.5), (5, 5, 0.5)],
+        ),
+    )
+}
+
+
+def getTransform(name: str):
+    """Get a built-in transform by its name.
+
+    Parameters
+    ----------
+    name
+        The name of the transform.
+
+    Returns
+    -------
+    ComponentTransform
+        The transform.
+    """
+
+    if name not in transforms:
+        raise Exception(
+            "Unknown transform '{:}', available transforms are: {:}".format(name, " ".join(transforms.keys()))
+        )
+    return transforms[name]
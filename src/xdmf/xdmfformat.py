@@ -0,0 +1,332 @@
+"""
+Copyright (C) 2019 Matthias Neuner <matthias.neuner@uibk.ac.at>
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+"""
+
+import os
+import numpy as np
+from xml.sax.saxutils import quoteattr
+from src.profiling import profiler
+
+# Ensight element shapes -> (XDMF topology type, number of nodes per element)
+xdmfTopologyTypes = {
+    "point": ("Polyvertex", 1),
+    "bar2": ("Polyline", 2),
+    "bar3": ("Edge_3", 3),
+    "tria3": ("Triangle", 3),
+    "tria6": ("Triangle_6", 6),
+    "quad4": ("Quadrilateral", 4),
+    "quad8": ("Quadrilateral_8", 8),
+    "tetra4": ("Tetrahedron", 4),
+    "tetra10": ("Tetrahedron_10", 10),
+    "pyramid5": ("Pyramid", 5),
+    "penta6": ("Wedge", 6),
+    "hexa8": ("Hexahedron", 8),
+    "hexa20": ("Hexahedron_20", 20),
+}
+
+xdmfAttributeTypes = {
+    1: "Scalar",
+    3: "Vector",
+    6: "Tensor6",
+    9: "Tensor",
+}
+
+# Ensight orders symmetric tensors as 11 22 33 12 13 23, XDMF as 11 12 13 22 23 33
+_tensor6Order = np.array([0, 3, 4, 1, 5, 2])
+
+
+class XdmfDataItem:
+    def __init__(self, fileName: str, offset: int, shape: tuple, dtype: np.dtype):
+        """A flat little endian binary array in a raw data file, which is referenced by the XDMF index.
+
+        Parameters
+        ----------
+        fileName
+            The name of the raw data file, relative to the XDMF file.
+        offset
+            The offset of the array in the file in bytes.
+        shape
+            The (C ordered) shape of the array.
+        dtype
+            The data type of the array.
+        """
+
+        self.fileName = fileName
+        self.offset = offset
+        self.shape = shape
+        self.dtype = np.dtype(dtype)
+
+    @property
+    def nBytes(self):
+        return int(np.prod(self.shape)) * self.dtype.itemsize
+
+    def toXml(self):
+        return (
+            '<DataItem Dimensions="{:}" NumberType="{:}" Precision="{:}" Format="Binary" Endian="Little" Seek="{:}">'
+            "{:}</DataItem>"
+        ).format(
+            " ".join(str(n) for n in self.shape),
+            "Float" if self.dtype.kind == "f" else "Int",
+            self.dtype.itemsize,
+            self.offset,
+            self.fileName,
+        )
+
+
+class XdmfCase:
+    def __init__(self, directory, caseName, writeTransientSingleFiles=True, stepFileNameDigits=4):
+        """A case consisting of raw binary arrays, and an XDMF index file (caseName.xmf) describing them.
+        It is written time step by time step, and it is a drop-in replacement for the EnsightChunkWiseCase,
+        i.e., it writes the same Ensight geometry and variable objects.
+
+        Each Ensight part is represented by one XDMF grid per element type, and each time step
+        by a spatial collection of all grids in a temporal collection.
+        As every array is stored contiguously at a known offset, a reader may memory-map any array
+        of any time step without parsing the other time steps.
+
+        Parameters
+        ----------
+        directory
+            The directory of the case.
+        caseName
+            The name of the case, which is also the prefix of all files.
+        writeTransientSingleFiles
+            Append all time steps of a variable to a single file, and record their offsets in the index.
+            Otherwise, each time step of a variable is written to a separate file, e.g., name.0000.bin, name.0001.bin, ...
+        stepFileNameDigits
+            The number of digits of the time step number in the file names of separate time step files.
+        """
+
+        self.directory = directory
+        self.caseName = caseName
+        self.caseFileNamePrefix = caseName + "_"
+        self.writeTransientSingleFiles = writeTransientSingleFiles
+        self.stepFileNameDigits = stepFileNameDigits
+        self.fileHandles = {}
+        self.currentTime = 0.0
+        # the current sizes of the written files, and the number of values written per variable
+        self.fileSizes = {}
+        self.writtenValues = {}
+
+        # the parts of the current geometry, {partID: {"name", "coordinates", "nodeLabels", "topologies"}}
+        self._parts = {}
+        # the time steps, each with the geometry and the attributes {(partID, elType or None): [(name, ...)]}
+        self._steps = []
+        # the XML of completed time steps, which does not change anymore
+        self._stepXml = []
+
+    def setCurrentTime(self, timeValue):
+        self.currentTime = timeValue
+
+    def _updateTimeStep(self):
+        if not self._steps or self.currentTime > self._steps[-1]["time"]:
+            self._steps.append({"time": self.currentTime, "parts": self._parts, "attributes": {}})
+        return self._steps[-1]
+
+    def _writeArray(self, name: str, array: np.ndarray, transient: bool = True):
+        """Write an array as flat little endian binary data, either appended to the file of the array name,
+        or to a separate file for the current time step. Arrays, which are not transient, are always written
+        to a single file.
+
+        Returns
+        -------
+        XdmfDataItem
+            The reference to the written array.
+        """
+
+        array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+
+        if not transient:
+            fileName = self.caseFileNamePrefix + name + ".bin"
+            offset = 0
+            with open(os.path.join(self.directory, fileName), mode="wb") as f:
+                f.write(array.data)
+            self.fileSizes[fileName] = array.nbytes
+
+        elif self.writeTransientSingleFiles:
+            if name not in self.fileHandles:
+                fileName = self.caseFileNamePrefix + name + ".bin"
+                self.fileHandles[name] = open(os.path.join(self.directory, fileName), mode="wb")
+            f = self.fileHandles[name]
+            fileName = os.path.basename(f.name)
+            offset = f.tell()
+            f.write(array.data)
+            self.fileSizes[fileName] = f.tell()
+        else:
+            step = len(self._steps) - 1 if self._steps else 0
+            fileName = "{:}{:}.{:0{:}d}.bin".format(self.caseFileNamePrefix, name, step, self.stepFileNameDigits)
+            if step >= 10**self.stepFileNameDigits:
+                raise Exception(
+                    "Time step {:} of {:} exceeds the {:} digits of the file names.".format(
+                        step, name, self.stepFileNameDigits
+                    )
+                )
+            offset = 0
+            with open(os.path.join(self.directory, fileName), mode="wb") as f:
+                f.write(array.data)
+            self.fileSizes[fileName] = array.nbytes
+
+        return XdmfDataItem(fileName, offset, array.shape, array.dtype)
+
+    def writeGeometryTrendChunk(self, ensightGeometry, timeAndFileSetNumber=1):
+        if timeAndFileSetNumber != None:
+            self._updateTimeStep()
+
+        name = ensightGeometry.name
+        transient = timeAndFileSetNumber != None
+        parts = {}
+
+        with profiler.measure("write", name + ".bin") as measurement:
+            for part in ensightGeometry.partList:
+                prefix = "{:}_part{:}".format(name, part.partNumber)
+
+                def writeArray(arrayName, array, dtype):
+                    item = self._writeArray(prefix + "_" + arrayName, np.asarray(array, dtype=dtype), transient)
+                    measurement.nBytes += item.nBytes
+                    return item
+
+                topologies = {}
+                for elType, (labels, nodeIndices) in part.elements.items():
+                    shape = part.ensightElementTypeMappings[elType]
+                    if shape not in xdmfTopologyTypes:
+                        raise Exception("Ensight element shape '{:}' is not supported by XDMF.".format(shape))
+                    topologies[elType] = (
+                        shape,
+                        writeArray(shape + "_connectivity", nodeIndices, np.int32),
+                        writeArray(shape + "_labels", labels, np.int32),
+                    )
+
+                parts[part.partNumber] = {
+                    "name": part.description,
+                    "coordinates": writeArray("coordinates", part.nodes, np.float64),
+                    "nodeLabels": writeArray("nodeLabels", part.nodeLabels, np.int32),
+                    "topologies": topologies,
+                }
+
+        self._parts = parts
+        if self._steps:
+            self._steps[-1]["parts"] = parts
+
+    def writeVariableTrendChunk(self, ensightVariable, timeAndFileSetNumber=2):
+        step = self._updateTimeStep()
+
+        name = ensightVariable.name
+        if name not in self.writtenValues:
+            self.writtenValues[name] = 0
+
+        attributeType = xdmfAttributeTypes.get(ensightVariable.variableDimension, "Matrix")
+
+        with profiler.measure("write", name + ".bin") as measurement:
+            for partID, partValues in ensightVariable.partsDict.items():
+                if isinstance(partValues, tuple):
+                    # per node: ("coordinates", values), shared by all element types of the part
+                    values = self._getOutputValues(partValues[1], ensightVariable.variableDimension)
+                    item = self._writeArray("{:}_part{:}".format(name, partID), values)
+                    step["attributes"].setdefault((partID, None), []).append((name, attributeType, "Node", item))
+                    measurement.nBytes += item.nBytes
+                else:
+                    for elType, values in partValues.items():
+                        values = self._getOutputValues(values, ensightVariable.variableDimension)
+                        item = self._writeArray("{:}_part{:}_{:}".format(name, partID, elType), values)
+                        step["attributes"].setdefault((partID, elType), []).append((name, attributeType, "Cell", item))
+                        measurement.nBytes += item.nBytes
+
+        self.writtenValues[name] += ensightVariable.getNumberOfValues()
+
+    def _getOutputValues(self, values: np.ndarray, variableDimension: int):
+        """Zero pad values to the variable dimension, and reorder symmetric tensors."""
+
+        if values.shape[1] < variableDimension:
+            values = np.hstack([values, np.zeros((values.shape[0], variableDimension - values.shape[1]), values.dtype)])
+        if variableDimension == 6:
+            values = values[:, _tensor6Order]
+        return values
+
+    def _getStepXml(self, stepNumber: int, discardTimeMarks: bool):
+        step = self._steps[stepNumber]
+        lines = ['   <Grid Name="step{:}" GridType="Collection" CollectionType="Spatial">'.format(stepNumber)]
+        lines.append('    <Time Value="{:}"/>'.format(stepNumber if discardTimeMarks else repr(float(step["time"]))))
+
+        for partID, part in step["parts"].items():
+            for elType, (shape, connectivity, labels) in part["topologies"].items():
+                topologyType, nodesPerElement = xdmfTopologyTypes[shape]
+                gridName = part["name"] if len(part["topologies"]) == 1 else part["name"] + "_" + shape
+                lines.append('    <Grid Name={:} GridType="Uniform">'.format(quoteattr(gridName)))
+                lines.append(
+                    '     <Topology TopologyType="{:}" NumberOfElements="{:}" NodesPerElement="{:}">'.format(
+                        topologyType, connectivity.shape[0], nodesPerElement
+                    )
+                )
+                lines.append("      " + connectivity.toXml())
+                lines.append("     </Topology>")
+                lines.append('     <Geometry GeometryType="XYZ">')
+                lines.append("      " + part["coordinates"].toXml())
+                lines.append("     </Geometry>")
+                lines.append('     <Attribute Name="NodeLabel" AttributeType="Scalar" Center="Node">')
+                lines.append("      " + part["nodeLabels"].toXml())
+                lines.append("     </Attribute>")
+                lines.append('     <Attribute Name="ElementLabel" AttributeType="Scalar" Center="Cell">')
+                lines.append("      " + labels.toXml())
+                lines.append("     </Attribute>")
+
+                attributes = step["attributes"].get((partID, None), []) + step["attributes"].get((partID, elType), [])
+                for name, attributeType, center, item in attributes:
+                    lines.append(
+                        '     <Attribute Name={:} AttributeType="{:}" Center="{:}">'.format(
+                            quoteattr(name), attributeType, center
+                        )
+                    )
+                    lines.append("      " + item.toXml())
+                    lines.append("     </Attribute>")
+                lines.append("    </Grid>")
+
+        lines.append("   </Grid>")
+        return "\n".join(lines) + "\n"
+
+    def finalize(self, discardTimeMarks=False, closeFileHandles=True):
+        """Write the XDMF index. It is written to a temporary file first, which then replaces the index,
+        so that a reader never sees an incomplete index. All data files are flushed before,
+        so that the index never references time steps, which are not yet written.
+
+        Parameters
+        ----------
+        discardTimeMarks
+            Replace the time values by the enumeration of time steps.
+        closeFileHandles
+            Close all data files, i.e., the case is complete.
+        """
+
+        for f in self.fileHandles.values():
+            if closeFileHandles:
+                f.close()
+            else:
+                f.flush()
+
+        # all but the last time step are complete, and their XML is formatted only once
+        if len(self._stepXml) > 0 and self._stepXml[0][0] != discardTimeMarks:
+            self._stepXml = []
+        for i in range(len(self._stepXml), len(self._steps) - 1):
+            self._stepXml.append((discardTimeMarks, self._getStepXml(i, discardTimeMarks)))
+
+        steps = [xml for _, xml in self._stepXml]
+        if self._steps:
+            steps.append(self._getStepXml(len(self._steps) - 1, discardTimeMarks))
+
+        fileName = os.path.join(self.directory, self.caseName + ".xmf")
+        with open(fileName + ".tmp", mode="w") as f:
+            f.write('<?xml version="1.0" ?>\n')
+            f.write('<Xdmf Version="3.0">\n')
+            f.write(" <Domain>\n")
+            f.write(
+                '  <Grid Name={:} GridType="Collection" CollectionType="Temporal">\n'.format(quoteattr(self.caseName))
+            )
+            f.write("".join(steps))
+            f.write("  </Grid>\n")
+            f.write(" </Domain>\n")
+            f.write("</Xdmf>\n")
+
+        os.replace(fileName + ".tmp", fileName)
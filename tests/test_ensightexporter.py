@@ -0,0 +1,76 @@
+"""
+Copyright (C) 2019 Matthias Neuner <matthias.neuner@uibk.ac.at>
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+Tests of the Ensight export of a synthetic .fil file, run with: python -m pytest tests
+"""
+
+import os
+import subprocess
+import sys
+import numpy as np
+from benchmarks.syntheticfil import SyntheticModel
+
+_filConverter = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "filconverter.py")
+_nIncrements = 2
+
+
+class _ModelWithTopNodes(SyntheticModel):
+    def nodeSets(self):
+        """The 'BOTTOM' nodes, which have RF results, and the 'TOP' nodes, which have no RF results."""
+        sets = super().nodeSets()
+        sets["TOP"] = self.nodeLabels[self.nodeCoords[:, -1] == self.nodeCoords[:, -1].max()]
+        return sets
+
+
+def _exportTopNodes(directory, entry: str, dimensions: int):
+    model = _ModelWithTopNodes(nElements=27, nIncrements=_nIncrements)
+    model.write(os.path.join(directory, "model.fil"))
+    with open(os.path.join(directory, "model.inp"), "w") as f:
+        f.write(model.exportDefinition())
+        f.write("*ensightPerNodeVariableJob, name=TOPRF, dimensions={:}\n".format(dimensions))
+        f.write("*ensightPerNodeVariableJobEntry, job=TOPRF, setType=nSet, set=TOP, result=RF, " + entry + "\n")
+
+    process = subprocess.run(
+        [sys.executable, _filConverter, "model.fil", "model.inp"], cwd=directory, capture_output=True, text=True
+    )
+
+    return process, model.nodeSets()["TOP"].shape[0], os.path.join(directory, "model_TOPRF.var")
+
+
+def _readSinglePartTimeSteps(fileName: str, nNodes: int, dimensions: int):
+    """Read the values of all time steps of a per node variable file with a single part."""
+
+    data = open(fileName, "rb").read()
+    header = 80
+    timeStep = 80 + 80 + 80 + 4 + 80 + nNodes * dimensions * 4 + 80
+    assert len(data) == header + _nIncrements * timeStep
+
+    offsets = [header + i * timeStep + 80 + 80 + 80 + 4 + 80 for i in range(_nIncrements)]
+    return [np.frombuffer(data, dtype="<f4", count=nNodes * dimensions, offset=offset) for offset in offsets]
+
+
+def test_extractionFunctionWithoutResults(tmp_path):
+    process, nNodes, fileName = _exportTopNodes(tmp_path, "fillMissingValuesTo=0.0, f(x)='np.linalg.norm(x)'", 1)
+    assert process.returncode == 0, process.stderr
+
+    for values in _readSinglePartTimeSteps(fileName, nNodes, 1):
+        assert np.array_equal(values, np.zeros(nNodes))
+
+
+def test_transformWithoutResults(tmp_path):
+    process, nNodes, fileName = _exportTopNodes(tmp_path, "fillMissingValuesTo=-1.0, transform=voigt2d_to_tensor", 9)
+    assert process.returncode == 0, process.stderr
+
+    for values in _readSinglePartTimeSteps(fileName, nNodes, 9):
+        assert np.array_equal(values, np.full(nNodes * 9, -1.0))
+
+
+def test_transformWidthWithoutResults(tmp_path):
+    # the transform yields 9 components, also if no node of the set has results
+    process, _, _ = _exportTopNodes(tmp_path, "fillMissingValuesTo=0.0, transform=voigt2d_to_tensor", 3)
+    assert process.returncode != 0
+    assert "Variable dimension 9 in set TOP does not match" in process.stderr
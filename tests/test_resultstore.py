@@ -0,0 +1,108 @@
+"""
+Copyright (C) 2019 Matthias Neuner <matthias.neuner@uibk.ac.at>
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+Tests of the query API of the result store, run with: python -m pytest tests
+"""
+
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from src.resultstore import ResultStore, ResultStoreWriter, StoredVariable
+
+# part 1 (MIXED) has two element types, part 2 (SINGLE) has one
+_elementLabels = {
+    1: {"C3D8": np.array([1, 2, 3]), "C3D6": np.array([10, 11])},
+    2: {"C3D8": np.array([20, 21])},
+}
+_names = {1: "MIXED", 2: "SINGLE"}
+
+
+def _makeGeometry():
+    return SimpleNamespace(
+        partList=[
+            SimpleNamespace(
+                partNumber=partID,
+                description=_names[partID],
+                nodeLabels=np.zeros(0, dtype=np.int64),
+                elements={elType: (labels, None) for elType, labels in elements.items()},
+            )
+            for partID, elements in _elementLabels.items()
+        ]
+    )
+
+
+def _getValues(labels, time):
+    return np.column_stack([labels + time, -labels - time]).astype(float)
+
+
+def _writeStore(directory, partOrder):
+    writer = ResultStoreWriter(str(directory))
+    writer.writeGeometry(_makeGeometry())
+    for time in (0.0, 1.0):
+        writer.setCurrentTime(time)
+        partsDict = {
+            partID: {elType: _getValues(labels, time) for elType, labels in _elementLabels[partID].items()}
+            for partID in partOrder
+        }
+        writer.writeVariable(SimpleNamespace(name="S", variableDimension=2, partsDict=partsDict))
+    writer.finalize()
+    return ResultStore(str(directory))
+
+
+def test_mixedTypePart(tmp_path):
+    variable = _writeStore(tmp_path, [1, 2])["S"]
+    mixedLabels = np.array([1, 2, 3, 10, 11])
+
+    _, labels, values = variable.getPart("MIXED")
+    assert np.array_equal(labels, mixedLabels)
+    assert np.array_equal(values[1], _getValues(mixedLabels, 1.0))
+
+    labels, values = variable.getField(0, part="MIXED")
+    assert np.array_equal(labels, mixedLabels)
+    assert np.array_equal(values, _getValues(mixedLabels, 0.0))
+
+    times, history = variable.getHistory([11, 2], part="MIXED")
+    assert np.array_equal(times, [0.0, 1.0])
+    assert np.array_equal(history[:, :, 0], [[11, 2], [12, 3]])
+
+    labels, _ = variable.getField(0, part="SINGLE")
+    assert np.array_equal(labels, [20, 21])
+
+
+def test_nonAdjacentRanges(tmp_path):
+    # the element types of a part are not adjacent, e.g., in a manually written manifest
+    labels = np.array([1, 2, 3, 20, 21, 10, 11])
+    np.save(tmp_path / "S.labels.npy", labels)
+    np.stack([_getValues(labels, time) for time in (0.0, 1.0)]).astype("<f4").tofile(tmp_path / "S.f32")
+    ranges = [("MIXED", "C3D8", 0, 3), ("SINGLE", "C3D8", 3, 5), ("MIXED", "C3D6", 5, 7)]
+    definition = {
+        "location": "element",
+        "dataFile": "S.f32",
+        "labelsFile": "S.labels.npy",
+        "dtype": "<f4",
+        "nEntities": 7,
+        "nComponents": 2,
+        "parts": [{"name": n, "partID": 0, "elementType": t, "start": a, "stop": b} for n, t, a, b in ranges],
+        "times": [0.0, 1.0],
+    }
+    variable = StoredVariable(str(tmp_path), "S", definition)
+
+    mixedLabels, values = variable.getField(-1, part="MIXED")
+    assert np.array_equal(mixedLabels, [1, 2, 3, 10, 11])
+    assert np.array_equal(values, _getValues(mixedLabels, 1.0))
+
+    _, history = variable.getHistory([10, 3], part="MIXED")
+    assert np.array_equal(history[0, :, 0], [10, 3])
+
+
+def test_unknownPartAndLabel(tmp_path):
+    variable = _writeStore(tmp_path, [1, 2])["S"]
+
+    with pytest.raises(Exception, match="not defined on part"):
+        variable.getField(0, part="UNKNOWN")
+    with pytest.raises(Exception, match="do not exist"):
+        variable.getRows([20], part="MIXED")